@@ -47,6 +47,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Primero, para medir también las consultas de sesión/autenticación
+    'core.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -68,6 +70,8 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                # Badge de alertas de stock bajo en el layout
+                'inventory.context_processors.low_stock',
             ],
         },
     },
@@ -79,10 +83,35 @@ WSGI_APPLICATION = 'Bakery_proyect.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Perfil de SQLite para varios workers escribiendo a la vez (POS + tienda en línea):
+# - WAL: las lecturas no bloquean a quien escribe (ni al revés); synchronous=NORMAL
+#   es seguro con WAL y evita un fsync por commit.
+# - busy_timeout/timeout: esperar el lock de escritura en vez de fallar con
+#   "database is locked".
+# - transaction_mode IMMEDIATE: atomic() toma el lock de escritura al empezar, así
+#   una transacción no falla a mitad de camino al pasar de leer a escribir.
+# - cache_size (KiB si es negativo) y mmap_size: más páginas en memoria por conexión.
+SQLITE_PRAGMAS = [
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA busy_timeout=20000',
+    'PRAGMA cache_size=-20000',
+    'PRAGMA mmap_size=134217728',
+    'PRAGMA temp_store=MEMORY',
+]
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            'init_command': ';'.join(SQLITE_PRAGMAS),
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
+        # Reusar la conexión entre requests (los PRAGMA se aplican una vez por conexión)
+        'CONN_MAX_AGE': 60,
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
@@ -132,3 +161,22 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 LOGIN_URL = '/admin/login/'
 
 
+
+# Segundos que se cachea el JSON de KPIs del dashboard (pos/admin/baneton/kpis/).
+# Se invalida al confirmar una orden; con varios workers conviene un CACHES compartido.
+BANETON_KPIS_CACHE_TTL = 30
+
+# Segundos que se cachea el conteo de alertas de stock bajo (banner de inventario
+# y badge del layout). Se invalida al cambiar una alerta en este proceso.
+LOW_STOCK_COUNTS_CACHE_TTL = 60
+
+# Métricas por vista (core/middleware.py): /metrics (texto estilo Prometheus) y
+# /metrics/summary/ (JSON para staff). Los números son por proceso.
+# Fracción de requests medidos (0 desactiva la medición)
+REQUEST_METRICS_SAMPLE_RATE = float(os.environ.get('REQUEST_METRICS_SAMPLE_RATE', '1.0'))
+# Muestras por vista para percentiles
+REQUEST_METRICS_WINDOW = 500
+# Repeticiones de una misma consulta en un request para marcarla como posible N+1
+REQUEST_METRICS_DUPLICATE_THRESHOLD = 3
+# Token para que un scraper lea /metrics sin sesión (Authorization: Bearer <token>)
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
@@ -83,6 +83,8 @@ urlpatterns = [
     path('save_order_online/', viewsProduct.save_order_online),
     path('inventory/', include('inventory.urls')),
     path('customers/', include('customers.urls')),
+    path('metrics', viewsCore.metrics, name='metrics'),
+    path('metrics/summary/', viewsCore.metrics_summary, name='metrics_summary'),
 
 ]
 if settings.DEBUG:
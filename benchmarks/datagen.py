@@ -0,0 +1,218 @@
+"""
+Generador de datos sintéticos para los benchmarks.
+
+Llena la base configurada con Products, RawMaterials, recetas, Customers,
+Orders (con sus ítems, repartidas en los últimos días) y Promotions, siempre
+igual para la misma semilla y los mismos tamaños. Todo va con bulk_create;
+como eso no envía señales, al final se reconstruyen el rollup diario, el
+índice de compras, el índice de búsqueda y las alertas de stock bajo.
+
+Uso (sobre una base nueva; --db es obligatorio para no llenar la base de desarrollo):
+    python benchmarks/datagen.py --scale medium --db /tmp/bench.sqlite3
+"""
+
+import argparse
+import os
+import random
+import sys
+from dataclasses import asdict, dataclass, fields
+from datetime import timedelta
+from decimal import Decimal
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@dataclass
+class Sizes:
+    products: int
+    materials: int
+    recipe_size: int  # materias primas por producto
+    customers: int
+    orders: int
+    items_per_order: int  # máximo; cada orden lleva entre 1 y este número
+    promotions: int
+    days: int  # las órdenes se reparten en los últimos N días
+
+
+SCALES = {
+    'small': Sizes(products=200, materials=50, recipe_size=4, customers=500,
+                   orders=5_000, items_per_order=4, promotions=10, days=30),
+    'medium': Sizes(products=2_000, materials=300, recipe_size=5, customers=10_000,
+                    orders=100_000, items_per_order=5, promotions=50, days=90),
+    'large': Sizes(products=20_000, materials=1_000, recipe_size=6, customers=100_000,
+                   orders=1_000_000, items_per_order=5, promotions=200, days=365),
+}
+
+PAYMENT_METHODS = ['Cash', 'Card', 'Transfer']
+WORDS = [
+    'pan', 'maíz', 'queso', 'almojábana', 'buñuelo', 'croissant', 'mantequilla', 'chocolate',
+    'arequipe', 'guayaba', 'integral', 'centeno', 'tostado', 'hojaldre', 'galleta', 'avena',
+]
+
+
+def setup_django(db_path):
+    """Configure Django on the SQLite file ``db_path`` (never the settings database)."""
+    sys.path.insert(0, ROOT)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Bakery_proyect.settings')
+    from django.conf import settings
+
+    if os.path.abspath(db_path) == os.path.abspath(str(settings.DATABASES['default']['NAME'])):
+        raise SystemExit(f'{db_path} is the database in settings; use another file for benchmark data')
+    settings.DATABASES['default']['NAME'] = db_path
+    import django
+    django.setup()
+
+
+def add_size_arguments(parser):
+    """--scale plus one --<size> option per Sizes field to override it."""
+    parser.add_argument('--scale', choices=SCALES, default='small')
+    parser.add_argument('--seed', type=int, default=42)
+    for f in fields(Sizes):
+        parser.add_argument(f"--{f.name.replace('_', '-')}", type=int, dest=f.name)
+
+
+def sizes_from_args(args):
+    values = asdict(SCALES[args.scale])
+    values.update({k: getattr(args, k) for k in values if getattr(args, k, None) is not None})
+    return Sizes(**values)
+
+
+def _name(rng, i):
+    return f'{rng.choice(WORDS).capitalize()} {rng.choice(WORDS)} {i}'
+
+
+def _batched(objs, model, batch_size=5000):
+    """bulk_create in batches from a generator, returning the number of rows."""
+    batch, total = [], 0
+    for obj in objs:
+        batch.append(obj)
+        if len(batch) >= batch_size:
+            model.objects.bulk_create(batch)
+            total += len(batch)
+            batch = []
+    model.objects.bulk_create(batch)
+    return total + len(batch)
+
+
+def generate(sizes, seed=42, verbose=False):
+    """Write the synthetic dataset. Returns {model: rows written}."""
+    from django.db import transaction
+    from django.utils import timezone
+
+    from inventory.alert_utils import refresh_stock_alerts
+    from inventory.bom_utils import invalidate_bom
+    from inventory.models import (
+        Customer, Order, OrderItem, Product, ProductRawMaterial, Promotion, RawMaterial,
+    )
+    from inventory.promo_utils import invalidate_promotion_snapshot
+    from inventory.purchase_utils import rebuild_purchase_index
+    from inventory.search_utils import rebuild_index
+    from pos.rollup_utils import rebuild_daily_sales
+
+    rng = random.Random(seed)
+    now = timezone.now()
+    today = timezone.localdate()
+    counts = {}
+
+    def log(message):
+        if verbose:
+            print(message, flush=True)
+
+    with transaction.atomic():
+        counts['materials'] = _batched((
+            RawMaterial(name=f'Materia {i}', units=10 ** 9,
+                        exp_date=today + timedelta(days=rng.randint(-10, 120)))
+            for i in range(sizes.materials)
+        ), RawMaterial)
+        material_ids = list(RawMaterial.objects.values_list('pk', flat=True))
+
+        def products():
+            for i in range(sizes.products):
+                price = rng.randrange(500, 50_000, 100)
+                # ~10% bajo el umbral de reorden (alertas de stock)
+                threshold = rng.randint(5, 30)
+                quantity = rng.randint(0, threshold - 1) if rng.random() < 0.1 else rng.randint(threshold, 500)
+                yield Product(name=_name(rng, i), description=' '.join(rng.choices(WORDS, k=10)),
+                              price=price, quantity=quantity, reorder_threshold=threshold,
+                              picture='default.jpg')
+
+        counts['products'] = _batched(products(), Product)
+        product_prices = dict(Product.objects.values_list('pk', 'price'))
+        product_ids = sorted(product_prices)
+        log(f"products: {counts['products']}, materials: {counts['materials']}")
+
+        counts['recipes'] = _batched((
+            ProductRawMaterial(product_id=pid, material_id=mid, material_quantity=rng.randint(1, 20) / 10)
+            for pid in product_ids
+            for mid in rng.sample(material_ids, min(sizes.recipe_size, len(material_ids)))
+        ), ProductRawMaterial)
+
+        counts['customers'] = _batched((
+            Customer(cedula=f'{10_000_000 + i}', nombre=f'Cliente {i}', correo=f'cliente{i}@example.com')
+            for i in range(sizes.customers)
+        ), Customer)
+        customer_ids = list(Customer.objects.values_list('pk', flat=True))
+
+        counts['promotions'] = 0
+        for i in range(sizes.promotions):
+            percent = rng.random() < 0.5
+            promo = Promotion.objects.create(
+                name=f'Promo {i}',
+                discount_type='percent' if percent else 'fixed',
+                value=Decimal(rng.randint(5, 30)) if percent else Decimal(rng.randrange(100, 2000, 100)),
+                # Algunas vencidas, inactivas o futuras: el filtro de vigentes tiene que descartarlas
+                is_active=rng.random() < 0.8,
+                starts_at=now - timedelta(days=rng.randint(0, 30)),
+                ends_at=now + timedelta(days=rng.randint(-5, 30)),
+                applies_to_all=i == 0,
+            )
+            if i:
+                promo.products.set(rng.sample(product_ids, min(len(product_ids), rng.randint(5, 50))))
+            counts['promotions'] += 1
+
+        # Órdenes en orden cronológico (como llegan en producción); 30% sin cliente
+        seconds = sizes.days * 86400
+        offsets = sorted((rng.randrange(seconds) for _ in range(sizes.orders)), reverse=True)
+        counts['orders'] = _batched((
+            Order(customer_id=rng.choice(customer_ids) if customer_ids and rng.random() < 0.7 else None,
+                  date=now - timedelta(seconds=offset), paymentMethod=rng.choice(PAYMENT_METHODS))
+            for offset in offsets
+        ), Order)
+        order_ids = list(Order.objects.order_by('pk').values_list('pk', flat=True))
+
+        def items():
+            for order_id in order_ids:
+                for pid in rng.sample(product_ids, rng.randint(1, sizes.items_per_order)):
+                    yield OrderItem(order_id=order_id, product_id=pid, quantity=rng.randint(1, 4),
+                                    unit_price=product_prices[pid])
+
+        counts['order_items'] = _batched(items(), OrderItem)
+        log(f"orders: {counts['orders']}, items: {counts['order_items']}")
+
+        # bulk_create no envía señales: reconstruir lo que ellas mantienen
+        counts['daily_sales'] = rebuild_daily_sales()
+        counts['purchases'] = rebuild_purchase_index()
+        rebuild_index()
+        counts['stock_alerts'] = refresh_stock_alerts()
+
+    invalidate_bom()
+    invalidate_promotion_snapshot()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--db', required=True, help='Ruta de la base SQLite donde escribir (no la de settings)')
+    add_size_arguments(parser)
+    args = parser.parse_args()
+
+    setup_django(args.db)
+    from django.core.management import call_command
+
+    call_command('migrate', verbosity=0)
+    sizes = sizes_from_args(args)
+    print(generate(sizes, seed=args.seed, verbose=True))
+
+
+if __name__ == '__main__':
+    main()
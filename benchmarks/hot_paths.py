@@ -0,0 +1,225 @@
+"""
+Benchmark: rutas calientes de la panadería con el test client de Django.
+
+Crea una base SQLite nueva en un directorio temporal, la llena con
+benchmarks/datagen.py (tamaños configurables, misma semilla = mismos datos)
+y mide cada escenario con django.test.Client (sin servidor, pero con todo
+el stack: middleware, vistas, plantillas):
+
+- save_order:          POST /save_order/ con 1-5 productos y un cliente
+- catalog:             /products/ con filtros de precio y orden por precio
+- daily_sales_report:  /pos/daily-report?date=... de un día con ventas
+- baneton_kpis:        JSON de KPIs con el caché vacío (cálculo completo)
+- low_stock_alerts:    /inventory/low-stock/
+
+Guarda p50/p95/p99, media, throughput y consultas por request en un JSON
+con el commit, los tamaños y las versiones, para comparar entre commits:
+
+    python benchmarks/hot_paths.py --scale medium --output before.json
+    git checkout otra-rama
+    python benchmarks/hot_paths.py --scale medium --output after.json --compare before.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import datagen  # noqa: E402
+
+SCENARIOS = ['save_order', 'catalog', 'daily_sales_report', 'baneton_kpis', 'low_stock_alerts']
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class Bench:
+    """State shared by the scenarios: client, logged-in staff user and data ids."""
+
+    def __init__(self, seed):
+        from django.contrib.auth.models import User
+        from django.test import Client
+        from django.utils import timezone
+
+        from inventory.models import Customer, Product
+        from pos.models import DailyProductSales
+
+        self.rng = random.Random(seed)
+        self.client = Client()
+        staff = User.objects.create_superuser('bench', password='bench')
+        self.client.force_login(staff)
+        self.product_ids = list(Product.objects.values_list('pk', flat=True))
+        self.cedulas = list(Customer.objects.values_list('cedula', flat=True)[:1000])
+        self.sale_days = [d.isoformat() for d in DailyProductSales.objects.dates('day', 'day')] or [
+            timezone.localdate().isoformat()
+        ]
+        self.today = timezone.localdate()
+
+    def save_order(self):
+        lines = [{'id': pid, 'quantity': self.rng.randint(1, 3)}
+                 for pid in self.rng.sample(self.product_ids, self.rng.randint(1, 5))]
+        customer = {'cedula': self.rng.choice(self.cedulas)} if self.cedulas else {}
+        body = json.dumps({'orders': lines, 'paymentMethod': 'Cash', 'customer': customer})
+        return self.client.post('/save_order/', body, content_type='application/json')
+
+    def catalog(self):
+        low = self.rng.randrange(500, 25_000, 500)
+        params = {
+            'min_price': low,
+            'max_price': low + self.rng.randrange(2_000, 20_000, 1_000),
+            'order': self.rng.choice(['price_asc', 'price_desc']),
+            'page': self.rng.randint(1, 3),
+        }
+        return self.client.get('/products/', params)
+
+    def daily_sales_report(self):
+        return self.client.get('/pos/daily-report', {'date': self.rng.choice(self.sale_days)})
+
+    def baneton_kpis(self):
+        from django.core.cache import cache
+
+        # Sin caché: se mide el cálculo, no la lectura del JSON guardado
+        cache.clear()
+        return self.client.get('/admin/baneton/kpis/')
+
+    def low_stock_alerts(self):
+        return self.client.get('/inventory/low-stock/')
+
+
+def run_scenario(bench, name, iterations, warmup):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    scenario = getattr(bench, name)
+    for _ in range(warmup):
+        scenario()
+
+    latencies, queries, statuses = [], [], set()
+    started = time.perf_counter()
+    for _ in range(iterations):
+        with CaptureQueriesContext(connection) as ctx:
+            start = time.perf_counter()
+            response = scenario()
+            latencies.append(time.perf_counter() - start)
+        queries.append(len(ctx.captured_queries))
+        statuses.add(response.status_code)
+    elapsed = time.perf_counter() - started
+
+    return {
+        'iterations': iterations,
+        'statuses': sorted(statuses),
+        'throughput_per_s': round(iterations / elapsed, 2),
+        'mean_ms': round(statistics.fmean(latencies) * 1000, 3),
+        'p50_ms': round(_percentile(latencies, 50) * 1000, 3),
+        'p95_ms': round(_percentile(latencies, 95) * 1000, 3),
+        'p99_ms': round(_percentile(latencies, 99) * 1000, 3),
+        'max_ms': round(max(latencies) * 1000, 3),
+        'queries_mean': round(statistics.fmean(queries), 2),
+        'queries_max': max(queries),
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=datagen.ROOT,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _environment():
+    import sqlite3
+
+    import django
+
+    return {
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+    }
+
+
+def compare(current, baseline):
+    """Print the p50/p95/p99 and query changes against a previous run."""
+    print(f"\nvs {baseline.get('commit')} ({baseline.get('sizes')})")
+    print(f"{'scenario':>20} {'p50 ms':>16} {'p95 ms':>16} {'p99 ms':>16} {'queries':>12}")
+    for name, result in current['scenarios'].items():
+        old = baseline.get('scenarios', {}).get(name)
+        if not old:
+            continue
+        cells = []
+        for key in ('p50_ms', 'p95_ms', 'p99_ms'):
+            change = (result[key] / old[key] - 1) * 100 if old[key] else 0
+            cells.append(f'{result[key]:>8.1f} {change:>+6.1f}%')
+        queries = f"{old['queries_mean']:g}->{result['queries_mean']:g}"
+        print(f'{name:>20} {cells[0]:>16} {cells[1]:>16} {cells[2]:>16} {queries:>12}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    datagen.add_size_arguments(parser)
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--warmup', type=int, default=10)
+    parser.add_argument('--output', default='benchmark-results.json')
+    parser.add_argument('--compare', help='JSON de una corrida anterior para comparar')
+    args = parser.parse_args()
+    sizes = datagen.sizes_from_args(args)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        datagen.setup_django(os.path.join(tmp, 'bench.sqlite3'))
+        from django.conf import settings
+        from django.core.management import call_command
+        from django.test.utils import setup_test_environment
+
+        # Como en producción: sin DEBUG (no guarda las consultas en memoria)
+        settings.DEBUG = False
+        setup_test_environment()  # ALLOWED_HOSTS para el test client
+        call_command('migrate', verbosity=0)
+
+        start = time.perf_counter()
+        counts = datagen.generate(sizes, seed=args.seed)
+        print(f'data generated in {time.perf_counter() - start:.1f}s: {counts}')
+
+        bench = Bench(args.seed)
+        results = {}
+        print(f"{'scenario':>20} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'queries':>8}")
+        for name in args.scenarios:
+            r = results[name] = run_scenario(bench, name, args.iterations, args.warmup)
+            print(f"{name:>20} {r['throughput_per_s']:>8.1f} {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} "
+                  f"{r['p99_ms']:>8.1f} {r['queries_mean']:>8g}")
+
+    report = {
+        'commit': _git_commit(),
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'seed': args.seed,
+        'sizes': vars(sizes),
+        'rows': counts,
+        'iterations': args.iterations,
+        'environment': _environment(),
+        'scenarios': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as fh:
+        json.dump(report, fh, indent=2)
+    print(f'results written to {args.output}')
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as fh:
+            compare(report, json.load(fh))
+
+
+if __name__ == '__main__':
+    main()
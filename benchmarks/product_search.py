@@ -0,0 +1,116 @@
+"""
+Benchmark: búsqueda de catálogo con icontains (LIKE) vs índice FTS5 trigram.
+
+Crea una base SQLite temporal con N productos sintéticos (nombre + descripción)
+con el mismo esquema que inventory_product / inventory_product_fts y mide la
+primera página (12 resultados) de varias búsquedas con cada método.
+
+Uso:
+    python benchmarks/product_search.py --sizes 10000 100000 1000000
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from inventory.search_utils import normalize  # noqa: E402
+
+WORDS = [
+    'pan', 'maíz', 'queso', 'almojábana', 'buñuelo', 'croissant', 'mantequilla', 'chocolate',
+    'arequipe', 'guayaba', 'integral', 'centeno', 'tostado', 'hojaldre', 'galleta', 'avena',
+    'canela', 'coco', 'fresa', 'torta', 'mogolla', 'roscón', 'bocadillo', 'dulce', 'salado',
+]
+SYLLABLES = ['ba', 'ce', 'di', 'fo', 'gu', 'la', 'me', 'ni', 'po', 'ru', 'sa', 'te', 'vi', 'zo']
+QUERIES = ['maiz', 'queso', 'roscon guayaba', 'hojaldre', 'xyzzy']
+# Cada término del catálogo aparece en ~0.3% de los productos (como un catálogo
+# real); 'pan' es el término común que aparece en casi todo.
+COMMON_QUERY = 'pan'
+PAGE = 12
+
+
+def _vocabulary(rng, size=5000):
+    words = set(WORDS)
+    while len(words) < size:
+        words.add(''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(3, 5))))
+    return sorted(words)
+
+
+def _text(rng, vocabulary, n):
+    return ' '.join(rng.choice(vocabulary) for _ in range(n)).capitalize()
+
+
+def build(path, size, seed=42):
+    rng = random.Random(seed)
+    vocabulary = _vocabulary(rng)
+    db = sqlite3.connect(path)
+    db.execute('CREATE TABLE inventory_product (id INTEGER PRIMARY KEY, name TEXT, description TEXT)')
+    db.execute("CREATE VIRTUAL TABLE inventory_product_fts USING fts5(name, description, tokenize='trigram')")
+    batch = []
+    for pk in range(1, size + 1):
+        batch.append((pk, f'Pan {_text(rng, vocabulary, 2)} {pk}', _text(rng, vocabulary, 12)))
+        if len(batch) == 10000 or pk == size:
+            db.executemany('INSERT INTO inventory_product VALUES (?, ?, ?)', batch)
+            db.executemany(
+                'INSERT INTO inventory_product_fts (rowid, name, description) VALUES (?, ?, ?)',
+                [(pk_, normalize(n), normalize(d)) for pk_, n, d in batch],
+            )
+            batch = []
+    db.commit()
+    return db
+
+
+def icontains(db, query):
+    # Lo que hacía el catálogo: name__icontains + orden por nombre
+    return db.execute(
+        "SELECT id FROM inventory_product WHERE name LIKE ? ESCAPE '\\' ORDER BY name LIMIT ?",
+        (f'%{query}%', PAGE),
+    ).fetchall()
+
+
+def fts(db, query):
+    # La forma que genera search_products: join con la tabla FTS y orden del catálogo por relevancia
+    match = ' '.join('"%s"' % t.replace('"', '""') for t in normalize(query).split())
+    return db.execute(
+        'SELECT bm25(inventory_product_fts, 10.0, 1.0) AS rank, p.id '
+        'FROM inventory_product p, inventory_product_fts '
+        'WHERE inventory_product_fts MATCH ? AND inventory_product_fts.rowid = p.id '
+        'ORDER BY rank, LOWER(p.name), p.id LIMIT ?',
+        (match, PAGE),
+    ).fetchall()
+
+
+def timed(fn, db, query, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(db, query)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'products':>10} {'query':>16} {'icontains ms':>13} {'fts5 ms':>9}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            db = build(os.path.join(tmp, 'bench.sqlite3'), size)
+            for query in QUERIES + [COMMON_QUERY]:
+                like_ms = timed(icontains, db, query, args.repeat)
+                fts_ms = timed(fts, db, query, args.repeat)
+                print(f'{size:>10} {query:>16} {like_ms:>13.2f} {fts_ms:>9.2f}')
+            db.close()
+
+
+if __name__ == '__main__':
+    main()
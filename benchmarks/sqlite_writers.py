@@ -0,0 +1,141 @@
+"""
+Benchmark: varios procesos escribiendo órdenes a la vez en SQLite.
+
+Compara el perfil por defecto de SQLite (journal DELETE, transacciones
+DEFERRED, timeout de 5 s) con el perfil de settings.DATABASES (WAL,
+synchronous=NORMAL, busy_timeout, IMMEDIATE...). Cada worker crea órdenes con
+create_order (descuento de materias primas, rollup diario, índice de compras)
+y de vez en cuando guarda una RawMaterial con save() (señales), como el POS y
+la tienda en línea a la vez. Se usa una base nueva en un directorio temporal.
+
+Uso:
+    python benchmarks/sqlite_writers.py --workers 8 --seconds 10
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROFILES = ('default', 'tuned')
+
+
+def setup_django(db_path, profile):
+    sys.path.insert(0, ROOT)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Bakery_proyect.settings')
+    from django.conf import settings
+
+    database = settings.DATABASES['default']
+    database['NAME'] = db_path
+    if profile == 'default':
+        database['OPTIONS'] = {}
+        database['CONN_MAX_AGE'] = 0
+
+    import django
+    django.setup()
+
+
+def prepare(db_path, profile, products=50, materials=20):
+    setup_django(db_path, profile)
+    from datetime import date
+    from django.core.management import call_command
+    from inventory.models import Product, ProductRawMaterial, RawMaterial
+
+    call_command('migrate', verbosity=0)
+    rng = random.Random(1)
+    mats = RawMaterial.objects.bulk_create(
+        RawMaterial(name=f'Materia {i}', units=10 ** 9, exp_date=date(2030, 1, 1)) for i in range(materials)
+    )
+    prods = Product.objects.bulk_create(
+        Product(name=f'Producto {i}', price=1000 + i, picture='default.jpg') for i in range(products)
+    )
+    ProductRawMaterial.objects.bulk_create(
+        ProductRawMaterial(product=p, material=m, material_quantity=2)
+        for p in prods for m in rng.sample(mats, 5)
+    )
+
+
+def worker(db_path, profile, seconds, seed, results):
+    latencies, errors = [], 0
+    try:
+        setup_django(db_path, profile)
+        from django.db import OperationalError
+        from inventory.models import Customer, Product, RawMaterial
+        from inventory.order_utils import create_order
+
+        rng = random.Random(seed)
+        product_ids = list(Product.objects.values_list('pk', flat=True))
+        material_ids = list(RawMaterial.objects.values_list('pk', flat=True))
+        customer = None
+        iteration = 0
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            iteration += 1
+            lines = [(pid, rng.randint(1, 3)) for pid in rng.sample(product_ids, 6)]
+            start = time.perf_counter()
+            try:
+                if customer is None:
+                    customer, _ = Customer.objects.get_or_create(cedula=f'BENCH{seed}', defaults={'nombre': f'Worker {seed}'})
+                create_order(lines, customer=customer, paymentMethod='Cash')
+                if iteration % 10 == 0:
+                    material = RawMaterial.objects.get(pk=rng.choice(material_ids))
+                    material.units += 100
+                    material.save()
+            except OperationalError:
+                # "database is locked"
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+    finally:
+        results.put((latencies, errors))
+
+
+def run(profile, workers, seconds):
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.sqlite3')
+        ctx = multiprocessing.get_context('spawn')
+        setup = ctx.Process(target=prepare, args=(db_path, profile))
+        setup.start()
+        setup.join()
+
+        results = ctx.Queue()
+        procs = [ctx.Process(target=worker, args=(db_path, profile, seconds, i, results)) for i in range(workers)]
+        for p in procs:
+            p.start()
+        outcomes = [results.get() for _ in procs]
+        for p in procs:
+            p.join()
+
+    latencies = sorted(lat for lats, _ in outcomes for lat in lats)
+    errors = sum(err for _, err in outcomes)
+    p99 = latencies[max(0, int(len(latencies) * 0.99) - 1)] if latencies else 0
+    return {
+        'profile': profile,
+        'orders_per_s': len(latencies) / seconds,
+        'locked_errors': errors,
+        'p50_ms': statistics.median(latencies) * 1000 if latencies else 0,
+        'p99_ms': p99 * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--profiles', nargs='+', choices=PROFILES, default=list(PROFILES))
+    args = parser.parse_args()
+
+    print(f"{'profile':>8} {'workers':>8} {'orders/s':>9} {'locked':>7} {'p50 ms':>8} {'p99 ms':>8}")
+    for profile in args.profiles:
+        r = run(profile, args.workers, args.seconds)
+        print(f"{r['profile']:>8} {args.workers:>8} {r['orders_per_s']:>9.1f} {r['locked_errors']:>7} "
+              f"{r['p50_ms']:>8.1f} {r['p99_ms']:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
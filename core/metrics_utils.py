@@ -0,0 +1,214 @@
+"""
+Per-view request metrics (query count, DB time, duplicate queries, render
+time, response size), kept in memory by RequestMetricsMiddleware.
+
+Each process keeps its own numbers: cumulative counters for the
+Prometheus-style text at /metrics and a rolling window of the last samples
+per view for the JSON summary (percentiles, N+1 suspects).
+"""
+
+import re
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+from django.conf import settings
+
+# Fracción de requests que se miden (0 desactiva, 1 mide todos)
+SAMPLE_RATE = getattr(settings, 'REQUEST_METRICS_SAMPLE_RATE', 1.0)
+# Muestras por vista que se guardan para percentiles y el resumen JSON
+WINDOW = getattr(settings, 'REQUEST_METRICS_WINDOW', 500)
+# Una consulta repetida al menos estas veces en un mismo request se marca como N+1
+DUPLICATE_THRESHOLD = getattr(settings, 'REQUEST_METRICS_DUPLICATE_THRESHOLD', 3)
+
+_IN_LIST = re.compile(r'\bIN \((?:%s, )*%s\)', re.IGNORECASE)
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_SPACES = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    """SQL with literals and IN lists collapsed, so repeats of the same query match."""
+    sql = _IN_LIST.sub('IN (...)', sql)
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    return _SPACES.sub(' ', sql).strip()
+
+
+@dataclass
+class RequestRecord:
+    """What one sampled request cost."""
+    queries: int = 0
+    db_time: float = 0.0
+    render_time: float = 0.0
+    fingerprints: Counter = field(default_factory=Counter)
+
+    def __call__(self, execute, sql, params, many, context):
+        # execute_wrapper de Django: cada consulta pasa por aquí
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.queries += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    def duplicates(self):
+        """{fingerprint: times run} of the queries repeated DUPLICATE_THRESHOLD times or more."""
+        return {sql: n for sql, n in self.fingerprints.items() if n >= DUPLICATE_THRESHOLD}
+
+
+# Request que se está midiendo en este hilo/tarea (lo usa el render de plantillas)
+current_record = ContextVar('current_record', default=None)
+_templates_instrumented = False
+
+
+def instrument_templates():
+    """Time Django template rendering into the current RequestRecord (idempotent)."""
+    global _templates_instrumented
+    if _templates_instrumented:
+        return
+    from django.template.backends.django import Template
+
+    original = Template.render
+
+    def render(self, *args, **kwargs):
+        record = current_record.get()
+        if record is None:
+            return original(self, *args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return original(self, *args, **kwargs)
+        finally:
+            record.render_time += time.perf_counter() - start
+
+    Template.render = render
+    _templates_instrumented = True
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class ViewStats:
+    """Cumulative counters and the rolling window of one view."""
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.queries = 0
+        self.duplicate_queries = 0
+        self.seconds = 0.0
+        self.db_seconds = 0.0
+        self.render_seconds = 0.0
+        self.response_bytes = 0
+        # (latency, queries, db_time, render_time, size)
+        self.samples = deque(maxlen=WINDOW)
+        self.duplicates = Counter()
+
+    def add(self, record, latency, size, status):
+        duplicates = record.duplicates()
+        self.requests += 1
+        self.errors += status >= 500
+        self.queries += record.queries
+        self.duplicate_queries += sum(n - 1 for n in duplicates.values())
+        self.seconds += latency
+        self.db_seconds += record.db_time
+        self.render_seconds += record.render_time
+        self.response_bytes += size
+        self.samples.append((latency, record.queries, record.db_time, record.render_time, size))
+        for sql, n in duplicates.items():
+            # Máximo de repeticiones vistas en un request
+            self.duplicates[sql] = max(self.duplicates[sql], n)
+
+    def summary(self):
+        latencies = [s[0] for s in self.samples]
+        queries = [s[1] for s in self.samples]
+        count = len(self.samples) or 1
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'window': len(self.samples),
+            'p50_ms': round(_percentile(latencies, 50) * 1000, 2),
+            'p95_ms': round(_percentile(latencies, 95) * 1000, 2),
+            'p99_ms': round(_percentile(latencies, 99) * 1000, 2),
+            'avg_queries': round(sum(queries) / count, 2),
+            'max_queries': max(queries, default=0),
+            'avg_db_ms': round(sum(s[2] for s in self.samples) / count * 1000, 2),
+            'avg_render_ms': round(sum(s[3] for s in self.samples) / count * 1000, 2),
+            'avg_bytes': round(sum(s[4] for s in self.samples) / count),
+            'duplicate_queries': [
+                {'sql': sql, 'max_repeats': n} for sql, n in self.duplicates.most_common(5)
+            ],
+        }
+
+
+_stats = defaultdict(ViewStats)
+_stats_lock = threading.Lock()
+
+
+def record_request(view, record, latency, size, status):
+    """Add a sampled request to the per-view stats."""
+    with _stats_lock:
+        _stats[view].add(record, latency, size, status)
+
+
+def reset_metrics():
+    """Forget everything (tests, or after a deploy)."""
+    with _stats_lock:
+        _stats.clear()
+
+
+def metrics_summary():
+    """Per-view summary for the staff JSON endpoint, slowest p95 first."""
+    with _stats_lock:
+        views = {view: stats.summary() for view, stats in _stats.items()}
+    return {
+        'sample_rate': SAMPLE_RATE,
+        'views': dict(sorted(views.items(), key=lambda kv: -kv[1]['p95_ms'])),
+    }
+
+
+# (nombre, ayuda, atributo de ViewStats)
+_COUNTERS = [
+    ('bakery_requests_total', 'Sampled requests', 'requests'),
+    ('bakery_request_errors_total', 'Sampled requests answered with a 5xx', 'errors'),
+    ('bakery_request_seconds_total', 'Time spent handling sampled requests', 'seconds'),
+    ('bakery_db_queries_total', 'Queries run by sampled requests', 'queries'),
+    ('bakery_db_duplicate_queries_total', 'Repeated queries (N+1 suspects) in sampled requests', 'duplicate_queries'),
+    ('bakery_db_seconds_total', 'Time spent in the database by sampled requests', 'db_seconds'),
+    ('bakery_render_seconds_total', 'Time spent rendering templates in sampled requests', 'render_seconds'),
+    ('bakery_response_bytes_total', 'Response bytes of sampled requests', 'response_bytes'),
+]
+
+
+def _label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"')
+
+
+def metrics_text():
+    """Counters and latency quantiles in the Prometheus text format."""
+    with _stats_lock:
+        rows = [
+            (view, {attr: getattr(stats, attr) for _, _, attr in _COUNTERS}, [s[0] for s in stats.samples])
+            for view, stats in sorted(_stats.items())
+        ]
+
+    lines = []
+    for name, help_text, attr in _COUNTERS:
+        lines += [f'# HELP {name} {help_text}.', f'# TYPE {name} counter']
+        lines += [f'{name}{{view="{_label(view)}"}} {values[attr]}' for view, values, _ in rows]
+
+    name = 'bakery_request_latency_seconds'
+    lines += [f'# HELP {name} Latency of the last sampled requests.', f'# TYPE {name} summary']
+    for view, values, latencies in rows:
+        for q in (0.5, 0.95, 0.99):
+            lines.append(f'{name}{{view="{_label(view)}",quantile="{q}"}} {_percentile(latencies, q * 100):.6f}')
+        lines.append(f'{name}_sum{{view="{_label(view)}"}} {values["seconds"]:.6f}')
+        lines.append(f'{name}_count{{view="{_label(view)}"}} {values["requests"]}')
+    return '\n'.join(lines) + '\n'
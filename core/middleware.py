@@ -0,0 +1,49 @@
+import random
+import time
+from contextlib import ExitStack
+
+from django.db import connections
+
+from . import metrics_utils
+
+
+class RequestMetricsMiddleware:
+    """
+    Measure a sample of the requests (REQUEST_METRICS_SAMPLE_RATE): queries,
+    DB time, repeated queries, template render time, response size and total
+    latency, grouped by view name. Goes first in MIDDLEWARE so the session
+    and auth queries count too. See core.metrics_utils.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        metrics_utils.instrument_templates()
+
+    def __call__(self, request):
+        rate = metrics_utils.SAMPLE_RATE
+        if rate <= 0 or (rate < 1 and random.random() >= rate):
+            return self.get_response(request)
+
+        record = metrics_utils.RequestRecord()
+        token = metrics_utils.current_record.set(record)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(record))
+                response = self.get_response(request)
+        finally:
+            metrics_utils.current_record.reset(token)
+        latency = time.perf_counter() - start
+
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        metrics_utils.record_request(view, record, latency, _response_size(response), response.status_code)
+        return response
+
+
+def _response_size(response):
+    if response.streaming:
+        # Archivos/CSV en streaming: solo se conoce si trae Content-Length
+        return int(response.get('Content-Length') or 0)
+    return len(response.content)
@@ -0,0 +1,22 @@
+"""
+Helpers shared by the apps' test modules.
+"""
+
+from django.core.cache import cache
+
+from inventory.bom_utils import invalidate_bom
+from inventory.promo_utils import invalidate_promotion_snapshot
+
+
+class FreshCachesMixin:
+    """
+    Start every test with empty caches: the in-memory bill of materials and
+    promotion snapshot (they don't see the rollback between tests) and the
+    Django cache (KPIs, low-stock counts...). Subclasses call super().setUp().
+    """
+
+    def setUp(self):
+        super().setUp()
+        invalidate_bom()
+        invalidate_promotion_snapshot()
+        cache.clear()
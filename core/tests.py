@@ -1,3 +1,91 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from inventory.models import Product
+from . import metrics_utils
+from .testing_utils import FreshCachesMixin
+
+
+class RequestMetricsTests(FreshCachesMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        metrics_utils.reset_metrics()
+        Product.objects.create(name='Pan', price=1000, picture='default.jpg')
+        self.staff = User.objects.create_user('staff', password='x', is_staff=True)
+
+    def test_records_cost_per_view(self):
+        self.client.get(reverse('pos'))
+        self.client.get(reverse('pos'))
+
+        pos = metrics_utils.metrics_summary()['views']['pos']
+        self.assertEqual(pos['requests'], 2)
+        self.assertEqual(pos['window'], 2)
+        self.assertGreater(pos['avg_queries'], 0)
+        self.assertGreater(pos['avg_bytes'], 0)
+        self.assertGreater(pos['avg_render_ms'], 0)
+        self.assertGreaterEqual(pos['p95_ms'], pos['p50_ms'])
+
+    def test_repeated_queries_are_flagged(self):
+        record = metrics_utils.RequestRecord()
+        with connection.execute_wrapper(record):
+            for pk in range(1, 5):
+                list(Product.objects.filter(pk=pk))
+            list(Product.objects.filter(pk__in=[1, 2, 3]))
+        self.assertEqual(record.queries, 5)
+        [(sql, repeats)] = record.duplicates().items()
+        self.assertEqual(repeats, 4)
+        self.assertIn('"inventory_product"."id" = %s', sql)
+
+        metrics_utils.record_request('catalog', record, 0.01, 100, 200)
+        stats = metrics_utils.metrics_summary()['views']['catalog']
+        self.assertEqual(stats['duplicate_queries'], [{'sql': sql, 'max_repeats': 4}])
+
+    def test_fingerprint_collapses_literals_and_in_lists(self):
+        self.assertEqual(
+            metrics_utils.fingerprint("SELECT * FROM t WHERE id IN (%s, %s, %s) AND name = 'x'  LIMIT 21"),
+            metrics_utils.fingerprint("SELECT * FROM t WHERE id IN (%s) AND name = 'y' LIMIT 10"),
+        )
+
+    def test_sampling_off_records_nothing(self):
+        with mock.patch.object(metrics_utils, 'SAMPLE_RATE', 0):
+            self.client.get(reverse('pos'))
+        self.assertEqual(metrics_utils.metrics_summary()['views'], {})
+
+    @override_settings(METRICS_TOKEN='s3cret')
+    def test_metrics_endpoint_access(self):
+        self.client.get(reverse('pos'))
+        url = reverse('metrics')
+
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer nope').status_code, 403)
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer contraseña').status_code, 403)
+
+        response = self.client.get(url, HTTP_AUTHORIZATION='Bearer s3cret')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        body = response.content.decode()
+        self.assertIn('bakery_requests_total{view="pos"} 1', body)
+        self.assertIn('bakery_request_latency_seconds{view="pos",quantile="0.95"}', body)
+
+        self.client.force_login(self.staff)
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_summary_is_for_staff(self):
+        url = reverse('metrics_summary')
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+        self.client.force_login(self.staff)
+        self.client.get(reverse('pos'))
+        summary = self.client.get(url).json()
+        self.assertIn('pos', summary['views'])
+        self.assertEqual(summary['sample_rate'], metrics_utils.SAMPLE_RATE)
+
+    @override_settings(METRICS_TOKEN='señal')
+    def test_non_ascii_token(self):
+        url = reverse('metrics')
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer señal').status_code, 200)
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer senal').status_code, 403)
@@ -9,4 +9,32 @@ def landingPageAdmin(request):
     return render(request,"index.html")
 
 def about(request):
-    return render(request, 'about.html')
\ No newline at end of file
+    return render(request, 'about.html')
+
+# --------------------------------------------
+# Métricas por vista (ver core/metrics_utils.py)
+# --------------------------------------------
+import hmac
+
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import HttpResponse, HttpResponseForbidden, JsonResponse
+
+from .metrics_utils import metrics_summary as _metrics_summary, metrics_text
+
+
+def metrics(request):
+    """Prometheus-style text. For staff users, or with `Authorization: Bearer <METRICS_TOKEN>`."""
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    sent = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+    allowed = request.user.is_active and request.user.is_staff
+    # compare_digest con str solo admite ASCII: se comparan bytes
+    if not allowed and not (token and hmac.compare_digest(sent.encode(), token.encode())):
+        return HttpResponseForbidden()
+    return HttpResponse(metrics_text(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@staff_member_required
+def metrics_summary(request):
+    """Rolling JSON summary per view: percentiles, queries, render time, repeated queries."""
+    return JsonResponse(_metrics_summary())
@@ -0,0 +1,133 @@
+"""
+request.user -> inventory.Customer resolution.
+
+The resolved customer id is kept in the session, so after the first request
+of a login it costs no queries. A Customer created here is linked to the
+user through a CustomerProfile: user is a OneToOne there, so two concurrent
+first requests can't leave two Customers for the same user.
+"""
+
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.db.models.functions import Lower
+
+from inventory.models import Customer, normalize_cedula
+from .models import CustomerProfile
+
+# (user_id, customer_id) del último cliente resuelto en esta sesión
+SESSION_KEY = '_customer_for_user'
+
+
+def _lookup_customer_id(user):
+    """Existing customer for the user: profile, email, full name, username/cedula."""
+    customer_id = CustomerProfile.objects.filter(user_id=user.pk).values_list('customer_id', flat=True).first()
+    if customer_id:
+        return customer_id
+
+    customers = Customer.objects.order_by('pk').values_list('pk', flat=True)
+    if user.email:
+        # Igualdad sobre LOWER(correo): usa el índice customer_correo_lower_idx
+        customer_id = customers.annotate(correo_lower=Lower('correo')).filter(correo_lower=user.email.lower()).first()
+        if customer_id:
+            return customer_id
+
+    full_name = (user.get_full_name() or '').strip()
+    if full_name:
+        customer_id = customers.filter(nombre__iexact=full_name).first()
+        if customer_id:
+            return customer_id
+
+    return customers.filter(Q(cedula=normalize_cedula(user.username)) | Q(nombre__iexact=user.username)).first()
+
+
+def _create_customer_for(user):
+    """Create the user's Customer and its profile; if another request won the race, use theirs."""
+    full_name = (user.get_full_name() or '').strip()
+    try:
+        with transaction.atomic():
+            customer = Customer.objects.create(
+                # Cédula provisional que no choca con las reales (son únicas)
+                cedula=f'USER{user.id}',
+                nombre=full_name or user.username,
+                correo=user.email or None,
+            )
+            CustomerProfile.objects.create(user=user, customer=customer)
+            return customer.pk
+    except IntegrityError:
+        # Otro request creó el perfil primero (user es OneToOne): se descarta el nuestro
+        return CustomerProfile.objects.filter(user_id=user.pk).values_list('customer_id', flat=True).first()
+
+
+def resolve_customer_id(user):
+    """Customer id for the user, creating the Customer (and profile) when none matches."""
+    return _lookup_customer_id(user) or _create_customer_for(user)
+
+
+def get_customer_id(request):
+    """
+    Customer id of the logged-in user, cached in the session
+    (None for anonymous users).
+    """
+    user = request.user
+    if not user.is_authenticated:
+        return None
+    cached = request.session.get(SESSION_KEY)
+    if cached and cached[0] == user.pk:
+        return cached[1]
+    customer_id = resolve_customer_id(user)
+    # None (la carrera de _create_customer_for sin perfil visible) no se guarda: se reintenta
+    if customer_id is not None:
+        request.session[SESSION_KEY] = [user.pk, customer_id]
+    return customer_id
+
+
+def forget_customer_id(request):
+    """Drop the cached id (e.g. the customer was deleted or the profile changed)."""
+    request.session.pop(SESSION_KEY, None)
+
+
+def upsert_customer(cedula='', nombre='', correo=''):
+    """
+    Customer for the data sent with an order, creating it only if needed.
+    The cédula (normalized, unique) is the key; without cédula the email is
+    used; with only a name a new customer is created. Name/email only fill
+    the fields the customer doesn't have yet (what the customer registered
+    is not overwritten by what a cashier types). Returns None when no data
+    was sent.
+    """
+    cedula = normalize_cedula(cedula)
+    nombre = (nombre or '').strip()
+    correo = (correo or '').strip()
+
+    created = False
+    if cedula:
+        # get_or_create reintenta el get si otro request la creó primero (índice único)
+        customer, created = Customer.objects.get_or_create(
+            cedula=cedula, defaults={'nombre': nombre or cedula, 'correo': correo or None}
+        )
+    elif correo:
+        customer = (
+            Customer.objects.annotate(correo_lower=Lower('correo'))
+            .filter(correo_lower=correo.lower())
+            .order_by('pk')
+            .first()
+        )
+        if customer is None:
+            customer, created = Customer.objects.create(cedula='', nombre=nombre, correo=correo), True
+    elif nombre:
+        customer, created = Customer.objects.create(cedula='', nombre=nombre), True
+    else:
+        return None
+
+    if not created:
+        changed = []
+        # Sin nombre real: vacío o la cédula que se puso de relleno al crearlo
+        if nombre and (customer.nombre or '') in ('', customer.cedula):
+            customer.nombre = nombre
+            changed.append('nombre')
+        if correo and not customer.correo:
+            customer.correo = correo
+            changed.append('correo')
+        if changed:
+            customer.save(update_fields=changed)
+    return customer
@@ -0,0 +1,168 @@
+"""
+Merge customers that share the same (normalized) cédula.
+
+Everything that points to a Customer is moved to the surviving row with a
+few set-based UPDATEs per batch. Rows that would break a unique constraint
+on the survivor (a second rating of the same product, a second shopping
+list for the same week...) are dropped instead. Two registered users
+(CustomerProfile) sharing a cédula are not merged: that would delete one
+of the logins' profile, so the merge stops with ProfileConflict and the
+rows have to be fixed by hand.
+
+The functions take an ``apps`` registry (the installed apps by default).
+The migration that made the cédula unique (inventory 0007) keeps its own
+copy of this logic, since migrations can't depend on app code; there the
+profile conflicts are reported and kept apart instead of stopping migrate.
+"""
+
+from collections import defaultdict
+
+from django.apps import apps as global_apps
+from django.db.models import Case, IntegerField, Value, When
+
+from inventory.models import normalize_cedula
+
+# Tablas con FK a Customer y los campos que, junto al cliente, deben ser únicos
+CUSTOMER_RELATIONS = [
+    ('inventory', 'Order', None),
+    ('inventory', 'Rating', ('product_id',)),
+    ('inventory', 'CustomerPurchase', ('product_id',)),
+    ('customers', 'ShoppingList', ('week_number', 'year')),
+    ('customers', 'CustomerProfile', ()),
+    ('customers', 'CookieConsent', ()),
+]
+
+
+class ProfileConflict(Exception):
+    """Registered users that share a cédula; merging them would drop a CustomerProfile."""
+
+    def __init__(self, conflicts):
+        self.conflicts = conflicts
+        super().__init__(
+            'customers with a profile share a cédula: '
+            + ', '.join(f'{survivor} <- {losers}' for survivor, losers in sorted(conflicts.items()))
+        )
+
+
+def _survivor_key(customer_id, has_profile):
+    # Primero el que tiene perfil (usuario registrado), luego el más antiguo
+    return (not has_profile, customer_id)
+
+
+def find_duplicates(apps=global_apps):
+    """
+    Group customers by normalized cédula.
+    Returns ({loser_id: survivor_id}, {customer_id: normalized cedula} of the
+    rows whose stored cedula is not normalized yet).
+    """
+    Customer = apps.get_model('inventory', 'Customer')
+    CustomerProfile = apps.get_model('customers', 'CustomerProfile')
+    with_profile = set(CustomerProfile.objects.values_list('customer_id', flat=True))
+
+    groups = defaultdict(list)
+    renamed = {}
+    for pk, cedula in Customer.objects.values_list('pk', 'cedula').iterator(chunk_size=5000):
+        normalized = normalize_cedula(cedula)
+        if normalized != cedula:
+            renamed[pk] = normalized
+        if normalized:
+            groups[normalized].append(pk)
+
+    merges = {}
+    for ids in groups.values():
+        if len(ids) < 2:
+            continue
+        ids.sort(key=lambda pk: _survivor_key(pk, pk in with_profile))
+        for loser in ids[1:]:
+            merges[loser] = ids[0]
+    return merges, renamed
+
+
+def profile_conflicts(merges, apps=global_apps):
+    """
+    {survivor_id: [loser_id, ...]} of the merges whose loser also has a
+    CustomerProfile (the survivor is always one with a profile if any has).
+    """
+    CustomerProfile = apps.get_model('customers', 'CustomerProfile')
+    conflicts = defaultdict(list)
+    for customer_id in sorted(CustomerProfile.objects.values_list('customer_id', flat=True)):
+        if customer_id in merges:
+            conflicts[merges[customer_id]].append(customer_id)
+    return dict(conflicts)
+
+
+def _repoint(model, merges, unique_with):
+    """Move model rows from the losers to their survivor; drop the ones that would collide."""
+    rows = model.objects.filter(customer_id__in=list(merges))
+    if unique_with is not None:
+        fields = ('pk', 'customer_id', *unique_with)
+        survivors = set(merges.values())
+        taken = {
+            (row[1], *row[2:])
+            for row in model.objects.filter(customer_id__in=survivors).values_list(*fields)
+        }
+        drop = []
+        for row in rows.values_list(*fields).order_by('pk'):
+            key = (merges[row[1]], *row[2:])
+            if key in taken:
+                drop.append(row[0])
+            else:
+                taken.add(key)
+        if drop:
+            model.objects.filter(pk__in=drop).delete()
+
+    new_customer = Case(
+        *[When(customer_id=loser, then=Value(survivor)) for loser, survivor in merges.items()],
+        output_field=IntegerField(),
+    )
+    return rows.update(customer_id=new_customer)
+
+
+def merge_customers(merges, apps=global_apps, batch_size=500):
+    """
+    Re-point every relation from the losers to their survivor, copy the
+    name/email the survivor is missing and delete the losers.
+    merges: {loser_id: survivor_id}. Returns the number of deleted customers.
+    Raises ProfileConflict, before changing anything, if a loser has a profile.
+    """
+    conflicts = profile_conflicts(merges, apps)
+    if conflicts:
+        raise ProfileConflict(conflicts)
+    Customer = apps.get_model('inventory', 'Customer')
+    items = list(merges.items())
+    for start in range(0, len(items), batch_size):
+        batch = dict(items[start:start + batch_size])
+        for app_label, model_name, unique_with in CUSTOMER_RELATIONS:
+            _repoint(apps.get_model(app_label, model_name), batch, unique_with)
+
+        # Completar nombre/correo del sobreviviente con los de los duplicados
+        customers = Customer.objects.in_bulk(list(batch) + list(set(batch.values())))
+        changed = {}
+        for loser_id, survivor_id in batch.items():
+            loser, survivor = customers[loser_id], customers[survivor_id]
+            for field in ('nombre', 'correo'):
+                if not getattr(survivor, field) and getattr(loser, field):
+                    setattr(survivor, field, getattr(loser, field))
+                    changed[survivor_id] = survivor
+        Customer.objects.bulk_update(changed.values(), ['nombre', 'correo'])
+        Customer.objects.filter(pk__in=list(batch)).delete()
+    return len(merges)
+
+
+def normalize_cedulas(renamed, apps=global_apps, batch_size=1000):
+    """Store the normalized cédula of the given {customer_id: cedula} rows."""
+    Customer = apps.get_model('inventory', 'Customer')
+    Customer.objects.bulk_update(
+        [Customer(pk=pk, cedula=cedula) for pk, cedula in renamed.items()],
+        ['cedula'],
+        batch_size=batch_size,
+    )
+    return len(renamed)
+
+
+def dedupe_customers(apps=global_apps):
+    """Merge duplicates and normalize the remaining cédulas. Returns (merged, renamed)."""
+    merges, renamed = find_duplicates(apps)
+    merged = merge_customers(merges, apps)
+    renamed = {pk: cedula for pk, cedula in renamed.items() if pk not in merges}
+    return merged, normalize_cedulas(renamed, apps)
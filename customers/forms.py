@@ -5,7 +5,7 @@ Forms for customer registration and authentication.
 from django import forms
 from django.contrib.auth.models import User
 from django.contrib.auth.forms import UserCreationForm
-from inventory.models import Customer
+from inventory.models import Customer, normalize_cedula
 from .models import CustomerProfile
 
 
@@ -93,7 +93,7 @@ class CustomerRegistrationForm(UserCreationForm):
     
     def clean_cedula(self):
         """Validate that cedula is unique"""
-        cedula = self.cleaned_data.get('cedula')
+        cedula = normalize_cedula(self.cleaned_data.get('cedula'))
         if Customer.objects.filter(cedula=cedula).exists():
             raise forms.ValidationError("A customer with this ID number already exists.")
         return cedula
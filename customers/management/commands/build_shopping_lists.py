@@ -0,0 +1,72 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+from customers.shopping_list_utils import (
+    LOOKBACK_WEEKS,
+    MIN_FREQUENCY,
+    customer_chunks,
+    suggestions_for_chunk,
+    weeks_back,
+    write_shopping_lists,
+)
+
+
+class Command(BaseCommand):
+    help = 'Build the weekly draft ShoppingLists of every customer from their purchase history'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Day inside the week to build (YYYY-MM-DD). Default: today')
+        parser.add_argument('--weeks', type=int, default=LOOKBACK_WEEKS, help='Weeks of history to look at')
+        parser.add_argument('--min-frequency', type=float, default=MIN_FREQUENCY,
+                            help='Minimum fraction of weeks a product was bought to be suggested')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Customers per chunk')
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Threads reading/computing chunks in parallel (writes stay in this thread)')
+
+    def handle(self, *args, **options):
+        target = self._parse_day(options['date']) or timezone.localdate()
+        weeks = options['weeks']
+        if weeks < 1:
+            raise CommandError('--weeks must be at least 1')
+        first_week = weeks_back(target, weeks)
+        year, week_number, _ = target.isocalendar()
+
+        def compute(customer_range):
+            try:
+                return suggestions_for_chunk(customer_range, first_week, weeks, options['min_frequency'])
+            finally:
+                # Cada hilo abre su propia conexión
+                if options['workers'] > 1:
+                    connection.close()
+
+        chunks = list(customer_chunks(options['chunk_size']))
+        if options['workers'] > 1:
+            executor = ThreadPoolExecutor(max_workers=options['workers'])
+            results = executor.map(compute, chunks)
+        else:
+            executor = None
+            results = map(compute, chunks)
+
+        lists = items = 0
+        try:
+            for customer_range, suggestions in zip(chunks, results):
+                written_lists, written_items = write_shopping_lists(suggestions, week_number, year, customer_range)
+                lists += written_lists
+                items += written_items
+        finally:
+            if executor:
+                executor.shutdown()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Week {week_number}/{year}: {lists} shopping lists, {items} items ({len(chunks)} chunks)'
+        ))
+
+    def _parse_day(self, value):
+        if not value:
+            return None
+        try:
+            return datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError(f'Invalid date "{value}", expected YYYY-MM-DD')
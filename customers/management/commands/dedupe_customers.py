@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from customers.dedupe_utils import ProfileConflict, find_duplicates, merge_customers, normalize_cedulas, profile_conflicts
+
+
+class Command(BaseCommand):
+    help = 'Merge customers with the same (normalized) cédula, moving their orders, ratings and profiles'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be merged')
+        parser.add_argument('--batch-size', type=int, default=500, help='Duplicates merged per UPDATE')
+
+    def handle(self, *args, **options):
+        merges, renamed = find_duplicates()
+        renamed = {pk: cedula for pk, cedula in renamed.items() if pk not in merges}
+        survivors = len(set(merges.values()))
+
+        if options['dry_run']:
+            self.stdout.write(
+                f'{len(merges)} duplicates of {survivors} customers would be merged, '
+                f'{len(renamed)} cédulas normalized'
+            )
+            for survivor, losers in sorted(profile_conflicts(merges).items()):
+                self.stderr.write(f'conflict: customers {[survivor, *losers]} are registered users with the same cédula')
+            return
+
+        try:
+            with transaction.atomic():
+                merge_customers(merges, batch_size=options['batch_size'])
+                normalize_cedulas(renamed)
+        except ProfileConflict as e:
+            raise CommandError(f'Nothing merged: {e}. Fix their cédulas by hand and run it again.')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(merges)} duplicates merged into {survivors} customers, {len(renamed)} cédulas normalized'
+        ))
@@ -0,0 +1,204 @@
+"""
+Weekly shopping lists computed for many customers at once.
+
+The purchase history is read with one grouped query per chunk of customers
+(customer x product x week -> units) and turned into NumPy arrays; the
+frequency and suggested quantity of every (customer, product) pair come out
+of a couple of bincounts instead of a loop per customer.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime, time, timedelta
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Case, IntegerField, Sum, Value, When
+from django.utils import timezone
+
+from inventory.models import Customer, OrderItem
+from .models import ShoppingList, ShoppingListItem
+
+# Semanas de historial que se miran hacia atrás
+LOOKBACK_WEEKS = 8
+# Un producto entra a la lista si se compró al menos en esta fracción de semanas
+MIN_FREQUENCY = 0.25
+
+
+@dataclass
+class Suggestions:
+    """Parallel arrays, one entry per suggested (customer, product)."""
+    customer_ids: np.ndarray
+    product_ids: np.ndarray
+    quantities: np.ndarray
+    frequencies: np.ndarray
+
+    def __len__(self):
+        return len(self.customer_ids)
+
+
+def week_start(day):
+    """Monday of the week of ``day``."""
+    return day - timedelta(days=day.weekday())
+
+
+def purchase_matrix(first_week, weeks, customer_range=None):
+    """
+    Sparse customer x product x week matrix of units bought, from one
+    grouped query over OrderItem. Returns (customer_ids, product_ids,
+    week_index, units) arrays; week_index counts weeks from first_week.
+    customer_range: optional (first_id, last_id) to read one chunk.
+    """
+    start = week_start(first_week)
+    boundaries = [
+        timezone.make_aware(datetime.combine(start + timedelta(weeks=i), time.min))
+        for i in range(weeks + 1)
+    ]
+    items = OrderItem.objects.filter(
+        order__customer__isnull=False,
+        order__date__gte=boundaries[0],
+        order__date__lt=boundaries[-1],
+    )
+    if customer_range:
+        items = items.filter(order__customer_id__gte=customer_range[0], order__customer_id__lte=customer_range[1])
+
+    # Número de semana con un CASE sobre los límites (TruncWeek en SQLite es una
+    # función Python que se llama por cada fila)
+    week = Case(
+        *[When(order__date__lt=boundary, then=Value(i)) for i, boundary in enumerate(boundaries[1:])],
+        output_field=IntegerField(),
+    )
+    rows = list(
+        items.annotate(week=week)
+        .values('order__customer_id', 'product_id', 'week')
+        .annotate(units=Sum('quantity'))
+        .values_list('order__customer_id', 'product_id', 'week', 'units')
+        .order_by()
+    )
+    if not rows:
+        empty = np.array([], dtype=np.int64)
+        return empty, empty, empty, empty
+
+    matrix = np.array(rows, dtype=np.int64)
+    return matrix[:, 0], matrix[:, 1], matrix[:, 2], matrix[:, 3]
+
+
+def compute_suggestions(customer_ids, product_ids, week_index, units, weeks, min_frequency=MIN_FREQUENCY):
+    """
+    Frequency (weeks with a purchase / weeks looked at) and suggested
+    quantity (units usually bought on a week it is bought, rounded up) for
+    every (customer, product) pair. Pairs below min_frequency are dropped.
+    """
+    if not len(customer_ids):
+        return Suggestions(customer_ids, product_ids, units, units.astype(np.float64))
+
+    # Cada fila de la consulta es un (cliente, producto, semana) distinto
+    pairs = np.stack([customer_ids, product_ids], axis=1)
+    unique_pairs, pair_index = np.unique(pairs, axis=0, return_inverse=True)
+    pair_index = pair_index.reshape(-1)
+    weeks_bought = np.bincount(pair_index, minlength=len(unique_pairs))
+    total_units = np.bincount(pair_index, weights=units, minlength=len(unique_pairs))
+
+    frequency = weeks_bought / weeks
+    quantity = np.ceil(total_units / weeks_bought).astype(np.int64)
+    keep = (frequency >= min_frequency) & (quantity > 0)
+    return Suggestions(
+        customer_ids=unique_pairs[keep, 0],
+        product_ids=unique_pairs[keep, 1],
+        quantities=quantity[keep],
+        frequencies=np.round(frequency[keep], 4),
+    )
+
+
+def write_shopping_lists(suggestions, week_number, year, customer_range=None, batch_size=2000):
+    """
+    Write the suggestions as draft ShoppingLists for the given ISO week.
+    Lists already confirmed (or no longer drafts) are left untouched. In the
+    drafts, suggested lines are updated or added, lines no longer suggested
+    are removed unless the customer edited them (``user_quantity``), and a
+    draft left without lines is deleted, so re-running is idempotent.
+    customer_range: (first_id, last_id) the suggestions were computed for;
+    drafts of customers in it that no longer qualify are cleaned up too.
+    Returns (lists_written, items_written).
+    """
+    customer_ids = {int(c) for c in np.unique(suggestions.customer_ids)}
+    lists = ShoppingList.objects.filter(week_number=week_number, year=year)
+    if customer_range:
+        lists = lists.filter(customer_id__gte=customer_range[0], customer_id__lte=customer_range[1])
+    elif customer_ids:
+        lists = lists.filter(customer_id__in=customer_ids)
+    else:
+        return 0, 0
+
+    with transaction.atomic():
+        existing = {
+            customer_id: (pk, editable)
+            for customer_id, pk, editable in lists.values_list('customer_id', 'pk', 'is_draft')
+        }
+        locked = {c for c, (_, editable) in existing.items() if not editable}
+        drafts = [pk for c, (pk, editable) in existing.items() if editable]
+        # (lista, producto) -> (pk, user_quantity) de las líneas de los borradores
+        lines = {
+            (list_id, product_id): (pk, user_quantity)
+            for pk, list_id, product_id, user_quantity in ShoppingListItem.objects.filter(
+                shopping_list_id__in=drafts
+            ).values_list('pk', 'shopping_list_id', 'product_id', 'user_quantity')
+        }
+
+        new_lists = ShoppingList.objects.bulk_create(
+            [
+                ShoppingList(customer_id=c, week_number=week_number, year=year)
+                for c in sorted(customer_ids - set(existing))
+            ],
+            batch_size=batch_size,
+        )
+        list_ids = {c: pk for c, (pk, editable) in existing.items() if editable}
+        list_ids.update({shopping_list.customer_id: shopping_list.pk for shopping_list in new_lists})
+
+        to_create, to_update = [], []
+        for c, p, q, f in zip(
+            suggestions.customer_ids.tolist(),
+            suggestions.product_ids.tolist(),
+            suggestions.quantities.tolist(),
+            suggestions.frequencies.tolist(),
+        ):
+            if c in locked:
+                continue
+            item = ShoppingListItem(
+                shopping_list_id=list_ids[c], product_id=p, suggested_quantity=q, average_frequency=f,
+            )
+            line = lines.pop((item.shopping_list_id, p), None)
+            if line is None:
+                to_create.append(item)
+            else:
+                # Se conserva la cantidad que escribió el cliente
+                item.pk, item.user_quantity = line
+                to_update.append(item)
+
+        # Lo que quedó en lines ya no se sugiere: se borra salvo que el cliente lo haya editado
+        ShoppingListItem.objects.filter(
+            pk__in=[pk for pk, user_quantity in lines.values() if user_quantity is None]
+        ).delete()
+        ShoppingListItem.objects.bulk_update(to_update, ['suggested_quantity', 'average_frequency'], batch_size=batch_size)
+        ShoppingListItem.objects.bulk_create(to_create, batch_size=batch_size)
+        # Borradores de clientes que ya no califican (sin líneas sugeridas ni editadas)
+        ShoppingList.objects.filter(pk__in=list(list_ids.values()), items__isnull=True).delete()
+    return len({c for c in customer_ids if c not in locked}), len(to_create) + len(to_update)
+
+
+def customer_chunks(chunk_size):
+    """(first_id, last_id) ranges of customers with at most chunk_size customers each."""
+    ids = list(Customer.objects.order_by('pk').values_list('pk', flat=True))
+    for offset in range(0, len(ids), chunk_size):
+        chunk = ids[offset:offset + chunk_size]
+        yield chunk[0], chunk[-1]
+
+
+def suggestions_for_chunk(customer_range, first_week, weeks, min_frequency=MIN_FREQUENCY):
+    """Read and compute one chunk of customers (safe to run in a worker thread)."""
+    matrix = purchase_matrix(first_week, weeks, customer_range)
+    return compute_suggestions(*matrix, weeks=weeks, min_frequency=min_frequency)
+
+
+def weeks_back(target_day, weeks=LOOKBACK_WEEKS):
+    """First day of the history window that ends the week before target_day."""
+    return week_start(target_day) - timedelta(weeks=weeks)
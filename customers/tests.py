@@ -0,0 +1,186 @@
+import json
+from io import StringIO
+from unittest import mock
+
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.test import RequestFactory, TestCase
+from django.urls import reverse
+
+from core.testing_utils import FreshCachesMixin
+from inventory.models import Customer, Order, Product, Rating
+from inventory.order_utils import create_order
+from .customer_utils import SESSION_KEY, get_customer_id, resolve_customer_id, upsert_customer
+from .dedupe_utils import ProfileConflict, find_duplicates, merge_customers, normalize_cedulas
+from .models import CustomerProfile, ShoppingList, ShoppingListItem
+from .shopping_list_utils import Suggestions, write_shopping_lists
+
+
+class CustomerResolutionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('ana', email='Ana@Example.com', password='x')
+
+    def _request(self, session=None):
+        request = RequestFactory().get('/')
+        request.user = self.user
+        request.session = {} if session is None else session
+        return request
+
+    def test_matches_email_case_insensitively(self):
+        customer = Customer.objects.create(cedula='10', nombre='Ana', correo='ana@example.com')
+        self.assertEqual(resolve_customer_id(self.user), customer.pk)
+
+    def test_cached_in_session_after_first_request(self):
+        session = {}
+        customer_id = get_customer_id(self._request(session))
+        with self.assertNumQueries(0):
+            self.assertEqual(get_customer_id(self._request(session)), customer_id)
+
+    def test_unresolved_customer_is_not_cached(self):
+        session = {}
+        with mock.patch('customers.customer_utils.resolve_customer_id', return_value=None):
+            self.assertIsNone(get_customer_id(self._request(session)))
+        self.assertEqual(session, {})
+        customer_id = get_customer_id(self._request(session))
+        self.assertIsNotNone(customer_id)
+        self.assertEqual(session[SESSION_KEY], [self.user.pk, customer_id])
+
+    def test_upsert_only_fills_missing_fields(self):
+        customer = upsert_customer('1.020.304')
+        self.assertEqual((customer.nombre, customer.correo), ('1020304', None))
+
+        customer = upsert_customer('1020304', 'Ana', 'ana@example.com')
+        self.assertEqual((customer.nombre, customer.correo), ('Ana', 'ana@example.com'))
+        customer = upsert_customer('1020304', 'Otra', 'otra@example.com')
+        self.assertEqual((customer.nombre, customer.correo), ('Ana', 'ana@example.com'))
+        customer.refresh_from_db()
+        self.assertEqual((customer.nombre, customer.correo), ('Ana', 'ana@example.com'))
+
+    def test_created_customer_is_linked_to_the_user(self):
+        first = resolve_customer_id(self.user)
+        second = resolve_customer_id(self.user)
+
+        self.assertEqual(first, second)
+        self.assertEqual(Customer.objects.count(), 1)
+        self.assertEqual(CustomerProfile.objects.get(user=self.user).customer_id, first)
+
+
+class CustomerDedupeTests(FreshCachesMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.pan = Product.objects.create(name='Pan', price=1000, picture='default.jpg')
+
+    def test_merge_moves_orders_and_drops_colliding_rows(self):
+        # Cargados sin save() (sin normalizar), como los datos viejos
+        old, dup = Customer.objects.bulk_create([
+            Customer(cedula='1.020.304', nombre='Ana'),
+            Customer(cedula='1020304 ', correo='ana@example.com'),
+        ])
+        for customer, stars in ((old, 5), (dup, 1)):
+            create_order([(self.pan.pk, 1)], customer=customer)
+            Rating.objects.create(product=self.pan, customer=customer, stars=stars)
+
+        merges, renamed = find_duplicates()
+        self.assertEqual(merges, {dup.pk: old.pk})
+        merge_customers(merges)
+        normalize_cedulas({pk: c for pk, c in renamed.items() if pk not in merges})
+
+        survivor = Customer.objects.get()
+        self.assertEqual((survivor.pk, survivor.cedula, survivor.correo), (old.pk, '1020304', 'ana@example.com'))
+        self.assertEqual(Order.objects.filter(customer=survivor).count(), 2)
+        self.assertEqual(list(Rating.objects.values_list('stars', flat=True)), [5])
+        self.pan.refresh_from_db()
+        self.assertEqual((self.pan.rating_count, self.pan.rating_avg), (1, 5.0))
+
+    def test_registered_users_with_the_same_cedula_are_not_merged(self):
+        ana, ana_dup, beto = Customer.objects.bulk_create([
+            Customer(cedula='1.020.304', nombre='Ana'),
+            Customer(cedula='1020304', nombre='Ana María'),
+            Customer(cedula='55 66'),
+        ])
+        for customer in (ana, ana_dup):
+            user = User.objects.create_user(f'user{customer.pk}', password='x')
+            CustomerProfile.objects.create(customer=customer, user=user)
+
+        merges, _ = find_duplicates()
+        with self.assertRaises(ProfileConflict) as raised:
+            merge_customers(merges)
+        self.assertEqual(raised.exception.conflicts, {ana.pk: [ana_dup.pk]})
+
+        err = StringIO()
+        call_command('dedupe_customers', '--dry-run', stdout=StringIO(), stderr=err)
+        self.assertIn(f'customers {[ana.pk, ana_dup.pk]}', err.getvalue())
+        with self.assertRaises(CommandError):
+            call_command('dedupe_customers', stdout=StringIO())
+        # Nada se borró ni se normalizó
+        self.assertEqual(CustomerProfile.objects.count(), 2)
+        self.assertEqual(Customer.objects.get(pk=beto.pk).cedula, '55 66')
+
+    def test_order_endpoints_reuse_the_customer(self):
+        payload = {'customer': {'cedula': '1.020.304', 'firstName': 'Ana'}, 'orders': [{'id': self.pan.pk, 'quantity': 1}]}
+        self.client.post(reverse('save_order_online'), json.dumps(payload), content_type='application/json')
+        payload['customer'] = {'cedula': '1020304', 'email': 'ana@example.com'}
+        self.client.post(reverse('save_order_online'), json.dumps(payload), content_type='application/json')
+        self.client.post(
+            reverse('save_order'),
+            json.dumps({'customer': {'cedula': '1020-304'}, 'orders': [{'id': self.pan.pk, 'quantity': 1}]}),
+            content_type='application/json',
+        )
+
+        customer = Customer.objects.get()
+        self.assertEqual((customer.nombre, customer.correo), ('Ana', 'ana@example.com'))
+        self.assertEqual(customer.order_set.count(), 3)
+
+
+class ShoppingListWriteTests(TestCase):
+    def setUp(self):
+        self.ana = Customer.objects.create(cedula='1', nombre='Ana')
+        self.beto = Customer.objects.create(cedula='2', nombre='Beto')
+        self.pan, self.torta, self.cafe = (
+            Product.objects.create(name=name, price=1000, picture='default.jpg') for name in ('Pan', 'Torta', 'Cafe')
+        )
+        self.range = (self.ana.pk, self.beto.pk)
+
+    def _write(self, *rows):
+        # rows: (cliente, producto, cantidad)
+        columns = list(zip(*rows)) or [(), (), ()]
+        suggestions = Suggestions(
+            customer_ids=np.array([c.pk for c in columns[0]], dtype=np.int64),
+            product_ids=np.array([p.pk for p in columns[1]], dtype=np.int64),
+            quantities=np.array(columns[2], dtype=np.int64),
+            frequencies=np.full(len(rows), 0.5),
+        )
+        return write_shopping_lists(suggestions, 10, 2026, self.range)
+
+    def _lines(self, customer):
+        return sorted(
+            ShoppingListItem.objects.filter(shopping_list__customer=customer)
+            .values_list('product__name', 'suggested_quantity', 'user_quantity')
+        )
+
+    def test_regenerating_keeps_user_quantities(self):
+        self.assertEqual(self._write((self.ana, self.pan, 2), (self.ana, self.torta, 1)), (1, 2))
+        ShoppingListItem.objects.filter(product=self.pan).update(user_quantity=5)
+
+        self.assertEqual(self._write((self.ana, self.pan, 3), (self.ana, self.cafe, 1)), (1, 2))
+        # Torta ya no se sugiere y no estaba editada: sale de la lista
+        self.assertEqual(self._lines(self.ana), [('Cafe', 1, None), ('Pan', 3, 5)])
+        self.assertEqual(ShoppingList.objects.filter(customer=self.ana).count(), 1)
+
+    def test_drafts_of_customers_that_no_longer_qualify(self):
+        self._write((self.ana, self.pan, 2), (self.beto, self.pan, 1), (self.beto, self.torta, 1))
+        ShoppingListItem.objects.filter(shopping_list__customer=self.beto, product=self.torta).update(user_quantity=2)
+
+        self._write()
+        self.assertFalse(ShoppingList.objects.filter(customer=self.ana).exists())
+        # Beto editó una línea: se conserva solo esa
+        self.assertEqual(self._lines(self.beto), [('Torta', 1, 2)])
+
+    def test_confirmed_lists_are_left_alone(self):
+        self._write((self.ana, self.pan, 2))
+        ShoppingList.objects.update(is_draft=False, is_confirmed=True)
+
+        self.assertEqual(self._write((self.ana, self.torta, 1)), (0, 0))
+        self._write()
+        self.assertEqual(self._lines(self.ana), [('Pan', 2, None)])
@@ -97,7 +97,7 @@ def profile_view(request):
         customer = customer_profile.customer
         
         # Get customer's orders
-        orders = customer.order_set.all().order_by('-date')[:10]  # Last 10 orders
+        orders = customer.order_set.with_items().order_by('-date')[:10]  # Last 10 orders
         
         context = {
             'customer': customer,
@@ -0,0 +1,101 @@
+"""
+Low-stock alerts kept up to date when Product.quantity / reorder_threshold
+change.
+
+A StockAlert row exists only while a product is under its reorder threshold,
+with its level: 'critical' under half the threshold, 'low' otherwise. The
+Product signals sync one product on save; bulk paths (CSV loader, datagen)
+call refresh_stock_alerts for the ids they touched, and the
+rebuild_stock_alerts command fixes any drift (queryset.update() skips the
+signals). The banner and the layout badge read the cached counts.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Q
+
+from .models import Product, StockAlert
+
+COUNTS_CACHE_KEY = 'inventory:low_stock_counts'
+# Tope de vida del conteo cacheado (con varios workers y caché por proceso
+# acota cuánto puede quedar viejo el badge de otro proceso)
+COUNTS_CACHE_TTL = getattr(settings, 'LOW_STOCK_COUNTS_CACHE_TTL', 60)
+
+
+def stock_level(quantity, reorder_threshold):
+    """None if the stock is fine, else StockAlert.LOW or StockAlert.CRITICAL."""
+    if quantity >= reorder_threshold:
+        return None
+    # Igual que el filtro anterior quantity < reorder_threshold / 2 (división entera en SQL)
+    return StockAlert.CRITICAL if quantity < reorder_threshold // 2 else StockAlert.LOW
+
+
+def invalidate_low_stock_counts():
+    cache.delete(COUNTS_CACHE_KEY)
+    # Otra vez al confirmar, por si alguien lo recalculó antes del commit
+    transaction.on_commit(lambda: cache.delete(COUNTS_CACHE_KEY))
+
+
+def sync_stock_alerts(products):
+    """
+    Open, update or close the alerts of the given products (anything with
+    pk, quantity and reorder_threshold) with one upsert and one delete.
+    Returns the number of products that are under their threshold.
+    """
+    alerts, cleared = [], []
+    for product in products:
+        level = stock_level(product.quantity, product.reorder_threshold)
+        if level is None:
+            cleared.append(product.pk)
+        else:
+            alerts.append(StockAlert(product_id=product.pk, level=level, quantity=product.quantity,
+                                     reorder_threshold=product.reorder_threshold))
+    if alerts:
+        # since no se actualiza: conserva cuándo empezó la alerta
+        StockAlert.objects.bulk_create(
+            alerts, update_conflicts=True, unique_fields=['product'],
+            update_fields=['level', 'quantity', 'reorder_threshold'],
+        )
+    if cleared:
+        StockAlert.objects.filter(product_id__in=cleared).delete()
+    if alerts or cleared:
+        invalidate_low_stock_counts()
+    return len(alerts)
+
+
+def refresh_stock_alerts(product_ids=None, batch_size=1000):
+    """
+    Recompute the alerts from the Product table, for the given ids or for
+    the whole catalog. Returns the number of open alerts among them.
+    """
+    fields = ('pk', 'quantity', 'reorder_threshold')
+    if product_ids is not None:
+        product_ids = list(product_ids)
+        total = 0
+        for start in range(0, len(product_ids), batch_size):
+            chunk = product_ids[start:start + batch_size]
+            total += sync_stock_alerts(Product.objects.filter(pk__in=chunk).only(*fields))
+        return total
+
+    # Todo el catálogo: solo los productos bajo el umbral (índice parcial
+    # product_low_stock_idx) y se cierran las alertas de los demás
+    low = list(Product.objects.filter(quantity__lt=F('reorder_threshold')).only(*fields))
+    for start in range(0, len(low), batch_size):
+        sync_stock_alerts(low[start:start + batch_size])
+    StockAlert.objects.filter(product__quantity__gte=F('product__reorder_threshold')).delete()
+    invalidate_low_stock_counts()
+    return len(low)
+
+
+def low_stock_counts():
+    """{'total', 'critical', 'warning'} open alerts, cached (one query on a miss)."""
+    counts = cache.get(COUNTS_CACHE_KEY)
+    if counts is None:
+        counts = StockAlert.objects.aggregate(
+            total=Count('pk'),
+            critical=Count('pk', filter=Q(level=StockAlert.CRITICAL)),
+        )
+        counts['warning'] = counts['total'] - counts['critical']
+        cache.set(COUNTS_CACHE_KEY, counts, COUNTS_CACHE_TTL)
+    return counts
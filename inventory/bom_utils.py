@@ -0,0 +1,108 @@
+import threading
+from datetime import timedelta
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+from .models import ProductRawMaterial
+
+# Tope de vida de la copia en memoria (segundos). Las señales solo invalidan el
+# proceso actual; con varios workers este tope acota cuánto dura una receta vieja.
+BOM_CACHE_TTL = getattr(settings, 'BOM_CACHE_TTL', 60)
+
+
+class BillOfMaterials:
+    """
+    In-memory copy of the recipes (ProductRawMaterial) built with one query.
+
+    Rows are kept as parallel NumPy arrays (product index, material index,
+    quantity per unit), so a whole basket is expanded into material demand
+    with one multiply and one bincount instead of a query per product.
+    """
+
+    def __init__(self, now=None):
+        self.expires_at = (now or timezone.now()) + timedelta(seconds=BOM_CACHE_TTL)
+        rows = list(ProductRawMaterial.objects.values_list('product_id', 'material_id', 'material_quantity'))
+
+        self.product_ids = sorted({product_id for product_id, _, _ in rows})
+        self.material_ids = sorted({material_id for _, material_id, _ in rows})
+        self._product_index = {product_id: i for i, product_id in enumerate(self.product_ids)}
+        material_index = {material_id: i for i, material_id in enumerate(self.material_ids)}
+
+        self._row_product = np.array([self._product_index[p] for p, _, _ in rows], dtype=np.int64)
+        self._row_material = np.array([material_index[m] for _, m, _ in rows], dtype=np.int64)
+        self._row_qty = np.array([q for _, _, q in rows], dtype=np.float64)
+
+        self._recipes = {}
+        for product_id, material_id, qty in rows:
+            self._recipes.setdefault(product_id, []).append((material_id, qty))
+
+    def is_valid(self, now=None):
+        return (now or timezone.now()) < self.expires_at
+
+    def recipe(self, product_id):
+        """[(material_id, qty_per_unit), ...] for a product (empty if it has no recipe)."""
+        return self._recipes.get(product_id, [])
+
+    def expand(self, basket):
+        """
+        Material demand of a basket.
+        basket: {product_id: units} (or iterable of (product_id, units) pairs).
+        Returns {material_id: amount}; products without recipe are ignored.
+        """
+        pairs = basket.items() if hasattr(basket, 'items') else basket
+        units = np.zeros(len(self.product_ids), dtype=np.float64)
+        for product_id, qty in pairs:
+            index = self._product_index.get(product_id)
+            if index is not None:
+                units[index] += qty
+        if not units.any():
+            return {}
+
+        demand = np.bincount(
+            self._row_material,
+            weights=self._row_qty * units[self._row_product],
+            minlength=len(self.material_ids),
+        )
+        return {
+            self.material_ids[i]: float(demand[i])
+            for i in np.flatnonzero(demand)
+        }
+
+    def capacity(self, stock):
+        """
+        How many units of each product can be made with the given stock.
+        stock: {material_id: units available}. Returns {product_id: max_units}.
+        """
+        available = np.array([stock.get(m, 0) for m in self.material_ids], dtype=np.float64)
+        per_row = np.full(len(self._row_qty), np.inf)
+        positive = self._row_qty > 0
+        per_row[positive] = np.floor(np.maximum(available[self._row_material[positive]], 0) / self._row_qty[positive])
+
+        limit = np.full(len(self.product_ids), np.inf)
+        np.minimum.at(limit, self._row_product, per_row)
+        return {
+            product_id: (int(limit[i]) if np.isfinite(limit[i]) else None)
+            for i, product_id in enumerate(self.product_ids)
+        }
+
+
+_bom = None
+_bom_lock = threading.Lock()
+
+
+def get_bom():
+    """Return the cached bill of materials, rebuilding it if it expired or was invalidated."""
+    global _bom
+    bom = _bom
+    if bom is not None and bom.is_valid():
+        return bom
+    with _bom_lock:
+        if _bom is None or not _bom.is_valid():
+            _bom = BillOfMaterials()
+        return _bom
+
+
+def invalidate_bom():
+    """Drop the cached bill of materials (called from the ProductRawMaterial signals)."""
+    global _bom
+    _bom = None
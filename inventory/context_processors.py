@@ -0,0 +1,8 @@
+from django.utils.functional import SimpleLazyObject
+
+from .alert_utils import low_stock_counts
+
+
+def low_stock(request):
+    """Low-stock alert count for the layout badge (cached; only read if the template uses it)."""
+    return {'low_stock_badge': SimpleLazyObject(lambda: low_stock_counts()['total'])}
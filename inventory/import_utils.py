@@ -0,0 +1,70 @@
+import csv
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.core.validators import DecimalValidator
+
+
+def read_csv_rows(path):
+    """Yield the rows of a CSV file as dicts, one at a time (blank cells -> None)."""
+    with open(path, newline='', encoding='utf-8-sig') as fh:
+        for row in csv.DictReader(fh):
+            yield {key: (value.strip() or None) if value is not None else None for key, value in row.items()}
+
+
+def batched(iterable, size):
+    """Split an iterable in lists of at most ``size`` items."""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def to_int(value, default=0):
+    """CSV number (may come as "3" or "3.0") to int."""
+    if value is None:
+        return default
+    try:
+        return int(Decimal(value))
+    except InvalidOperation:
+        return default
+
+
+def to_decimal(value, max_digits=None, decimal_places=None):
+    """
+    CSV number to Decimal. A missing, non-finite or negative value, or one
+    that does not fit max_digits/decimal_places, raises ValueError: the row
+    has to be rejected, not loaded with a made-up 0.
+    """
+    try:
+        number = Decimal(value)
+    except (InvalidOperation, TypeError):
+        raise ValueError(value)
+    if not number.is_finite() or number < 0:
+        raise ValueError(value)
+    if max_digits is not None:
+        try:
+            # "3500.0" cabe en decimal_places=0; "12.5" no (se redondearía)
+            DecimalValidator(max_digits, decimal_places)(number.normalize())
+        except ValidationError:
+            raise ValueError(value)
+    return number
+
+
+class UpsertStats:
+    """Counters reported by the loaders."""
+
+    def __init__(self):
+        self.created = 0
+        self.updated = 0
+        self.skipped = 0
+        self.errors = []
+
+    def summary(self):
+        text = f'{self.created} created, {self.updated} updated, {self.skipped} unchanged'
+        if self.errors:
+            text += f', {len(self.errors)} rejected'
+        return text
@@ -1,35 +1,75 @@
-from django.core.management.base import BaseCommand
-from inventory.models import Product, RawMaterial, ProductRawMaterial
-import os
-import json
-import pandas as pd
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from inventory.bom_utils import invalidate_bom
+from inventory.import_utils import UpsertStats, batched, read_csv_rows
+from inventory.models import Product, ProductRawMaterial, RawMaterial
+
 
 class Command(BaseCommand):
-    help = 'Load materials from movie_descriptions.json into the Product model'
-    
-    def handle(self, *args, **kwargs):
-        df = pd.read_csv('products_material.csv')
-        materials = json.loads(df.to_json(orient="records"))
-        print(materials)
+    help = 'Load recipes from products_material.csv into the ProductRawMaterial model (bulk, idempotent)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_path', nargs='?', default='products_material.csv')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--update', action='store_true',
+                            help='Overwrite material_quantity of recipe rows that already exist')
+
+    def handle(self, *args, **options):
+        stats = UpsertStats()
+        try:
+            with transaction.atomic():
+                self._load(options['csv_path'], options['batch_size'], options['update'], stats)
+                # bulk_create no envía las señales que invalidan las recetas en memoria
+                transaction.on_commit(invalidate_bom)
+        except FileNotFoundError:
+            raise CommandError(f'File not found: {options["csv_path"]}')
+
+        for line, error in stats.errors:
+            self.stderr.write(f'line {line}: {error}')
+        self.stdout.write(self.style.SUCCESS(f'Recipes: {stats.summary()}'))
 
-        for i in range(len(materials)):
-            material = materials[i]
-            product_name = material['product']
-            product = Product.objects.get(name=product_name)
-            rawMaterial_name = material['material']
-            rawMaterial = RawMaterial.objects.get(name=rawMaterial_name) 
-            quantity = material['quantity']
+    def _load(self, path, batch_size, update, stats):
+        products = dict(Product.objects.values_list('name', 'pk'))
+        materials = dict(RawMaterial.objects.values_list('name', 'pk'))
+        existing = {
+            (product_id, material_id): quantity
+            for product_id, material_id, quantity in ProductRawMaterial.objects.values_list('product_id', 'material_id', 'material_quantity')
+        }
+        line = 1
+        for batch in batched(read_csv_rows(path), batch_size):
+            rows = {}
+            for row in batch:
+                line += 1
+                product_id = products.get(row.get('product'))
+                material_id = materials.get(row.get('material'))
+                if product_id is None or material_id is None:
+                    missing = 'product' if product_id is None else 'material'
+                    stats.errors.append((line, f'unknown {missing} "{row.get(missing)}"'))
+                    continue
+                try:
+                    quantity = float(row.get('quantity'))
+                except (TypeError, ValueError):
+                    stats.errors.append((line, f'invalid quantity "{row.get("quantity")}"'))
+                    continue
+                key = (product_id, material_id)
+                if key in existing and (not update or existing[key] == quantity):
+                    stats.skipped += 1
+                    continue
+                # Si el par se repite en el mismo lote gana la última fila
+                rows[key] = ProductRawMaterial(product_id=product_id, material_id=material_id, material_quantity=quantity)
 
-            exists = ProductRawMaterial.objects.filter(product=product,material=rawMaterial).exists() 
-            if not exists:
-                try:     
-                    ProductRawMaterial.objects.create(
-                    product = product,
-                    material = rawMaterial,
-                    material_quantity = quantity
-                    )
-                except:
-                    print('wrong')
-                    pass 
-            
-            
\ No newline at end of file
+            if update:
+                ProductRawMaterial.objects.bulk_create(
+                    rows.values(),
+                    update_conflicts=True,
+                    unique_fields=['product', 'material'],
+                    update_fields=['material_quantity'],
+                )
+            else:
+                ProductRawMaterial.objects.bulk_create(rows.values(), ignore_conflicts=True)
+            for key, recipe in rows.items():
+                if key in existing:
+                    stats.updated += 1
+                else:
+                    stats.created += 1
+                existing[key] = recipe.material_quantity
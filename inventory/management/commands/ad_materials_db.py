@@ -1,27 +1,68 @@
-from django.core.management.base import BaseCommand
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from inventory.import_utils import UpsertStats, batched, read_csv_rows, to_int
 from inventory.models import RawMaterial
-import os
-import json
-import pandas as pd
+
+UPDATE_BATCH_SIZE = 100
+
 
 class Command(BaseCommand):
-    help = 'Load materials from movie_descriptions.json into the Product model'
-    
-    def handle(self, *args, **kwargs):
-        df = pd.read_csv('materials.csv')
-        materials = json.loads(df.to_json(orient="records"))
-        print(materials)
-
-        for i in range(len(materials)):
-            material = materials[i]
-            exist = RawMaterial.objects.filter(name = material['name']).first() 
-            if not exist:
-                try:              
-                    RawMaterial.objects.create(
-                        name = material['name'],
-                        units = material['units'],
-                        exp_date = material['exp_date']
-                        )
-                except:
-                    print('wrong')
-                    pass        
+    help = 'Load raw materials from materials.csv into the RawMaterial model (bulk, idempotent)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_path', nargs='?', default='materials.csv')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--update', action='store_true',
+                            help='Update units/exp_date of materials that already exist (default: leave them as they are)')
+
+    def handle(self, *args, **options):
+        stats = UpsertStats()
+        try:
+            with transaction.atomic():
+                self._load(options['csv_path'], options['batch_size'], options['update'], stats)
+        except FileNotFoundError:
+            raise CommandError(f'File not found: {options["csv_path"]}')
+
+        for line, error in stats.errors:
+            self.stderr.write(f'line {line}: {error}')
+        self.stdout.write(self.style.SUCCESS(f'Raw materials: {stats.summary()}'))
+
+    def _load(self, path, batch_size, update, stats):
+        existing = {
+            name: (pk, {'units': units, 'exp_date': exp_date})
+            for name, pk, units, exp_date in RawMaterial.objects.values_list('name', 'pk', 'units', 'exp_date')
+        }
+        line = 1
+        for batch in batched(read_csv_rows(path), batch_size):
+            to_create, to_update = [], []
+            for row in batch:
+                line += 1
+                name = row.get('name')
+                try:
+                    exp_date = datetime.strptime(row.get('exp_date') or '', '%Y-%m-%d').date()
+                except ValueError:
+                    stats.errors.append((line, f'invalid exp_date "{row.get("exp_date")}"'))
+                    continue
+                if not name:
+                    stats.errors.append((line, 'missing name'))
+                    continue
+                fields = {'units': to_int(row.get('units')), 'exp_date': exp_date}
+                current = existing.get(name)
+                if current is None and name not in existing:
+                    existing[name] = None  # repetido más abajo en el CSV -> se ignora
+                    to_create.append(RawMaterial(name=name, **fields))
+                elif update and current is not None and current[1] != fields:
+                    existing[name] = (current[0], fields)
+                    # bulk_update no aplica auto_now (la huella del PDF lee updated_at)
+                    to_update.append(RawMaterial(pk=current[0], name=name, updated_at=timezone.now(), **fields))
+                else:
+                    stats.skipped += 1
+
+            for material in RawMaterial.objects.bulk_create(to_create):
+                existing[material.name] = (material.pk, {'units': material.units, 'exp_date': material.exp_date})
+            # Solo filas que cambiaron; lotes cortos porque bulk_update arma un CASE por fila
+            RawMaterial.objects.bulk_update(to_update, ['units', 'exp_date', 'updated_at'], batch_size=UPDATE_BATCH_SIZE)
+            stats.created += len(to_create)
+            stats.updated += len(to_update)
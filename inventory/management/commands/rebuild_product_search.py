@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from inventory.search_utils import fts_available, rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the FTS5 product search index from the Product table'
+
+    def handle(self, *args, **kwargs):
+        if not fts_available():
+            self.stdout.write(self.style.WARNING('FTS5 search index not available; search uses icontains'))
+            return
+        total = rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f'{total} products indexed'))
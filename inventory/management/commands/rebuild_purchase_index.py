@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from inventory.purchase_utils import rebuild_purchase_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the CustomerPurchase (customer, product) index from the OrderItem history'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            total = rebuild_purchase_index(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'{total} customer/product pairs indexed'))
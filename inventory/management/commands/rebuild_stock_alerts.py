@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from inventory.alert_utils import low_stock_counts, refresh_stock_alerts
+
+
+class Command(BaseCommand):
+    help = 'Recompute the low-stock alerts (StockAlert) from Product.quantity/reorder_threshold'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            refresh_stock_alerts()
+
+        counts = low_stock_counts()
+        self.stdout.write(self.style.SUCCESS(
+            f"{counts['total']} open alerts ({counts['critical']} critical, {counts['warning']} low)"
+        ))
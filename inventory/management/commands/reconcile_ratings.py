@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from inventory.rating_utils import reconcile_ratings
+
+
+class Command(BaseCommand):
+    help = 'Recompute Product.rating_count/rating_sum/rating_avg from the Rating table and fix drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report the products that drifted')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            drifted = reconcile_ratings(dry_run=options['dry_run'])
+
+        for product in drifted[:20]:
+            self.stdout.write(f'  {product.pk}: count={product.rating_count} sum={product.rating_sum} avg={product.rating_avg:.2f}')
+        verb = 'would be fixed' if options['dry_run'] else 'fixed'
+        self.stdout.write(self.style.SUCCESS(f'{len(drifted)} products {verb}'))
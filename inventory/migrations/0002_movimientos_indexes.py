@@ -0,0 +1,21 @@
+# Generated by Django 5.2.4 on 2026-10-18 08:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='movimientosinventario',
+            index=models.Index(fields=['material', 'date'], name='mov_material_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movimientosinventario',
+            index=models.Index(fields=['date'], name='mov_date_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+from django.db import migrations, OperationalError
+
+FTS_TABLE = 'inventory_product_fts'
+
+
+def create_search_index(apps, schema_editor):
+    """Índice FTS5 de productos (solo SQLite; en otros motores se usa icontains)."""
+    from inventory.search_utils import normalize
+
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    try:
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(name, description, tokenize='trigram')"
+        )
+    except OperationalError:
+        # SQLite sin FTS5/trigram (< 3.34): la búsqueda sigue con icontains
+        return
+
+    Product = apps.get_model('inventory', 'Product')
+    rows = [
+        (pk, normalize(name), normalize(description))
+        for pk, name, description in Product.objects.values_list('pk', 'name', 'description').iterator()
+    ]
+    with connection.cursor() as cursor:
+        cursor.executemany(f'INSERT INTO {FTS_TABLE} (rowid, name, description) VALUES (%s, %s, %s)', rows)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0002_movimientos_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.4 on 2026-10-18 09:00
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_rating_totals(apps, schema_editor):
+    Product = apps.get_model('inventory', 'Product')
+    Rating = apps.get_model('inventory', 'Rating')
+    rows = Rating.objects.values('product_id').annotate(count=Count('id'), total=Sum('stars')).order_by()
+    products = []
+    for row in rows:
+        count, total = row['count'], row['total'] or 0
+        products.append(Product(pk=row['product_id'], rating_count=count, rating_sum=total, rating_avg=total / count))
+    Product.objects.bulk_update(products, ['rating_count', 'rating_sum', 'rating_avg'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0003_product_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='rating_avg',
+            field=models.FloatField(db_index=True, default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_rating_totals, migrations.RunPython.noop),
+    ]
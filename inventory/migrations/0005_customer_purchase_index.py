@@ -0,0 +1,46 @@
+# Generated by Django 5.2.4 on 2026-10-18 09:02
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def backfill_purchases(apps, schema_editor):
+    OrderItem = apps.get_model('inventory', 'OrderItem')
+    CustomerPurchase = apps.get_model('inventory', 'CustomerPurchase')
+    pairs = (
+        OrderItem.objects.filter(order__customer__isnull=False)
+        .values('order__customer_id', 'product_id')
+        .annotate(first=models.Min('order__date'))
+        .order_by()
+    )
+    CustomerPurchase.objects.bulk_create(
+        [
+            CustomerPurchase(customer_id=row['order__customer_id'], product_id=row['product_id'], first_purchased_at=row['first'])
+            for row in pairs.iterator()
+        ],
+        batch_size=5000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0004_product_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CustomerPurchase',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('first_purchased_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='purchases', to='inventory.customer')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='purchases', to='inventory.product')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('customer', 'product'), name='uniq_customer_purchase')],
+            },
+        ),
+        migrations.RunPython(backfill_purchases, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.4 on 2026-10-18 09:03
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0005_customer_purchase_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['cedula'], name='customer_cedula_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(django.db.models.functions.text.Lower('correo'), name='customer_correo_lower_idx'),
+        ),
+    ]
@@ -0,0 +1,133 @@
+import re
+from collections import defaultdict
+
+from django.db import migrations, models
+from django.db.models import Case, Count, IntegerField, Sum, Value, When
+
+# Tablas con FK a Customer y los campos que, junto al cliente, deben ser únicos
+CUSTOMER_RELATIONS = [
+    ('inventory', 'Order', None),
+    ('inventory', 'Rating', ('product_id',)),
+    ('inventory', 'CustomerPurchase', ('product_id',)),
+    ('customers', 'ShoppingList', ('week_number', 'year')),
+    ('customers', 'CustomerProfile', ()),
+    ('customers', 'CookieConsent', ()),
+]
+BATCH_SIZE = 500
+
+
+def _normalize(cedula):
+    # Igual que inventory.models.normalize_cedula (copiado: la migración no importa código de la app)
+    return re.sub(r'[\s.\-]', '', cedula or '').upper()
+
+
+def _repoint(model, merges, unique_with):
+    """Move the rows of the losers to their survivor; drop the ones that would collide."""
+    rows = model.objects.filter(customer_id__in=list(merges))
+    if unique_with is not None:
+        fields = ('pk', 'customer_id', *unique_with)
+        taken = {
+            (row[1], *row[2:])
+            for row in model.objects.filter(customer_id__in=set(merges.values())).values_list(*fields)
+        }
+        drop = []
+        for row in rows.values_list(*fields).order_by('pk'):
+            key = (merges[row[1]], *row[2:])
+            if key in taken:
+                drop.append(row[0])
+            else:
+                taken.add(key)
+        model.objects.filter(pk__in=drop).delete()
+    rows.update(customer_id=Case(
+        *[When(customer_id=loser, then=Value(survivor)) for loser, survivor in merges.items()],
+        output_field=IntegerField(),
+    ))
+
+
+def dedupe_customers(apps, schema_editor):
+    """
+    Fusiona clientes con la misma cédula normalizada antes de crear el índice único.
+    Dos usuarios registrados (con CustomerProfile) con la misma cédula no se
+    fusionan (se perdería un perfil): el que no sobrevive queda con la cédula
+    "<cédula>#<id>" y se lista en la salida para corregirlo a mano.
+    """
+    Customer = apps.get_model('inventory', 'Customer')
+    CustomerProfile = apps.get_model('customers', 'CustomerProfile')
+    with_profile = set(CustomerProfile.objects.values_list('customer_id', flat=True))
+
+    groups = defaultdict(list)
+    renamed = {}
+    for pk, cedula in Customer.objects.values_list('pk', 'cedula').iterator(chunk_size=5000):
+        normalized = _normalize(cedula)
+        if normalized != cedula:
+            renamed[pk] = normalized
+        if normalized:
+            groups[normalized].append(pk)
+
+    merges = {}
+    for cedula, ids in groups.items():
+        # Sobrevive el que tiene perfil (usuario registrado), luego el más antiguo
+        ids.sort(key=lambda pk: (pk not in with_profile, pk))
+        for pk in ids[1:]:
+            if pk in with_profile:
+                renamed[pk] = f'{cedula}#{pk}'
+                print(f'\n  customer {pk} shares the cédula {cedula} with customer {ids[0]} '
+                      f'(both registered users): kept as "{renamed[pk]}", fix it by hand')
+            else:
+                merges[pk] = ids[0]
+
+    items = list(merges.items())
+    for start in range(0, len(items), BATCH_SIZE):
+        batch = dict(items[start:start + BATCH_SIZE])
+        for app_label, model_name, unique_with in CUSTOMER_RELATIONS:
+            _repoint(apps.get_model(app_label, model_name), batch, unique_with)
+
+        # Completar nombre/correo del sobreviviente con los de los duplicados
+        customers = Customer.objects.in_bulk(list(batch) + list(set(batch.values())))
+        changed = {}
+        for loser_id, survivor_id in batch.items():
+            loser, survivor = customers[loser_id], customers[survivor_id]
+            for field in ('nombre', 'correo'):
+                if not getattr(survivor, field) and getattr(loser, field):
+                    setattr(survivor, field, getattr(loser, field))
+                    changed[survivor_id] = survivor
+        Customer.objects.bulk_update(changed.values(), ['nombre', 'correo'])
+        Customer.objects.filter(pk__in=list(batch)).delete()
+
+    # Cédulas normalizadas (y las de los conflictos) de los que quedan
+    Customer.objects.bulk_update(
+        [Customer(pk=pk, cedula=cedula) for pk, cedula in renamed.items() if pk not in merges],
+        ['cedula'],
+        batch_size=1000,
+    )
+
+    # Los modelos históricos no envían señales: recalcular los totales de calificaciones
+    Product = apps.get_model('inventory', 'Product')
+    Rating = apps.get_model('inventory', 'Rating')
+    totals = {
+        row['product_id']: (row['count'], row['total'] or 0)
+        for row in Rating.objects.values('product_id').annotate(count=Count('id'), total=Sum('stars')).order_by()
+    }
+    products = []
+    for pk, count, total, avg in Product.objects.values_list('pk', 'rating_count', 'rating_sum', 'rating_avg'):
+        new_count, new_total = totals.get(pk, (0, 0))
+        if (count, total) != (new_count, new_total):
+            products.append(Product(pk=pk, rating_count=new_count, rating_sum=new_total,
+                                    rating_avg=new_total / new_count if new_count else 0.0))
+    Product.objects.bulk_update(products, ['rating_count', 'rating_sum', 'rating_avg'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0006_customer_lookup_indexes'),
+        ('customers', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(dedupe_customers, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='customer',
+            constraint=models.UniqueConstraint(condition=models.Q(('cedula', ''), _negated=True), fields=('cedula',), name='uniq_customer_cedula'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.4 on 2026-10-18 09:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0007_customer_cedula_unique'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['date'], name='order_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['customer', 'date'], name='order_customer_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['name'], name='product_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('quantity__lt', models.F('reorder_threshold'))), fields=['quantity'], name='product_low_stock_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='promotion',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['starts_at', 'ends_at'], name='promotion_active_window_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rawmaterial',
+            index=models.Index(fields=['exp_date'], name='rawmaterial_exp_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rawmaterial',
+            index=models.Index(fields=['name'], name='rawmaterial_name_idx'),
+        ),
+    ]
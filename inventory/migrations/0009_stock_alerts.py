@@ -0,0 +1,45 @@
+# Generated by Django 5.2.4 on 2026-10-18 09:23
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_stock_alerts(apps, schema_editor):
+    Product = apps.get_model('inventory', 'Product')
+    StockAlert = apps.get_model('inventory', 'StockAlert')
+    low = Product.objects.filter(quantity__lt=F('reorder_threshold')).values_list('pk', 'quantity', 'reorder_threshold')
+    StockAlert.objects.bulk_create(
+        [
+            StockAlert(product_id=pk, quantity=quantity, reorder_threshold=threshold,
+                       level='critical' if quantity < threshold // 2 else 'low')
+            for pk, quantity, threshold in low
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0008_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('level', models.CharField(choices=[('low', 'Advertencia'), ('critical', 'Crítico')], max_length=10)),
+                ('quantity', models.PositiveIntegerField()),
+                ('reorder_threshold', models.PositiveIntegerField()),
+                ('since', models.DateTimeField(default=django.utils.timezone.now, help_text='Cuándo quedó bajo el umbral')),
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stock_alert', to='inventory.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['quantity'], name='stockalert_quantity_idx'), models.Index(fields=['level'], name='stockalert_level_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_stock_alerts, migrations.RunPython.noop),
+    ]
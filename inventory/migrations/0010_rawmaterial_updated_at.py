@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 09:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0009_stock_alerts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rawmaterial',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -1,4 +1,6 @@
+import re
 from django.db import models
+from django.db.models.functions import Lower
 from django.utils import timezone
 from django.utils.timezone import now
 
@@ -7,6 +9,17 @@ class RawMaterial(models.Model):
     name = models.CharField(max_length=100)
     units = models.IntegerField(default=0)
     exp_date = models.DateField()
+    # Último save(): la huella del PDF de lista de compras lo lee de la BD, así
+    # todos los procesos ven los cambios de nombre/fecha (un contador en caché era por proceso)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Materias por vencer (rango de exp_date ordenado por fecha)
+            models.Index(fields=['exp_date'], name='rawmaterial_exp_date_idx'),
+            # Listado paginado en orden alfabético
+            models.Index(fields=['name'], name='rawmaterial_name_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -19,6 +32,10 @@ class Product(models.Model):
     quantity = models.PositiveIntegerField(default=0)
     picture = models.ImageField( upload_to='')
     reorder_threshold = models.PositiveIntegerField(default=10, help_text="Umbral de reorden (cantidad mínima antes de alertar)")
+    # Agregados de Rating desnormalizados (los mantienen las señales; ver rating_utils)
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    rating_avg = models.FloatField(default=0, editable=False, db_index=True)
 
     raw_materials = models.ManyToManyField(
         'RawMaterial',
@@ -26,9 +43,63 @@ class Product(models.Model):
         through='ProductRawMaterial'
     )
 
+    class Meta:
+        indexes = [
+            # Listado paginado del POS en orden alfabético
+            models.Index(fields=['name'], name='product_name_idx'),
+            # Catálogo en línea: ORDER BY LOWER(name), id LIMIT 12 sale del índice, sin ordenar todo
+            models.Index(Lower('name'), name='product_name_lower_idx'),
+            # Índice parcial con solo los productos bajo el umbral: el conteo y la
+            # lista de alertas (ordenada por quantity) no recorren todo el catálogo
+            models.Index(
+                fields=['quantity'],
+                condition=models.Q(quantity__lt=models.F('reorder_threshold')),
+                name='product_low_stock_idx',
+            ),
+        ]
+
     def __str__(self):
         return self.name
-    
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Fila tal como se leyó, sin copiar nada: las señales de guardado comparan contra ella
+        # (índice de búsqueda, alertas de stock) solo cuando de verdad se guarda
+        instance._db_row = (field_names, values)
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        self._remember_db_values([
+            f.attname for f in self._meta.concrete_fields
+            if f.attname in self.__dict__ and (update_fields is None or f.name in update_fields)
+        ])
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using, fields, from_queryset)
+        self._remember_db_values([
+            f.attname for f in self._meta.concrete_fields
+            if f.attname in self.__dict__ and (fields is None or f.attname in fields or f.name in fields)
+        ])
+
+    def _remember_db_values(self, attnames):
+        state = dict(zip(*self.__dict__.get('_db_row', ((), ()))))
+        state.update((attname, getattr(self, attname)) for attname in attnames)
+        self._db_row = (list(state), list(state.values()))
+
+    def loaded_values(self, *fields):
+        """
+        Values of ``fields`` as they are in the DB row (read, saved or
+        refreshed through this instance), or None if some of them aren't known.
+        """
+        field_names, values = self.__dict__.get('_db_row', ((), ()))
+        try:
+            return tuple(values[field_names.index(f)] for f in fields)
+        except ValueError:
+            return None
+
     def is_low_stock(self):
         """Retorna True si el producto está por debajo del umbral de reorden"""
         return self.quantity < self.reorder_threshold
@@ -40,6 +111,37 @@ class Product(models.Model):
         return (self.quantity / self.reorder_threshold) * 100
 
 
+class StockAlert(models.Model):
+    """
+    Producto bajo su umbral de reorden. La fila existe solo mientras dure la
+    alerta; la mantienen las señales de Product (ver alert_utils) para que el
+    banner y la página de alertas no comparen quantity con reorder_threshold
+    en todo el catálogo.
+    """
+    LOW = 'low'
+    CRITICAL = 'critical'
+    LEVELS = [
+        (LOW, 'Advertencia'),
+        (CRITICAL, 'Crítico'),
+    ]
+    product = models.OneToOneField(Product, related_name='stock_alert', on_delete=models.CASCADE)
+    level = models.CharField(max_length=10, choices=LEVELS)
+    quantity = models.PositiveIntegerField()
+    reorder_threshold = models.PositiveIntegerField()
+    since = models.DateTimeField(default=now, help_text="Cuándo quedó bajo el umbral")
+
+    class Meta:
+        indexes = [
+            # Página de alertas ordenada por stock
+            models.Index(fields=['quantity'], name='stockalert_quantity_idx'),
+            # Conteo de críticas / advertencias
+            models.Index(fields=['level'], name='stockalert_level_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id}: {self.level} ({self.quantity}/{self.reorder_threshold})"
+
+
 class ProductRawMaterial(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     material = models.ForeignKey(RawMaterial, on_delete=models.CASCADE)
@@ -52,11 +154,40 @@ class ProductRawMaterial(models.Model):
         unique_together = ('product', 'material')
 
 
+def normalize_cedula(value):
+    """Cédula sin espacios, puntos ni guiones y en mayúsculas ("1.020-304 " -> "1020304")."""
+    return re.sub(r'[\s.\-]', '', value or '').upper()
+
+
 class Customer(models.Model):
     cedula = models.CharField(max_length=100)
     nombre = models.TextField(blank=True,null=True)
     correo = models.EmailField(max_length=254, blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            # Búsquedas de cliente por cédula (órdenes, registro) y por correo sin mayúsculas (login)
+            models.Index(fields=['cedula'], name='customer_cedula_idx'),
+            models.Index(Lower('correo'), name='customer_correo_lower_idx'),
+        ]
+        constraints = [
+            # Una cédula (normalizada) = un cliente; los clientes sin cédula no cuentan
+            models.UniqueConstraint(fields=['cedula'], condition=~models.Q(cedula=''), name='uniq_customer_cedula'),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.cedula = normalize_cedula(self.cedula)
+        super().save(*args, **kwargs)
+
+
+class OrderQuerySet(models.QuerySet):
+    def with_items(self):
+        """Trae los ítems (con su producto) en una sola consulta extra,
+        para que total_amount() y products() no consulten por cada orden."""
+        return self.prefetch_related(
+            models.Prefetch('orderitem_set', queryset=OrderItem.objects.select_related('product'))
+        )
+
 
 class Order(models.Model):
     customer = models.ForeignKey(Customer, on_delete=models.CASCADE, null=True, blank=True)
@@ -64,6 +195,16 @@ class Order(models.Model):
     paymentMethod = models.CharField(max_length=100, default="Cash")
     # amount = models.IntegerField(default=0)
 
+    class Meta:
+        indexes = [
+            # Listado de órdenes (cursor sobre date, id) y reportes por rango de fechas
+            models.Index(fields=['date'], name='order_date_idx'),
+            # Últimas órdenes de un cliente
+            models.Index(fields=['customer', 'date'], name='order_customer_date_idx'),
+        ]
+
+    objects = OrderQuerySet.as_manager()
+
     def __str__(self):
         return self.date.strftime("%Y-%m-%d %H:%M:%S")
 
@@ -113,6 +254,18 @@ class Promotion(models.Model):
     applies_to_all = models.BooleanField(default=False)
     products = models.ManyToManyField(Product, blank=True, related_name='promotions')
 
+    class Meta:
+        indexes = [
+            # Promociones vigentes: ventana starts_at/ends_at de las activas. Parcial
+            # porque Django escribe is_active=True como `WHERE "is_active"` y un
+            # índice con is_active como primera columna no se usaría
+            models.Index(
+                fields=['starts_at', 'ends_at'],
+                condition=models.Q(is_active=True),
+                name='promotion_active_window_idx',
+            ),
+        ]
+
     def is_current(self):
         now_ = timezone.now()
         if not self.is_active:
@@ -152,6 +305,25 @@ class Rating(models.Model):
     def __str__(self):
         nombre = self.customer.nombre or self.customer.cedula
         return f"{nombre} → {self.product.name}: {self.stars}★"
+
+
+class CustomerPurchase(models.Model):
+    """
+    Índice compacto de compras: una fila por (customer, producto) comprado al
+    menos una vez. Lo mantienen las señales de órdenes (ver purchase_utils) y
+    se usa para el permiso de calificar sin recorrer el historial de órdenes.
+    """
+    customer = models.ForeignKey(Customer, related_name='purchases', on_delete=models.CASCADE)
+    product = models.ForeignKey(Product, related_name='purchases', on_delete=models.CASCADE)
+    first_purchased_at = models.DateTimeField(default=now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['customer', 'product'], name='uniq_customer_purchase'),
+        ]
+
+    def __str__(self):
+        return f"{self.customer_id} → {self.product_id}"
     
 class MovimientosInventario(models.Model):
     MOVEMENT_TYPES = [
@@ -164,6 +336,14 @@ class MovimientosInventario(models.Model):
     quantity = models.FloatField()
     date = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Historial filtrado por materia prima y ordenado por fecha
+            models.Index(fields=['material', 'date'], name='mov_material_date_idx'),
+            # Historial completo ordenado por fecha
+            models.Index(fields=['date'], name='mov_date_idx'),
+        ]
+
     def __str__(self):
         return f"{self.material.name} - {self.get_movement_type_display()} ({self.quantity})"
 
@@ -0,0 +1,72 @@
+from django.db import transaction
+from django.db.models import QuerySet
+from django.dispatch import Signal
+from .models import Order, OrderItem, Product
+from .promo_utils import PromotionSnapshot, resolve_promotions
+from .stock_utils import deduct_raw_materials
+
+# Se envía al guardar una orden con create_order (kwargs: order, items).
+# bulk_create no envía post_save por cada OrderItem, así que quien necesite
+# enterarse de las ventas (p.ej. el rollup diario de pos) escucha esta señal.
+order_placed = Signal()
+
+
+def deleted_with_parent(origin):
+    """
+    True when OrderItems are being deleted by a cascade (their order, product
+    or customer was deleted) rather than on their own. ``origin`` is the
+    argument of pre/post_delete: the instance or queryset delete() was called on.
+    Per-item bookkeeping skips those: the parent's own delete signals handle them.
+    """
+    if origin is None:
+        return False
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return model is not OrderItem
+
+
+def _parse_lines(lines):
+    """Normalize (product_id, quantity) pairs; ids that are not numbers -> None."""
+    parsed = []
+    for pid, qty in lines:
+        try:
+            pid = int(pid)
+        except (TypeError, ValueError):
+            pid = None
+        parsed.append((pid, qty))
+    return parsed
+
+
+def create_order(lines, skip_missing=True, **order_fields):
+    """
+    Create an order with all its items in a single transaction.
+
+    lines: iterable of (product_id, quantity).
+    order_fields: passed to Order.objects.create (customer, paymentMethod...).
+
+    Products are fetched with one id__in query, prices are resolved in bulk
+    (promo included, read from the DB rather than the cached snapshot), the
+    OrderItems are inserted with bulk_create and the raw materials are
+    deducted in aggregate. bulk_create doesn't send the OrderItem
+    signals, so unit_price and the stock deduction are handled here.
+    Unknown products are skipped, or raise Product.DoesNotExist when
+    skip_missing is False (nothing is saved in that case).
+    """
+    lines = _parse_lines(lines)
+    with transaction.atomic():
+        products = Product.objects.in_bulk({pid for pid, _ in lines if pid is not None})
+        if not skip_missing and any(pid not in products for pid, _ in lines):
+            raise Product.DoesNotExist("Producto no encontrado")
+
+        # Lo que se cobra sale de las promos en la BD (2 consultas), no del snapshot en memoria:
+        # en otro worker ese puede tener hasta PROMO_SNAPSHOT_TTL de atraso
+        prices = resolve_promotions(products.values(), snapshot=PromotionSnapshot())
+        order = Order.objects.create(**order_fields)
+        items = [
+            OrderItem(order=order, product=products[pid], quantity=qty, unit_price=prices[pid][1])
+            for pid, qty in lines
+            if pid in products
+        ]
+        OrderItem.objects.bulk_create(items)
+        deduct_raw_materials(items)
+        order_placed.send(sender=Order, order=order, items=items)
+    return order
@@ -0,0 +1,124 @@
+import hashlib
+import os
+import tempfile
+from django.conf import settings
+from django.db.models import Count, F, Max, Sum
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+
+# Carpeta donde se guardan los PDF ya generados (uno por estado de inventario)
+PDF_CACHE_DIR = getattr(
+    settings, 'SHOPPING_LIST_PDF_DIR', os.path.join(tempfile.gettempdir(), 'baneton_shopping_list')
+)
+
+
+class ShoppingListPDF:
+    """
+    Paginated shopping list drawn row by row on a ReportLab canvas.
+
+    When the next row doesn't fit above the bottom margin the page is closed
+    and the title/column headers are drawn again on the new one. Rows are
+    written as they arrive, so the caller can feed them from a chunked
+    queryset iterator.
+    """
+
+    TITLE = "Shopping List: Items Expiring Soon"
+    COLUMNS = ((50, "Name"), (200, "Units"), (350, "Expiration Date"))
+    ROW_HEIGHT = 20
+    BOTTOM_MARGIN = 50
+
+    def __init__(self, fileobj, pagesize=letter):
+        self.canvas = canvas.Canvas(fileobj, pagesize=pagesize)
+        self.width, self.height = pagesize
+        self.page = 0
+        self.rows = 0
+        self._start_page()
+
+    def _start_page(self):
+        self.page += 1
+        p = self.canvas
+        p.setFont("Helvetica", 16)
+        p.drawString(200, self.height - 42, self.TITLE)
+        p.setFont("Helvetica", 12)
+        header_y = self.height - 92
+        for x, label in self.COLUMNS:
+            p.drawString(x, header_y, label)
+        p.setFont("Helvetica", 9)
+        p.drawRightString(self.width - 50, self.BOTTOM_MARGIN - 20, f"Página {self.page}")
+        p.setFont("Helvetica", 12)
+        self.y = header_y - self.ROW_HEIGHT
+
+    def add_row(self, name, units, exp_date):
+        if self.y < self.BOTTOM_MARGIN:
+            self.canvas.showPage()
+            self._start_page()
+        for (x, _), value in zip(self.COLUMNS, (name, units, exp_date)):
+            self.canvas.drawString(x, self.y, str(value))
+        self.y -= self.ROW_HEIGHT
+        self.rows += 1
+
+    def save(self):
+        self.canvas.showPage()
+        self.canvas.save()
+
+
+def shopping_list_fingerprint(queryset, *extra):
+    """
+    Hash of the state the PDF depends on, from one aggregate query: number
+    of rows, max id, unit totals (a weighted sum too, so moving units
+    between materials changes it) and the last updated_at. Units are also
+    changed by set-based UPDATEs that don't touch updated_at, that's why
+    they are read here; renames and date edits go through save(). All of it
+    comes from the DB, so every process computes the same name.
+    """
+    state = queryset.order_by().aggregate(
+        rows=Count('id'),
+        max_id=Max('id'),
+        total_units=Sum('units'),
+        weighted_units=Sum(F('id') * F('units')),
+        last_change=Max('updated_at'),
+    )
+    parts = [*extra, *(state[k] for k in sorted(state))]
+    return hashlib.sha1(repr(parts).encode()).hexdigest()[:16]
+
+
+def render_shopping_list(queryset, path, chunk_size=2000):
+    """
+    Render the queryset (RawMaterial) into a PDF at ``path``. Rows are read
+    with iterator(chunk_size) and only (name, units, exp_date) are loaded,
+    so memory stays flat no matter how many materials there are. The file
+    is written next to its final name and moved into place at the end.
+    """
+    directory = os.path.dirname(path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.part')
+    try:
+        with os.fdopen(fd, 'wb') as fh:
+            pdf = ShoppingListPDF(fh)
+            for name, units, exp_date in queryset.values_list('name', 'units', 'exp_date').iterator(chunk_size=chunk_size):
+                pdf.add_row(name, units, exp_date)
+            pdf.save()
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return path
+
+
+def cached_shopping_list(queryset, *key_parts):
+    """
+    Path of the PDF for the queryset, rendering it only when the inventory
+    state changed since the last one. Older PDFs are removed.
+    """
+    os.makedirs(PDF_CACHE_DIR, exist_ok=True)
+    fingerprint = shopping_list_fingerprint(queryset, *key_parts)
+    path = os.path.join(PDF_CACHE_DIR, f'shopping_list_{fingerprint}.pdf')
+    if not os.path.exists(path):
+        render_shopping_list(queryset, path)
+        for entry in os.listdir(PDF_CACHE_DIR):
+            if entry.startswith('shopping_list_') and entry.endswith('.pdf') and os.path.join(PDF_CACHE_DIR, entry) != path:
+                try:
+                    os.remove(os.path.join(PDF_CACHE_DIR, entry))
+                except OSError:
+                    pass
+    return path
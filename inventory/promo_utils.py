@@ -1,24 +1,222 @@
+import threading
+from datetime import timedelta
 from decimal import Decimal
+from django.conf import settings
 from django.utils import timezone
-from django.db.models import Q
+from django.db.models import Case, DecimalField, Exists, ExpressionWrapper, F, FloatField, IntegerField, OuterRef, Q, Value, When
+from django.db.models.functions import Cast, Greatest
+from django.db.models.lookups import Exact, GreaterThan
 from .models import Promotion, Product
 
-def get_active_promotion_for(product: Product):
-    """Find the first active promotion that applies to the product."""
-    now = timezone.now()
-    qs = Promotion.objects.filter(is_active=True).filter(
+# Atributo donde se guarda (promo, precio_efectivo) ya resuelto en cada instancia
+_RESOLUTION_ATTR = '_promo_resolution'
+
+
+def current_promotions_qs(now=None):
+    """Promotions that are active right now (without the product filter)."""
+    now = now or timezone.now()
+    return Promotion.objects.filter(is_active=True).filter(
         Q(starts_at__isnull=True) | Q(starts_at__lte=now),
         Q(ends_at__isnull=True) | Q(ends_at__gte=now),
-    ).filter(
-        Q(applies_to_all=True) | Q(products=product)
-    ).order_by('-id')
-    return qs.first()
+    )
 
-def price_after_discount(product: Product) -> Decimal:
-    promo = get_active_promotion_for(product)
+
+def apply_discount(price: Decimal, promo) -> Decimal:
+    """Apply a promotion to a base price (no promo -> same price)."""
     if not promo:
-        return product.price
+        return price
     if promo.discount_type == 'fixed':
-        return max(Decimal('0.00'), product.price - promo.value)
+        return max(Decimal('0.00'), price - promo.value)
     # percent
-    return max(Decimal('0.00'), (product.price * (Decimal('100') - promo.value) / Decimal('100')).quantize(Decimal('0.01')))
+    return max(Decimal('0.00'), (price * (Decimal('100') - promo.value) / Decimal('100')).quantize(Decimal('0.01')))
+
+
+# =========================================
+# Snapshot en memoria de las promos vigentes
+# =========================================
+# Tope de vida del snapshot (segundos). Las señales solo invalidan el proceso
+# actual; con varios workers este tope acota cuánto puede durar uno viejo.
+PROMO_SNAPSHOT_TTL = getattr(settings, 'PROMO_SNAPSHOT_TTL', 60)
+# Vida mínima (segundos): una promo que vence justo ahora (ends_at == now) no
+# obliga a reconstruirlo en cada llamada; un cambio de vigencia se puede ver
+# hasta este tiempo tarde en el catálogo (el checkout no usa el snapshot cacheado)
+PROMO_SNAPSHOT_MIN_TTL = getattr(settings, 'PROMO_SNAPSHOT_MIN_TTL', 1)
+
+
+class PromotionSnapshot:
+    """
+    Current promotions and their product sets, built with two queries.
+    Valid until the next starts_at/ends_at boundary (or the TTL, whichever
+    comes first); after that it must be rebuilt.
+    """
+
+    def __init__(self, now=None):
+        now = now or timezone.now()
+        # Todas las activas: las futuras marcan cuándo cambia el conjunto vigente
+        # (se ordenan en Python: con ORDER BY id SQLite prefiere recorrer toda la
+        # tabla por rowid en vez del índice parcial de las activas)
+        active = sorted(Promotion.objects.filter(is_active=True).order_by(), key=lambda p: p.id, reverse=True)
+        current = [
+            p for p in active
+            if (p.starts_at is None or p.starts_at <= now) and (p.ends_at is None or p.ends_at >= now)
+        ]
+
+        boundaries = [now + timedelta(seconds=PROMO_SNAPSHOT_TTL)]
+        boundaries += [p.starts_at for p in active if p.starts_at and p.starts_at > now]
+        boundaries += [p.ends_at for p in current if p.ends_at]
+        self.expires_at = max(min(boundaries), now + timedelta(seconds=PROMO_SNAPSHOT_MIN_TTL))
+
+        self.global_promo = next((p for p in current if p.applies_to_all), None)
+        # Solo las promos específicas más nuevas que la global pueden ganarle
+        specific = {
+            p.id: p for p in current
+            if not p.applies_to_all and (self.global_promo is None or p.id > self.global_promo.id)
+        }
+        best = {}
+        if specific:
+            rows = Promotion.products.through.objects.filter(
+                promotion_id__in=list(specific)
+            ).values_list('product_id', 'promotion_id')
+            for product_id, promotion_id in rows:
+                if promotion_id > best.get(product_id, 0):
+                    best[product_id] = promotion_id
+        self.by_product = {product_id: specific[promotion_id] for product_id, promotion_id in best.items()}
+        # Específicas vigentes de la más nueva a la más vieja (para el Case/When en SQL)
+        self.specific_promotions = list(specific.values())
+
+    def is_valid(self, now=None):
+        return (now or timezone.now()) < self.expires_at
+
+    def promotion_for(self, product_id):
+        return self.by_product.get(product_id, self.global_promo)
+
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+
+
+def get_promotion_snapshot():
+    """Return the cached snapshot, rebuilding it if it expired or was invalidated."""
+    global _snapshot
+    snap = _snapshot
+    if snap is not None and snap.is_valid():
+        return snap
+    with _snapshot_lock:
+        if _snapshot is None or not _snapshot.is_valid():
+            _snapshot = PromotionSnapshot()
+        return _snapshot
+
+
+def invalidate_promotion_snapshot():
+    """Drop the cached snapshot (called from the Promotion signals)."""
+    global _snapshot
+    _snapshot = None
+
+
+def resolve_promotions(products, snapshot=None):
+    """
+    Resolve the active promotion and effective price for many products at once.
+    Accepts a list or queryset of products and returns
+    {product_id: (promotion_or_None, effective_price)}. Promotions come from
+    the in-memory snapshot, so once it is warm this runs no queries besides
+    loading the products themselves. The winner per product is the newest
+    (highest id) applicable promotion. Pass ``snapshot`` to resolve against
+    another one (e.g. a fresh PromotionSnapshot() read from the DB).
+    """
+    snapshot = snapshot or get_promotion_snapshot()
+    resolved = {}
+    for product in products:
+        promo = snapshot.promotion_for(product.pk)
+        resolved[product.pk] = (promo, apply_discount(product.price, promo))
+    return resolved
+
+
+MONEY = DecimalField(max_digits=12, decimal_places=2)
+
+
+def _discounted_price_expr(promo):
+    """
+    SQL version of apply_discount for one promotion. Works in integer cents
+    and rounds half-even like Decimal.quantize, so the filters and the sort
+    use exactly the price that the page shows (no float rounding in SQL).
+    """
+    # price no tiene decimales (decimal_places=0)
+    price = Cast(F('price'), IntegerField())
+    if promo.discount_type == 'fixed':
+        cents = price * Value(100) - Value(int(promo.value * 100))
+    else:
+        # precio * (100 - valor) en centésimas de centavo, todo entero
+        exact = price * Value(int((Decimal('100') - promo.value) * 100))
+        cents = exact / Value(100)
+        rest = exact - cents * Value(100)
+        cents = Case(
+            When(GreaterThan(rest, 50), then=cents + Value(1)),
+            # Justo en la mitad: al par (q + q % 2, sin la función MOD que en SQLite es Python)
+            When(Exact(rest, 50), then=cents + cents - (cents / Value(2)) * Value(2)),
+            default=cents,
+            output_field=IntegerField(),
+        )
+    cents = Greatest(cents, Value(0), output_field=IntegerField())
+    # División en float: SQLite convierte CAST(x AS NUMERIC) en entero y truncaría
+    return ExpressionWrapper(Cast(cents, FloatField()) / Value(100.0), output_field=MONEY)
+
+
+def annotate_effective_price(queryset):
+    """
+    Annotate a Product queryset with ``effective_price`` and ``promo_id``
+    computed in SQL: a Case/When over the current promotions (newest first,
+    fixed and percent branches), so filtering, ordering and pagination by
+    effective price can run in the database. The list of promotions comes
+    from the snapshot; the product membership is an EXISTS on the M2M table.
+    """
+    snapshot = get_promotion_snapshot()
+    through = Promotion.products.through.objects
+    price_whens = []
+    promo_whens = []
+    for promo in snapshot.specific_promotions:
+        applies = Exists(through.filter(promotion_id=promo.id, product_id=OuterRef('pk')))
+        price_whens.append(When(applies, then=_discounted_price_expr(promo)))
+        promo_whens.append(When(applies, then=Value(promo.id)))
+
+    global_promo = snapshot.global_promo
+    if global_promo:
+        price_default = _discounted_price_expr(global_promo)
+        promo_default = Value(global_promo.id)
+    else:
+        price_default = F('price')
+        promo_default = Value(None)
+
+    return queryset.annotate(
+        effective_price=Case(*price_whens, default=price_default, output_field=MONEY),
+        promo_id=Case(*promo_whens, default=promo_default, output_field=IntegerField()),
+    )
+
+
+def attach_promotions(products):
+    """
+    Resolve promotions in bulk and cache the result on each instance, so the
+    template filters (has_promo / effective_price) don't hit the DB per product.
+    Returns the products as a list.
+    """
+    products = list(products)
+    resolved = resolve_promotions(products)
+    for product in products:
+        setattr(product, _RESOLUTION_ATTR, resolved[product.pk])
+    return products
+
+
+def _resolution_for(product: Product):
+    cached = getattr(product, _RESOLUTION_ATTR, None)
+    if cached is None:
+        cached = resolve_promotions([product])[product.pk]
+        setattr(product, _RESOLUTION_ATTR, cached)
+    return cached
+
+
+def get_active_promotion_for(product: Product):
+    """Find the first active promotion that applies to the product."""
+    return _resolution_for(product)[0]
+
+
+def price_after_discount(product: Product) -> Decimal:
+    return _resolution_for(product)[1]
@@ -0,0 +1,76 @@
+from django.db.models import Min, Subquery
+from .models import CustomerPurchase, Order, OrderItem
+
+
+def record_purchases(order, items):
+    """
+    Add the (customer, product) pairs of an order to the purchase index.
+    Pairs already there are ignored by the unique constraint.
+    """
+    if not order.customer_id:
+        return
+    product_ids = {item.product_id for item in items}
+    CustomerPurchase.objects.bulk_create(
+        [
+            CustomerPurchase(customer_id=order.customer_id, product_id=product_id, first_purchased_at=order.date)
+            for product_id in product_ids
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def forget_purchases(customer_id, product_ids):
+    """Remove pairs that no longer have any OrderItem behind them (order/item deleted)."""
+    if not customer_id or not product_ids:
+        return
+    _forget(customer_id, product_ids)
+
+
+def forget_item_purchases(order_id, product_ids):
+    """
+    forget_purchases for items of one order, reading its customer inside the
+    same queries (no Order loaded per deleted item).
+    """
+    if not order_id or not product_ids:
+        return
+    _forget(Subquery(Order.objects.filter(pk=order_id).values('customer_id')[:1]), product_ids)
+
+
+def _forget(customer, product_ids):
+    still_bought = set(
+        OrderItem.objects.filter(order__customer_id=customer, product_id__in=product_ids)
+        .values_list('product_id', flat=True)
+        .distinct()
+    )
+    gone = set(product_ids) - still_bought
+    if gone:
+        CustomerPurchase.objects.filter(customer_id=customer, product_id__in=gone).delete()
+
+
+def has_purchased(customer, product):
+    """True if the customer bought the product at least once (one unique-index lookup)."""
+    if customer is None:
+        return False
+    return CustomerPurchase.objects.filter(customer=customer, product=product).exists()
+
+
+def rebuild_purchase_index(batch_size=5000):
+    """Rebuild the whole index from the OrderItem history. Returns the number of pairs."""
+    CustomerPurchase.objects.all().delete()
+    pairs = (
+        OrderItem.objects.filter(order__customer__isnull=False)
+        .values('order__customer_id', 'product_id')
+        .annotate(first=Min('order__date'))
+        .values_list('order__customer_id', 'product_id', 'first')
+        .order_by()
+    )
+    total = 0
+    batch = []
+    for customer_id, product_id, first in pairs.iterator(chunk_size=batch_size):
+        batch.append(CustomerPurchase(customer_id=customer_id, product_id=product_id, first_purchased_at=first))
+        if len(batch) >= batch_size:
+            CustomerPurchase.objects.bulk_create(batch)
+            total += len(batch)
+            batch = []
+    CustomerPurchase.objects.bulk_create(batch)
+    return total + len(batch)
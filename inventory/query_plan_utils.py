@@ -0,0 +1,62 @@
+"""
+EXPLAIN QUERY PLAN helpers (SQLite).
+
+Used by the tests that guard the hot queries of the POS, inventory and
+promotions: they check which indexes a plan uses ("USING [COVERING] INDEX
+<name>") and that no table is read row by row (a "SCAN <table>" line that
+doesn't go through an index).
+"""
+
+import re
+
+from django.db import connection
+
+# "SCAN inventory_order" o "SCAN U0" (alias); "SCAN CONSTANT ROW" y "SCAN (subquery-1)" no son tablas
+_SCAN = re.compile(r'^SCAN (?!CONSTANT ROW\b)([^\s(]\S*)(.*)$')
+_INDEX = re.compile(r'\bUSING (?:COVERING )?INDEX (\w+)')
+
+
+def query_plan(sql, params=()):
+    """Detail column of EXPLAIN QUERY PLAN for the given SQL."""
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def queryset_plan(queryset):
+    """EXPLAIN QUERY PLAN of a queryset."""
+    sql, params = queryset.query.sql_with_params()
+    return query_plan(sql, params)
+
+
+def full_scans(plan):
+    """Tables (or aliases) read with a full scan in a plan from query_plan()."""
+    found = []
+    for line in plan:
+        match = _SCAN.match(line)
+        # Con índice (USING ... INDEX / INTEGER PRIMARY KEY) o tabla virtual (FTS): no es un recorrido completo
+        if match and 'USING ' not in match.group(2) and 'VIRTUAL TABLE' not in match.group(2):
+            found.append(match.group(1))
+    return found
+
+
+def indexes_used(plan):
+    """Names of the indexes a plan from query_plan() reads ("USING [COVERING] INDEX <name>")."""
+    return {match.group(1) for line in plan for match in _INDEX.finditer(line)}
+
+
+def full_scan_queries(queries):
+    """
+    (sql, tables) of the SELECTs in ``queries`` that do a full scan.
+    queries: the list from CaptureQueriesContext / connection.queries (SQL
+    with the parameters already quoted, so it can be explained as is).
+    """
+    found = []
+    for query in queries:
+        sql = query['sql']
+        if not sql.lstrip().upper().startswith('SELECT'):
+            continue
+        tables = full_scans(query_plan(sql))
+        if tables:
+            found.append((sql, tables))
+    return found
@@ -0,0 +1,52 @@
+from django.db.models import Count, F, FloatField, Sum, Value
+from django.db.models.functions import Cast, Coalesce, Greatest, NullIf
+from .models import Product, Rating
+
+
+def apply_rating_change(product_id, count_delta, sum_delta):
+    """
+    Move the denormalized rating totals of a product by the given deltas
+    with one UPDATE over F() expressions (concurrent ratings don't lose
+    increments). rating_avg is recomputed in the same statement from the
+    new totals.
+    """
+    if not count_delta and not sum_delta:
+        return
+    new_count = Greatest(F('rating_count') + Value(count_delta), Value(0))
+    new_sum = Greatest(F('rating_sum') + Value(sum_delta), Value(0))
+    Product.objects.filter(pk=product_id).update(
+        rating_count=new_count,
+        rating_sum=new_sum,
+        rating_avg=Coalesce(Cast(new_sum, FloatField()) / NullIf(new_count, Value(0)), Value(0.0)),
+    )
+
+
+def rating_totals():
+    """{product_id: (count, sum of stars)} computed from the Rating table."""
+    rows = (
+        Rating.objects.values('product_id')
+        .annotate(count=Count('id'), total=Sum('stars'))
+        .values_list('product_id', 'count', 'total')
+        .order_by()
+    )
+    return {product_id: (count, total or 0) for product_id, count, total in rows}
+
+
+def reconcile_ratings(dry_run=False, batch_size=1000):
+    """
+    Compare the stored totals with the Rating table and fix the products
+    that drifted (e.g. ratings changed with queryset.update()/bulk_create,
+    which skip the signals). Returns the list of drifted products.
+    """
+    totals = rating_totals()
+    drifted = []
+    products = Product.objects.only('pk', 'rating_count', 'rating_sum', 'rating_avg').order_by('pk')
+    for product in products.iterator(chunk_size=2000):
+        count, total = totals.get(product.pk, (0, 0))
+        avg = total / count if count else 0.0
+        if product.rating_count != count or product.rating_sum != total or abs(product.rating_avg - avg) > 1e-9:
+            product.rating_count, product.rating_sum, product.rating_avg = count, total, avg
+            drifted.append(product)
+    if drifted and not dry_run:
+        Product.objects.bulk_update(drifted, ['rating_count', 'rating_sum', 'rating_avg'], batch_size=batch_size)
+    return drifted
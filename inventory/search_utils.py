@@ -0,0 +1,117 @@
+"""
+Búsqueda de productos con SQLite FTS5.
+
+El índice (tabla virtual ``inventory_product_fts``, tokenizer trigram) guarda
+nombre y descripción ya normalizados (minúsculas y sin tildes), así que la
+búsqueda es por subcadena como el icontains anterior, pero sin recorrer toda
+la tabla, insensible a tildes ("maiz" encuentra "Maíz") y ordenada por bm25.
+Se mantiene al día con las señales de Product (inventory/signals.py).
+En otros motores, o sin FTS5, se usa el filtro icontains de siempre.
+"""
+
+import unicodedata
+
+from django.db import connection
+from django.db.models import Q
+
+FTS_TABLE = 'inventory_product_fts'
+# Peso de cada columna en bm25 (el nombre pesa más que la descripción)
+NAME_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+# El tokenizer trigram no puede buscar términos de menos de 3 caracteres
+MIN_TERM_LENGTH = 3
+
+_available = False
+
+
+def normalize(text):
+    """Lowercase and strip accents ("Maíz Dulce" -> "maiz dulce")."""
+    text = unicodedata.normalize('NFKD', text or '')
+    return ''.join(c for c in text if not unicodedata.combining(c)).lower()
+
+
+def fts_available():
+    """True if the FTS table exists (SQLite with FTS5, migration applied)."""
+    global _available
+    if connection.vendor != 'sqlite':
+        return False
+    # Solo se cachea el positivo: la tabla puede aparecer al aplicar la migración
+    if not _available:
+        _available = FTS_TABLE in connection.introspection.table_names()
+    return _available
+
+
+def index_products(products):
+    """Insert or refresh the index rows of the given products."""
+    if not fts_available():
+        return
+    rows = [(p.pk, normalize(p.name), normalize(p.description)) for p in products]
+    if not rows:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [(pk,) for pk, _, _ in rows])
+        cursor.executemany(f'INSERT INTO {FTS_TABLE} (rowid, name, description) VALUES (%s, %s, %s)', rows)
+
+
+def remove_products(product_ids):
+    if not fts_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [(pk,) for pk in product_ids])
+
+
+def rebuild_index(batch_size=5000):
+    """Rebuild the whole index from the Product table. Returns indexed rows."""
+    from .models import Product
+
+    if not fts_available():
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+    total = 0
+    batch = []
+    for product in Product.objects.only('pk', 'name', 'description').iterator(chunk_size=batch_size):
+        batch.append(product)
+        if len(batch) >= batch_size:
+            index_products(batch)
+            total += len(batch)
+            batch = []
+    index_products(batch)
+    return total + len(batch)
+
+
+def _match_expression(terms):
+    # Cada término como frase entre comillas (escapando comillas); juntos = AND
+    return ' '.join('"%s"' % term.replace('"', '""') for term in terms)
+
+
+def search_products(queryset, query):
+    """
+    Filter a Product queryset by ``query`` on name and description.
+    With FTS the products are joined to the index and get a ``search_rank``
+    column (bm25, lower is better; an extra() select, listed in
+    ``queryset.query.extra``) so the caller can order by relevance; otherwise
+    (or for terms shorter than 3 characters) it falls back to icontains on
+    the name.
+    """
+    terms = normalize(query).split()
+    fts_terms = [t for t in terms if len(t) >= MIN_TERM_LENGTH]
+    if not fts_available() or not fts_terms:
+        return queryset.filter(name__icontains=query.strip())
+
+    match = _match_expression(fts_terms)
+    table = queryset.model._meta.db_table
+    # Join con la tabla FTS: MATCH y bm25 se evalúan una sola vez por producto encontrado
+    # (como subconsulta correlacionada MATCH se repetía por cada fila de afuera)
+    queryset = queryset.extra(
+        select={'search_rank': f'bm25({FTS_TABLE}, %s, %s)'},
+        select_params=[NAME_WEIGHT, DESCRIPTION_WEIGHT],
+        tables=[FTS_TABLE],
+        where=[f'{FTS_TABLE} MATCH %s', f'{FTS_TABLE}.rowid = "{table}"."id"'],
+        params=[match],
+    )
+    # Términos cortos que el trigram no indexa: se exigen con icontains
+    for term in terms:
+        if len(term) < MIN_TERM_LENGTH:
+            queryset = queryset.filter(Q(name__icontains=term) | Q(description__icontains=term))
+    return queryset
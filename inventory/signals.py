@@ -1,25 +1,15 @@
 # inventory/signals.py
 from django.db.models.signals import post_save
 from django.dispatch import receiver
-from .models import OrderItem, ProductRawMaterial
+from .models import OrderItem
+from .stock_utils import deduct_raw_materials
 
 @receiver(post_save, sender=OrderItem)
 def deduct_raw_material_inventory(sender, instance, created, **kwargs):
-    if created:  # Only run when new OrderItem is created
-        product = instance.product
-        quantity_ordered = instance.quantity
-
-        # Get all raw materials for this product
-        product_materials = ProductRawMaterial.objects.filter(product=product)
-
-        for pm in product_materials:
-            required_amount = pm.material_quantity * quantity_ordered
-            raw_material = pm.material
-
-            print(f"Deducting {required_amount} {raw_material.units} of {raw_material.name}")
-
-            raw_material.units -= required_amount
-            raw_material.save()
+    # Only run when new OrderItem is created.
+    # order_utils.create_order usa bulk_create (sin señales) y descuenta por su cuenta.
+    if created:
+        deduct_raw_materials([instance])
 
 
 # [[AGREGADO]] Set unit_price usando precio efectivo (con promoción) al crear OrderItem
@@ -38,3 +28,156 @@ def set_unit_price_from_promo(sender, instance, **kwargs):
     # Precio efectivo del producto en el momento actual
     effective = price_after_discount(instance.product)
     instance.unit_price = effective
+
+
+# [[AGREGADO]] Invalidar el snapshot de promociones cuando cambian
+from django.db import transaction
+from django.db.models.signals import post_delete, m2m_changed
+from inventory.promo_utils import invalidate_promotion_snapshot
+from .models import Promotion
+
+def _invalidate_promotions():
+    invalidate_promotion_snapshot()
+    # Otra vez al confirmar, por si alguien lo reconstruyó antes del commit
+    transaction.on_commit(invalidate_promotion_snapshot)
+
+@receiver(post_save, sender=Promotion)
+@receiver(post_delete, sender=Promotion)
+def invalidate_promotions_on_change(sender, instance, **kwargs):
+    _invalidate_promotions()
+
+@receiver(m2m_changed, sender=Promotion.products.through)
+def invalidate_promotions_on_products_change(sender, instance, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        _invalidate_promotions()
+
+
+# [[AGREGADO]] Invalidar la lista de materiales (recetas) en memoria
+from inventory.bom_utils import invalidate_bom
+from .models import ProductRawMaterial
+
+@receiver(post_save, sender=ProductRawMaterial)
+@receiver(post_delete, sender=ProductRawMaterial)
+def invalidate_bom_on_change(sender, instance, **kwargs):
+    invalidate_bom()
+    transaction.on_commit(invalidate_bom)
+
+
+# [[AGREGADO]] Mantener al día el índice de búsqueda (FTS5) de productos
+# (compara contra la fila leída/guardada que recuerda Product, sin post_init en cada carga)
+from inventory.search_utils import index_products, remove_products
+from .models import Product
+
+@receiver(post_save, sender=Product)
+def index_product_for_search(sender, instance, created, update_fields=None, **kwargs):
+    # Reindexar solo si cambió el nombre o la descripción (no en cada cambio de stock)
+    if update_fields is not None and not {'name', 'description'} & set(update_fields):
+        return
+    # Un campo diferido no se escribió en este guardado: no pudo cambiar (y no se carga para comparar)
+    fields = [f for f in ('name', 'description') if f in instance.__dict__]
+    if created or instance.loaded_values(*fields) != tuple(getattr(instance, f) for f in fields):
+        index_products([instance])
+
+@receiver(post_delete, sender=Product)
+def remove_product_from_search(sender, instance, **kwargs):
+    remove_products([instance.pk])
+
+
+# [[AGREGADO]] Totales de calificaciones desnormalizados en Product
+from django.db.models.signals import post_init, pre_delete
+from inventory.rating_utils import apply_rating_change
+from .models import Rating
+
+@receiver(post_init, sender=Rating)
+def remember_loaded_rating(sender, instance, **kwargs):
+    # Valores con los que se cargó de la BD (para saber el delta al guardar sin otra consulta)
+    instance._loaded_rating = (instance.product_id, instance.stars) if instance.pk else None
+
+@receiver(post_save, sender=Rating)
+def update_rating_totals_on_save(sender, instance, created, **kwargs):
+    previous = None if created else instance._loaded_rating
+    if previous is None:
+        apply_rating_change(instance.product_id, 1, instance.stars)
+    elif previous[0] != instance.product_id:
+        apply_rating_change(previous[0], -1, -previous[1])
+        apply_rating_change(instance.product_id, 1, instance.stars)
+    else:
+        apply_rating_change(instance.product_id, 0, instance.stars - previous[1])
+    instance._loaded_rating = (instance.product_id, instance.stars)
+
+@receiver(pre_delete, sender=Rating)
+def update_rating_totals_on_delete(sender, instance, **kwargs):
+    # Valores actuales de la fila (la instancia pudo quedar vieja); delete() ya va en una transacción
+    current = Rating.objects.filter(pk=instance.pk).values_list('product_id', 'stars').first()
+    if current:
+        apply_rating_change(current[0], -1, -current[1])
+
+
+# [[AGREGADO]] Índice (customer, producto) de compras para el permiso de calificar
+from inventory.order_utils import deleted_with_parent, order_placed
+from inventory.purchase_utils import forget_item_purchases, forget_purchases, record_purchases
+from .models import Order
+
+@receiver(order_placed)
+def add_order_to_purchase_index(sender, order, items, **kwargs):
+    record_purchases(order, items)
+
+@receiver(post_save, sender=OrderItem)
+def add_item_to_purchase_index(sender, instance, created, **kwargs):
+    if created:
+        record_purchases(instance.order, [instance])
+
+@receiver(post_init, sender=Order)
+def remember_loaded_customer(sender, instance, **kwargs):
+    # Solo si se cargó el campo (con only()/defer() no se fuerza otra consulta)
+    loaded = instance.pk and 'customer_id' in instance.__dict__
+    instance._loaded_customer_id = instance.customer_id if loaded else None
+
+@receiver(post_save, sender=Order)
+def add_reassigned_order_to_purchase_index(sender, instance, created, **kwargs):
+    # Una orden existente a la que se le asigna (o cambia) el cliente
+    previous = instance._loaded_customer_id
+    instance._loaded_customer_id = instance.customer_id
+    if created or previous == instance.customer_id:
+        return
+    product_ids = list(instance.orderitem_set.values_list('product_id', flat=True).distinct())
+    if instance.customer_id:
+        record_purchases(instance, [OrderItem(product_id=pid) for pid in product_ids])
+    forget_purchases(previous, product_ids)
+
+@receiver(pre_delete, sender=Order)
+def remember_order_purchases(sender, instance, **kwargs):
+    # Antes del borrado, con los ítems todavía en la tabla
+    if instance.customer_id:
+        instance._forget_purchases = list(instance.orderitem_set.values_list('product_id', flat=True).distinct())
+
+@receiver(post_delete, sender=Order)
+def remove_order_from_purchase_index(sender, instance, **kwargs):
+    # La misma instancia que pasó por pre_delete (el Collector envía ambas señales con ella)
+    product_ids = getattr(instance, '_forget_purchases', None)
+    if product_ids:
+        forget_purchases(instance.customer_id, product_ids)
+
+@receiver(post_delete, sender=OrderItem)
+def remove_item_from_purchase_index(sender, instance, origin=None, **kwargs):
+    # Con su orden se olvidan en bloque; con su producto o cliente el cascade ya borró los pares
+    if deleted_with_parent(origin):
+        return
+    forget_item_purchases(instance.order_id, [instance.product_id])
+
+
+# [[AGREGADO]] Alertas de stock bajo (StockAlert) al cambiar quantity/reorder_threshold
+from inventory.alert_utils import stock_level, sync_stock_alerts
+
+@receiver(post_save, sender=Product)
+def update_stock_alert(sender, instance, created, update_fields=None, **kwargs):
+    if update_fields is not None and not {'quantity', 'reorder_threshold'} & set(update_fields):
+        return
+    current = (instance.quantity, instance.reorder_threshold)
+    previous = None if created else instance.loaded_values('quantity', 'reorder_threshold')
+    # Sin cambios, o sigue por encima del umbral: no hay alerta que tocar
+    unchanged = previous == current or (
+        stock_level(*current) is None and (created or (previous is not None and stock_level(*previous) is None))
+    )
+    if not unchanged:
+        sync_stock_alerts([instance])
@@ -0,0 +1,45 @@
+from collections import defaultdict
+from django.db.models import Case, F, FloatField, IntegerField, Value, When
+from django.db.models.functions import Cast
+from .bom_utils import get_bom
+from .models import MovimientosInventario, RawMaterial
+
+
+def material_demand(items):
+    """
+    Total raw material needed by a set of order items.
+    items: iterable of objects with product_id and quantity (OrderItem).
+    Returns {material_id: amount} using the cached bill of materials.
+    """
+    qty_by_product = defaultdict(int)
+    for item in items:
+        qty_by_product[item.product_id] += item.quantity
+    return get_bom().expand(qty_by_product)
+
+
+def deduct_raw_materials(items):
+    """
+    Discount from inventory the raw materials used by the order items.
+
+    The whole demand is applied with one UPDATE (CASE per material over an
+    F() expression), so concurrent orders can't overwrite each other's
+    decrements, and the matching OUT movements are written with bulk_create.
+    Returns the {material_id: amount} that was deducted.
+    """
+    demand = {material_id: amount for material_id, amount in material_demand(items).items() if amount}
+    if not demand:
+        return {}
+
+    amount_expr = Case(
+        *[When(pk=material_id, then=Value(amount)) for material_id, amount in demand.items()],
+        output_field=FloatField(),
+    )
+    # units es entero: se trunca igual que al guardar el modelo
+    RawMaterial.objects.filter(pk__in=list(demand)).update(
+        units=Cast(F('units') - amount_expr, output_field=IntegerField())
+    )
+    MovimientosInventario.objects.bulk_create([
+        MovimientosInventario(material_id=material_id, movement_type='OUT', quantity=amount)
+        for material_id, amount in demand.items()
+    ])
+    return demand
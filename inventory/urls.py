@@ -7,6 +7,7 @@ urlpatterns = [
     path('editar/<int:pk>/', views.editar_materia_prima, name='editar_materia'),
     path('create/', views.create_raw_material, name='create_raw_material'),
     path('history/', views.inventory_history, name='inventory_history'),
+    path('history/export/', views.inventory_history_csv, name='inventory_history_csv'),
     path('generate_shopping_list_pdf/', views.generate_shopping_list, name='generate_shopping_list'),
     path('low-stock/', views.low_stock_alerts, name='low_stock_alerts'),
 ]
\ No newline at end of file
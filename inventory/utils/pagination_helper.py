@@ -1,9 +1,21 @@
 """
 Pagination utility for consistent pagination across the application.
 This helper provides a reusable way to paginate querysets with consistent behavior.
+
+Two modes are available:
+- page numbers (default): Django's Paginator, ``?page=N``.
+- keyset (``keyset=True``): seeks on the ordering column plus the primary key
+  with ``?cursor=...``; no OFFSET scan, so deep pages cost the same as the first.
 """
 
+import base64
+import binascii
+import datetime
+import json
+
+from django.core.exceptions import ValidationError
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
+from django.db.models import Max, Q
 
 
 class PaginationHelper:
@@ -14,9 +26,14 @@ class PaginationHelper:
         queryset = Product.objects.all()
         pagination = PaginationHelper(queryset, request, items_per_page=10, order_by='name')
         context = pagination.get_context()
+
+    Keyset usage (large tables such as Order or MovimientosInventario):
+        pagination = PaginationHelper(queryset, request, order_by='-date', keyset=True, count='none')
     """
-    
-    def __init__(self, queryset, request, items_per_page=10, order_by=None):
+
+    COUNT_MODES = ('exact', 'approximate', 'none')
+
+    def __init__(self, queryset, request, items_per_page=10, order_by=None, keyset=False, count='exact'):
         """
         Initialize the pagination helper.
         
@@ -25,9 +42,19 @@ class PaginationHelper:
             request: HTTP request object
             items_per_page: Number of items per page (default: 10)
             order_by: Field name to order by (default: None)
+            keyset: Use cursor (keyset) pagination on order_by + pk (default: False)
+            count: Keyset mode only. 'exact' runs COUNT(*), 'approximate' uses
+                MAX(pk) when the queryset is unfiltered, 'none' skips it (default: 'exact')
         """
         self.request = request
         self.items_per_page = items_per_page
+        self.keyset = keyset
+
+        if keyset:
+            if count not in self.COUNT_MODES:
+                raise ValueError(f"count must be one of {self.COUNT_MODES}")
+            self._init_keyset(queryset, order_by or 'pk', count)
+            return
         
         # Apply ordering if specified
         if order_by:
@@ -54,6 +81,17 @@ class PaginationHelper:
         Returns:
             dict: Context with pagination data
         """
+        if self.keyset:
+            return {
+                'keyset': True,
+                'items_count': len(self.items),
+                'total_count': self.total_count,
+                'count_is_approximate': self.count_is_approximate,
+                'has_previous': self.has_previous,
+                'has_next': self.has_next,
+                'previous_cursor': self.previous_cursor,
+                'next_cursor': self.next_cursor,
+            }
         return {
             'page_obj': self.page_obj,
             'paginator': self.paginator,
@@ -95,6 +133,101 @@ class PaginationHelper:
         Get the items for the current page.
         
         Returns:
-            QuerySet: Items for current page
+            QuerySet: Items for current page (a list in keyset mode)
         """
+        if self.keyset:
+            return self.items
         return self.page_obj.object_list
+
+    # ------------------------------------------------------------------
+    # Keyset (cursor) mode
+    # ------------------------------------------------------------------
+    def _init_keyset(self, queryset, order_by, count):
+        """
+        Fetch one page seeking on (order_by, pk).
+
+        The cursor is an opaque token with the direction and the key of the
+        first/last row shown; ``items_per_page + 1`` rows are read to know if
+        there is another page in that direction.
+        """
+        descending = order_by.startswith('-')
+        field_name = order_by.lstrip('-')
+        self.field = queryset.model._meta.get_field(field_name) if field_name != 'pk' else queryset.model._meta.pk
+        self.field_name = field_name
+
+        direction, key = self._decode_cursor(self.request.GET.get('cursor'))
+        backwards = direction == 'prev'
+
+        # Hacia atrás se recorre en el orden inverso y luego se invierte la página
+        forward_desc = descending != backwards
+        prefix = '-' if forward_desc else ''
+        ordered = queryset.order_by(f'{prefix}{field_name}', f'{prefix}pk')
+        page_qs = ordered
+        if key is not None:
+            value, pk = key
+            op = 'lt' if forward_desc else 'gt'
+            page_qs = ordered.filter(
+                Q(**{f'{field_name}__{op}': value}) | Q(**{field_name: value, f'pk__{op}': pk})
+            )
+
+        rows = list(page_qs[:self.items_per_page + 1])
+        has_more = len(rows) > self.items_per_page
+        rows = rows[:self.items_per_page]
+        if backwards:
+            rows.reverse()
+
+        self.items = rows
+        if backwards:
+            self.has_previous = has_more
+            self.has_next = key is not None
+        else:
+            self.has_previous = key is not None
+            self.has_next = has_more
+
+        self.next_cursor = self._encode_cursor('next', rows[-1]) if self.has_next and rows else None
+        self.previous_cursor = self._encode_cursor('prev', rows[0]) if self.has_previous and rows else None
+
+        self.count_is_approximate = False
+        if count == 'none':
+            self.total_count = None
+        elif count == 'approximate' and not queryset.query.where:
+            # Sin filtros, MAX(pk) se resuelve con el índice de la PK
+            self.total_count = queryset.aggregate(m=Max('pk'))['m'] or 0
+            self.count_is_approximate = True
+        else:
+            self.total_count = queryset.count()
+
+    def _encode_cursor(self, direction, obj):
+        value = getattr(obj, self.field.attname)
+        if isinstance(value, (datetime.date, datetime.datetime, datetime.time)):
+            value = value.isoformat()
+        elif value is not None and not isinstance(value, (int, float, str)):
+            value = str(value)
+        raw = json.dumps([direction, value, obj.pk]).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def _decode_cursor(self, cursor):
+        """
+        Return (direction, (value, pk)); a missing cursor, or one whose values
+        do not fit the ordering field and the pk (tampered) -> first page.
+        """
+        if not cursor:
+            return 'next', None
+        pk_field = self.field.model._meta.pk
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            direction, value, pk = json.loads(raw)
+            if direction not in ('next', 'prev'):
+                raise ValueError(direction)
+            # null, listas, objetos o booleanos no son claves válidas
+            if not all(isinstance(v, (int, float, str)) and not isinstance(v, bool) for v in (value, pk)):
+                raise TypeError('cursor values')
+            value = self.field.to_python(value)
+            pk = pk_field.to_python(pk)
+            # Rangos de enteros, largo máximo, etc.: lo que fallaría en el filter()
+            for field, v in ((self.field, value), (pk_field, pk)):
+                field.run_validators(v)
+                field.get_prep_value(v)
+            return direction, (value, pk)
+        except (binascii.Error, UnicodeDecodeError, ValueError, TypeError, OverflowError, ValidationError):
+            return 'next', None
@@ -4,12 +4,14 @@ from django.contrib.auth.decorators import login_required, permission_required
 from django.utils import timezone
 from django.utils.timezone import now, timedelta
 from .utils.pagination_helper import PaginationHelper
+from .alert_utils import low_stock_counts
 from .models import MovimientosInventario
-from django.db import models
+from django.http import StreamingHttpResponse
+from django.utils.dateparse import parse_date
+from datetime import datetime, time
+import csv
 
 def inventory(request):
-    from inventory.models import Product
-    
     today = now().date()
     soon = today + timedelta(days=5)
     expiring_soon = RawMaterial.objects.filter(exp_date__lte=soon, exp_date__gte=today)
@@ -17,10 +19,8 @@ def inventory(request):
     dismissed = request.GET.get("dismissed") == "1"
     show_modal = bool(expiring_soon) and not dismissed
 
-    # Check for low stock products
-    low_stock_count = Product.objects.filter(
-        quantity__lt=models.F('reorder_threshold')
-    ).count()
+    # Productos con stock bajo: conteo precalculado (StockAlert) y cacheado
+    low_stock_count = low_stock_counts()['total']
 
     # Apply pagination
     queryset = RawMaterial.objects.all()
@@ -40,13 +40,9 @@ def inventory(request):
 
     return render(request, "inventory/inventory.html", context)
 
-from django.http import HttpResponse
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
-from django.http import HttpResponse
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
+from django.http import FileResponse
 from .models import RawMaterial
+from .pdf_utils import cached_shopping_list
 from django.utils import timezone
 from datetime import timedelta
 
@@ -58,38 +54,20 @@ def generate_shopping_list(request):
     expiring_soon = RawMaterial.objects.filter(
         exp_date__lte=warning_date, 
         exp_date__gte=today
-    ).order_by('exp_date')
-
-    # Create the HTTP response with content type as PDF
-    response = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = 'attachment; filename="shopping_list.pdf"'
-
-    # Create the PDF using ReportLab
-    p = canvas.Canvas(response, pagesize=letter)
+    ).order_by('exp_date', 'pk')
 
-    # Set up the title
-    p.setFont("Helvetica", 16)
-    p.drawString(200, 750, "Shopping List: Items Expiring Soon")
+    # El PDF (paginado, con encabezados en cada hoja) se genera en disco por bloques
+    # y se reutiliza mientras no cambie el estado de las materias primas.
+    path = cached_shopping_list(expiring_soon, today)
+    try:
+        pdf = open(path, 'rb')
+    except FileNotFoundError:
+        # Otro proceso lo borró al guardar uno más nuevo (la carpeta es compartida): se regenera
+        pdf = open(cached_shopping_list(expiring_soon, today), 'rb')
 
-    # Set up table headers
-    p.setFont("Helvetica", 12)
-    p.drawString(50, 700, "Name")
-    p.drawString(200, 700, "Units")
-    p.drawString(350, 700, "Expiration Date")
-
-    # Draw the list of expiring items
-    y_position = 680
-    for mp in expiring_soon:
-        p.drawString(50, y_position, mp.name)
-        p.drawString(200, y_position, str(mp.units))
-        p.drawString(350, y_position, str(mp.exp_date))
-        y_position -= 20  # Move to next line
-
-    # Save the PDF (only once)
-    p.showPage()  # Finish the current page (if more pages are needed)
-    p.save()  # Finalize the PDF document
-
-    return response
+    # FileResponse lo envía en trozos, sin cargar el archivo completo en memoria
+    return FileResponse(pdf, as_attachment=True, filename='shopping_list.pdf',
+                        content_type='application/pdf')
 
 
 
@@ -164,31 +142,127 @@ def registrar_salida(material, cantidad):
     )
 
 
+def _parse_day(value):
+    try:
+        return parse_date(value) if value else None
+    except ValueError:
+        return None
+
+
+def _filtered_movements(request):
+    """
+    Movimientos filtrados por ?material=<id>&type=IN|OUT&start=YYYY-MM-DD&end=YYYY-MM-DD.
+    Devuelve (queryset, filtros_normalizados) para repintar el formulario.
+    """
+    movimientos = MovimientosInventario.objects.all()
+    filters = {
+        'material': (request.GET.get('material') or '').strip(),
+        'type': (request.GET.get('type') or '').strip(),
+        'start': (request.GET.get('start') or '').strip(),
+        'end': (request.GET.get('end') or '').strip(),
+    }
+
+    if filters['material'].isdigit():
+        movimientos = movimientos.filter(material_id=int(filters['material']))
+    else:
+        filters['material'] = ''
+    if filters['type'] in ('IN', 'OUT'):
+        movimientos = movimientos.filter(movement_type=filters['type'])
+    else:
+        filters['type'] = ''
+
+    tz = timezone.get_current_timezone()
+    start = _parse_day(filters['start'])
+    end = _parse_day(filters['end'])
+    # Rangos sobre la columna date (no __date) para aprovechar el índice
+    if start:
+        movimientos = movimientos.filter(date__gte=timezone.make_aware(datetime.combine(start, time.min), tz))
+    else:
+        filters['start'] = ''
+    if end:
+        try:
+            end_limit = timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min), tz)
+        except OverflowError:
+            # end=9999-12-31: no hay día siguiente, no se limita por arriba
+            end_limit = None
+        if end_limit is not None:
+            movimientos = movimientos.filter(date__lt=end_limit)
+    else:
+        filters['end'] = ''
+    return movimientos, filters
+
+
 def inventory_history(request):
-    movimientos = MovimientosInventario.objects.all().order_by('-date')
-    return render(request, 'inventory/inventory_history.html', {'movements': movimientos})
+    movimientos, filters = _filtered_movements(request)
+
+    # Paginación por cursor sobre (date, id): sin OFFSET ni COUNT(*) en años de historial
+    pagination = PaginationHelper(
+        queryset=movimientos.select_related('material'),
+        request=request,
+        items_per_page=50,
+        order_by='-date',
+        keyset=True,
+        count='none'
+    )
+
+    context = {
+        'movements': pagination.get_items(),
+        'materials': RawMaterial.objects.order_by('name').only('id', 'name'),
+        'filters': filters,
+        'export_query': request.GET.urlencode(),
+        **pagination.get_context()
+    }
+    return render(request, 'inventory/inventory_history.html', context)
+
+
+class _Echo:
+    """Pseudo-buffer para csv.writer: devuelve la línea en vez de guardarla."""
+    def write(self, value):
+        return value
+
+
+def inventory_history_csv(request):
+    """Exporta el historial filtrado como CSV en streaming (lee por bloques)."""
+    movimientos, _ = _filtered_movements(request)
+    rows = (
+        movimientos.order_by('-date', '-pk')
+        .values_list('date', 'material__name', 'movement_type', 'quantity')
+        .iterator(chunk_size=2000)
+    )
+    writer = csv.writer(_Echo())
+
+    def stream():
+        yield writer.writerow(['Fecha', 'Materia prima', 'Tipo', 'Cantidad'])
+        for date, material, movement_type, quantity in rows:
+            yield writer.writerow([timezone.localtime(date).strftime('%Y-%m-%d %H:%M:%S'), material, movement_type, quantity])
+
+    response = StreamingHttpResponse(stream(), content_type='text/csv')
+    response['Content-Disposition'] = 'attachment; filename="inventory_history.csv"'
+    return response
 @login_required
 def low_stock_alerts(request):
     """
     Vista para mostrar productos con stock bajo.
     Muestra productos donde quantity < reorder_threshold
     """
-    from inventory.models import Product
-    
-    # Obtener productos con stock bajo
-    low_stock_products = Product.objects.filter(
-        quantity__lt=models.F('reorder_threshold')
-    ).order_by('quantity')
-    
-    # Contar alertas críticas (menos del 50% del umbral)
-    critical_count = low_stock_products.filter(
-        quantity__lt=models.F('reorder_threshold') / 2
-    ).count()
-    
+    from inventory.models import StockAlert
+
+    # Alertas abiertas (tabla indexada que mantienen las señales de Product),
+    # con su producto en la misma consulta
+    low_stock_products = []
+    for alert in StockAlert.objects.select_related('product').order_by('quantity', 'pk'):
+        product = alert.product
+        product.stock_level = alert.level
+        low_stock_products.append(product)
+
+    # Críticas: menos del 50% del umbral (ver alert_utils.stock_level)
+    critical_count = sum(p.stock_level == StockAlert.CRITICAL for p in low_stock_products)
+
     context = {
         'low_stock_products': low_stock_products,
-        'total_alerts': low_stock_products.count(),
+        'total_alerts': len(low_stock_products),
         'critical_count': critical_count,
+        'warning_count': len(low_stock_products) - critical_count,
     }
     
     return render(request, 'inventory/low_stock_alerts.html', context)
@@ -1,3 +1,11 @@
 from django.contrib import admin
+from .models import DailyProductSales
 
 # Register your models here.
+
+
+@admin.register(DailyProductSales)
+class DailyProductSalesAdmin(admin.ModelAdmin):
+    list_display = ['day', 'product', 'payment_method', 'units', 'revenue', 'order_count']
+    list_filter = ['payment_method', 'day']
+    search_fields = ['product__name']
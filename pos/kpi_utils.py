@@ -0,0 +1,137 @@
+import hashlib
+import json
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from .models import DailyProductSales
+
+# Ventana que cubre todos los KPIs: 7 días actuales + 7 previos (tendencias)
+WINDOW_DAYS = 14
+
+# Segundos que se reutiliza el JSON de KPIs entre polls del dashboard
+KPIS_CACHE_TTL = getattr(settings, 'BANETON_KPIS_CACHE_TTL', 30)
+
+
+def _pct(curr, prev):
+    return float(((curr - prev) / prev) * 100) if prev else None
+
+
+def _top(totals, n=5):
+    """Sort {key: amount} by amount desc (then key) and keep the first n."""
+    return sorted(totals.items(), key=lambda kv: (-kv[1], kv[0]))[:n]
+
+
+def compute_kpis(today=None):
+    """
+    All dashboard KPIs from a single query over the last 14 days of the
+    DailyProductSales rollup (revenue/units today and yesterday, 7-day
+    series, top products, payment split and trending products).
+    """
+    today = today or timezone.localdate()
+    yesterday = today - timedelta(days=1)
+    last_7_start = today - timedelta(days=6)
+    window_start = today - timedelta(days=WINDOW_DAYS - 1)
+
+    rows = DailyProductSales.objects.filter(day__gte=window_start, day__lte=today).values_list(
+        "day", "product__name", "payment_method", "units", "revenue"
+    )
+
+    revenue_by_day = defaultdict(Decimal)
+    units_by_day = defaultdict(int)
+    units_today_by_product = defaultdict(int)
+    revenue_today_by_payment = defaultdict(Decimal)
+    curr7 = defaultdict(int)
+    prev7 = defaultdict(int)
+
+    for day, name, payment_method, units, revenue in rows:
+        if day >= last_7_start:
+            revenue_by_day[day] += revenue
+            units_by_day[day] += units
+            curr7[name] += units
+        else:
+            prev7[name] += units
+        if day == today:
+            units_today_by_product[name] += units
+            revenue_today_by_payment[payment_method or "N/D"] += revenue
+
+    revenue_today = revenue_by_day.get(today, Decimal("0.00"))
+    units_today = units_by_day.get(today, 0)
+    revenue_yesterday = revenue_by_day.get(yesterday, Decimal("0.00"))
+    units_yesterday = units_by_day.get(yesterday, 0)
+
+    top_qs = _top(units_today_by_product)
+    pay_qs = _top(revenue_today_by_payment, n=None)
+    days = sorted(revenue_by_day)
+
+    trending = []
+    for name in set(curr7) | set(prev7):
+        c = curr7.get(name, 0)
+        p = prev7.get(name, 0)
+        delta = c - p
+        growth = ((delta / p) * 100) if p else (None if c == 0 else 100.0)
+        trending.append({"name": name, "delta": delta, "growth": growth})
+    trending.sort(key=lambda x: (-x["delta"], x["name"]))
+
+    revenue_series = {
+        "labels": [d.strftime("%d-%b") for d in days],
+        "data": [float(revenue_by_day[d]) for d in days],
+    }
+    return {
+        "revenue_today": float(revenue_today),
+        "units_today": int(units_today),
+        "top_products": {
+            "labels": [name for name, _ in top_qs],
+            "data": [int(qty) for _, qty in top_qs],
+        },
+        "revenue_by_payment": {
+            "labels": [method for method, _ in pay_qs],
+            "data": [float(amount) for _, amount in pay_qs],
+        },
+        "revenue_by_day": revenue_series,
+        "units_by_day": {
+            "labels": [d.strftime("%d-%b") for d in days],
+            "data": [int(units_by_day[d]) for d in days],
+        },
+        "trends": {
+            "revenue_change_pct": _pct(revenue_today, revenue_yesterday),
+            "units_change_pct": _pct(units_today, units_yesterday),
+            "revenue_yesterday": float(revenue_yesterday),
+            "units_yesterday": int(units_yesterday),
+        },
+        "trending_products": {
+            "labels": [t["name"] for t in trending[:5]],
+            "delta": [t["delta"] for t in trending[:5]],
+            "growth": [t["growth"] for t in trending[:5]],
+        },
+        # Compat: el template usa sales_by_day
+        "sales_by_day": revenue_series,
+    }
+
+
+def _kpis_cache_key(today):
+    return f"baneton_kpis:{today.isoformat()}"
+
+
+def get_cached_kpis():
+    """
+    KPI payload already serialized, shared by every open dashboard.
+    Returns (body_bytes, etag); the ETag is a strong hash of the body.
+    """
+    today = timezone.localdate()
+    key = _kpis_cache_key(today)
+    cached = cache.get(key)
+    if cached is None:
+        body = json.dumps(compute_kpis(today), cls=DjangoJSONEncoder).encode()
+        etag = '"%s"' % hashlib.sha256(body).hexdigest()[:32]
+        cached = (body, etag)
+        cache.set(key, cached, KPIS_CACHE_TTL)
+    return cached
+
+
+def invalidate_kpis_cache():
+    """Drop today's cached KPIs (called when an order is committed)."""
+    cache.delete(_kpis_cache_key(timezone.localdate()))
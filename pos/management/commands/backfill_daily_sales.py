@@ -0,0 +1,30 @@
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from pos.rollup_utils import rebuild_daily_sales
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the DailyProductSales rollup from the OrderItem history'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='First day to rebuild (YYYY-MM-DD). Default: all history')
+        parser.add_argument('--end', help='Last day to rebuild (YYYY-MM-DD). Default: today')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        start = self._parse_day(options['start'])
+        end = self._parse_day(options['end'])
+
+        with transaction.atomic():
+            written = rebuild_daily_sales(start=start, end=end, batch_size=options['batch_size'])
+
+        self.stdout.write(self.style.SUCCESS(f'{written} daily sales rows written'))
+
+    def _parse_day(self, value):
+        if not value:
+            return None
+        try:
+            return datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError(f'Invalid date "{value}", expected YYYY-MM-DD')
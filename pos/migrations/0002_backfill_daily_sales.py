@@ -0,0 +1,49 @@
+from decimal import Decimal
+
+from django.db import migrations
+from django.db.models import Count, DecimalField, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+def backfill_daily_sales(apps, schema_editor):
+    """Rollup de las órdenes anteriores a la tabla (las nuevas las suman las señales)."""
+    OrderItem = apps.get_model('inventory', 'OrderItem')
+    DailyProductSales = apps.get_model('pos', 'DailyProductSales')
+
+    rows = (
+        OrderItem.objects.annotate(day=TruncDate('order__date', tzinfo=timezone.get_current_timezone()))
+        .values('day', 'product_id', 'order__paymentMethod')
+        .annotate(
+            units=Sum('quantity'),
+            revenue=Sum(F('unit_price') * F('quantity'), output_field=DecimalField(max_digits=14, decimal_places=2)),
+            order_count=Count('order', distinct=True),
+        )
+        .order_by()
+    )
+    DailyProductSales.objects.all().delete()
+    DailyProductSales.objects.bulk_create(
+        (
+            DailyProductSales(
+                day=r['day'],
+                product_id=r['product_id'],
+                payment_method=r['order__paymentMethod'] or 'N/D',
+                units=r['units'] or 0,
+                revenue=r['revenue'] or Decimal('0.00'),
+                order_count=r['order_count'],
+            )
+            for r in rows.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pos', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_daily_sales, migrations.RunPython.noop),
+    ]
@@ -1,2 +1,25 @@
 from django.db import models
 
+
+class DailyProductSales(models.Model):
+    """
+    Ventas acumuladas por día, producto y método de pago.
+    Se actualiza al guardar cada orden (pos/signals.py) y se puede reconstruir
+    desde el histórico con `python manage.py backfill_daily_sales`.
+    """
+    day = models.DateField()
+    product = models.ForeignKey('inventory.Product', on_delete=models.CASCADE, related_name='daily_sales')
+    payment_method = models.CharField(max_length=100)
+    units = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    order_count = models.PositiveIntegerField(default=0, help_text="Órdenes del día que incluyen el producto")
+
+    class Meta:
+        verbose_name = "Daily product sales"
+        verbose_name_plural = "Daily product sales"
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'product', 'payment_method'], name='uniq_daily_product_sales'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.product_id} {self.payment_method}: {self.units}"
@@ -0,0 +1,174 @@
+from collections import defaultdict
+from decimal import Decimal
+from django.db.models import Case, Count, DecimalField, F, IntegerField, Sum, Value, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from inventory.models import OrderItem
+from .models import DailyProductSales
+
+
+MONEY = DecimalField(max_digits=14, decimal_places=2)
+
+
+def _per_product(values, output_field):
+    return Case(
+        *[When(product_id=pid, then=Value(value)) for pid, value in values.items()],
+        default=Value(0),
+        output_field=output_field,
+    )
+
+
+def _order_day(order):
+    return timezone.localdate(order.date) if timezone.is_aware(order.date) else order.date.date()
+
+
+def order_key(order):
+    """(day, payment_method) row key of an order in the rollup."""
+    return _order_day(order), order.paymentMethod or "N/D"
+
+
+def apply_sales(key, deltas):
+    """
+    Move the rollup rows of one (day, payment_method) by the given deltas:
+    {product_id: (units, revenue, orders)}, positive or negative.
+    Rows are created if missing and changed with F() in a single UPDATE (CASE
+    per product), so concurrent orders don't overwrite each other; rows left
+    without orders are removed.
+    """
+    deltas = {pid: d for pid, d in deltas.items() if any(d)}
+    if not deltas:
+        return
+    day, payment_method = key
+    DailyProductSales.objects.bulk_create(
+        [DailyProductSales(day=day, product_id=pid, payment_method=payment_method) for pid in deltas],
+        ignore_conflicts=True,
+    )
+    rows = DailyProductSales.objects.filter(day=day, payment_method=payment_method, product_id__in=list(deltas))
+    rows.update(
+        units=F("units") + _per_product({pid: d[0] for pid, d in deltas.items()}, IntegerField()),
+        revenue=F("revenue") + _per_product({pid: d[1] for pid, d in deltas.items()}, MONEY),
+        order_count=F("order_count") + _per_product({pid: d[2] for pid, d in deltas.items()}, IntegerField()),
+    )
+    rows.filter(order_count=0).delete()
+
+
+def _item_totals(items):
+    """{product_id: [units, revenue]} of some order items."""
+    totals = defaultdict(lambda: [0, Decimal("0.00")])
+    for item in items:
+        totals[item.product_id][0] += item.quantity
+        totals[item.product_id][1] += (item.unit_price or Decimal("0.00")) * item.quantity
+    return totals
+
+
+def record_sales(order, items):
+    """
+    Add the items of a new order to the daily rollup (order_count counts the
+    order once per product, even if it has several lines of that product).
+    """
+    apply_sales(order_key(order), {
+        pid: (units, revenue, 1) for pid, (units, revenue) in _item_totals(items).items()
+    })
+
+
+def order_sales(order_id):
+    """{product_id: (units, revenue, 1)}: what an order contributes to the rollup, from its saved items."""
+    rows = (
+        OrderItem.objects.filter(order_id=order_id)
+        .values("product_id")
+        .annotate(units=Sum("quantity"), revenue=Sum(F("unit_price") * F("quantity"), output_field=MONEY))
+        .values_list("product_id", "units", "revenue")
+        .order_by()
+    )
+    return {pid: (units or 0, revenue or Decimal("0.00"), 1) for pid, units, revenue in rows}
+
+
+def move_order_sales(order_id, old_key, new_key):
+    """An order changed day or payment method: move its whole contribution."""
+    if old_key == new_key:
+        return
+    sales = order_sales(order_id)
+    apply_sales(old_key, {pid: (-u, -r, -n) for pid, (u, r, n) in sales.items()})
+    apply_sales(new_key, sales)
+
+
+def remove_order_sales(order):
+    """Subtract a whole order (before deleting it, while its items still exist)."""
+    apply_sales(order_key(order), {pid: (-u, -r, -n) for pid, (u, r, n) in order_sales(order.pk).items()})
+
+
+def change_item_sales(order, old, new):
+    """
+    One OrderItem was added, edited or deleted on an existing order.
+    old/new: (product_id, quantity, unit_price), or None when the item
+    didn't exist before / doesn't exist anymore. Must run after the change
+    is saved: the order counts 1 for a product while any line of it remains.
+    """
+    remaining = set(OrderItem.objects.filter(order_id=order.pk).values_list("product_id", flat=True))
+    deltas = defaultdict(lambda: [0, Decimal("0.00"), 0])
+    if old:
+        pid, quantity, price = old
+        deltas[pid][0] -= quantity
+        deltas[pid][1] -= (price or Decimal("0.00")) * quantity
+        if pid not in remaining:
+            deltas[pid][2] -= 1
+    if new:
+        pid, quantity, price = new
+        deltas[pid][0] += quantity
+        deltas[pid][1] += (price or Decimal("0.00")) * quantity
+        # Primera línea de ese producto en la orden (o vuelve a serlo al cambiar de producto)
+        lines = OrderItem.objects.filter(order_id=order.pk, product_id=pid).count()
+        if lines == 1 and not (old and old[0] == pid):
+            deltas[pid][2] += 1
+    apply_sales(order_key(order), {pid: tuple(d) for pid, d in deltas.items()})
+
+
+def rebuild_daily_sales(start=None, end=None, batch_size=1000):
+    """
+    Recompute the rollup from OrderItem for the days in [start, end]
+    (all history if not given). Returns the number of rows written.
+    """
+    tz = timezone.get_current_timezone()
+    items = OrderItem.objects.annotate(day=TruncDate("order__date", tzinfo=tz))
+    rollup = DailyProductSales.objects.all()
+    if start:
+        items = items.filter(day__gte=start)
+        rollup = rollup.filter(day__gte=start)
+    if end:
+        items = items.filter(day__lte=end)
+        rollup = rollup.filter(day__lte=end)
+
+    rows = (
+        items.values("day", "product_id", "order__paymentMethod")
+        .annotate(
+            units=Sum("quantity"),
+            revenue=Sum(F("unit_price") * F("quantity"), output_field=MONEY),
+            order_count=Count("order", distinct=True),
+        )
+        .order_by()
+    )
+    objs = (
+        DailyProductSales(
+            day=r["day"],
+            product_id=r["product_id"],
+            payment_method=r["order__paymentMethod"] or "N/D",
+            units=r["units"] or 0,
+            revenue=r["revenue"] or Decimal("0.00"),
+            order_count=r["order_count"],
+        )
+        for r in rows.iterator()
+    )
+
+    rollup.delete()
+    written = 0
+    batch = []
+    for obj in objs:
+        batch.append(obj)
+        if len(batch) >= batch_size:
+            DailyProductSales.objects.bulk_create(batch)
+            written += len(batch)
+            batch = []
+    if batch:
+        DailyProductSales.objects.bulk_create(batch)
+        written += len(batch)
+    return written
@@ -0,0 +1,77 @@
+"""
+Signals for pos app.
+Keeps the DailyProductSales rollup and the cached KPIs in sync with the orders.
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete
+from django.dispatch import receiver
+from inventory.models import Order, OrderItem
+from inventory.order_utils import deleted_with_parent, order_placed
+from .kpi_utils import invalidate_kpis_cache
+from .rollup_utils import change_item_sales, move_order_sales, order_key, record_sales, remove_order_sales
+
+
+def _loaded(instance, *fields):
+    # Solo si se cargaron los campos (con only()/defer() no se fuerza otra consulta)
+    return instance.pk is not None and all(f in instance.__dict__ for f in fields)
+
+
+@receiver(order_placed)
+def add_order_to_daily_sales(sender, order, items, **kwargs):
+    """Orders saved in bulk (inventory.order_utils.create_order)."""
+    record_sales(order, items)
+
+
+@receiver(post_init, sender=Order)
+def remember_order_sales_key(sender, instance, **kwargs):
+    instance._loaded_sales_key = order_key(instance) if _loaded(instance, 'date', 'paymentMethod') else None
+
+
+@receiver(post_save, sender=Order)
+def move_order_in_daily_sales(sender, instance, created, **kwargs):
+    """Changing the date or payment method of an order moves its sales to the new row."""
+    key = order_key(instance)
+    if not created and instance._loaded_sales_key is not None:
+        move_order_sales(instance.pk, instance._loaded_sales_key, key)
+    instance._loaded_sales_key = key
+
+
+@receiver(pre_delete, sender=Order)
+def remove_order_from_daily_sales(sender, instance, **kwargs):
+    # Antes del borrado, con los ítems todavía en la tabla
+    remove_order_sales(instance)
+
+
+@receiver(post_init, sender=OrderItem)
+def remember_item_sale(sender, instance, **kwargs):
+    loaded = _loaded(instance, 'product_id', 'quantity', 'unit_price')
+    instance._loaded_sale = (instance.product_id, instance.quantity, instance.unit_price) if loaded else None
+
+
+@receiver(post_save, sender=OrderItem)
+def update_item_in_daily_sales(sender, instance, created, **kwargs):
+    """OrderItems created or edited one by one (admin, shell...)."""
+    new = (instance.product_id, instance.quantity, instance.unit_price)
+    old = None if created else instance._loaded_sale
+    if created or (old is not None and old != new):
+        change_item_sales(instance.order, old, new)
+        transaction.on_commit(invalidate_kpis_cache)
+    instance._loaded_sale = new
+
+
+@receiver(post_delete, sender=OrderItem)
+def remove_item_from_daily_sales(sender, instance, origin=None, **kwargs):
+    transaction.on_commit(invalidate_kpis_cache)
+    # Con su orden ya se restó todo en pre_delete; con su producto el cascade se llevó sus filas del rollup
+    if deleted_with_parent(origin):
+        return
+    old = instance._loaded_sale or (instance.product_id, instance.quantity, instance.unit_price)
+    change_item_sales(instance.order, old, None)
+
+
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Order)
+def invalidate_kpis_on_order_change(sender, instance, **kwargs):
+    """Nuevas órdenes o cambios (p.ej. método de pago) invalidan los KPIs cacheados."""
+    transaction.on_commit(invalidate_kpis_cache)
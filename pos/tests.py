@@ -1,3 +1,314 @@
+import json
+from datetime import datetime, time, timedelta
+
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.db.models.signals import pre_delete
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from core.testing_utils import FreshCachesMixin
+from customers.models import CustomerProfile
+from inventory.models import Customer, Order, OrderItem, Product, Promotion
+from inventory.order_utils import create_order
+from inventory.promo_utils import get_promotion_snapshot
+from inventory.query_plan_utils import full_scan_queries
+from .kpi_utils import compute_kpis
+from .models import DailyProductSales
+from .rollup_utils import rebuild_daily_sales
+
+
+def _at(day, hour=12):
+    return timezone.make_aware(datetime.combine(day, time(hour)))
+
+
+class BanetonKpisTests(FreshCachesMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.today = timezone.localdate()
+        self.pan = Product.objects.create(name='Pan', price=1000, picture='default.jpg')
+        self.torta = Product.objects.create(name='Torta', price=5000, picture='default.jpg')
+
+    def _order(self, day, lines, payment='Cash'):
+        # create_order registra la venta con la fecha actual; los tests que
+        # mueven fechas reconstruyen el rollup con rebuild_daily_sales
+        order = create_order(lines, paymentMethod=payment)
+        Order.objects.filter(pk=order.pk).update(date=_at(day))
+        return order
+
+    def _sales(self):
+        # Hoy, ayer y hace 10 días (ventana previa de tendencias)
+        self._order(self.today, [(self.pan.pk, 3), (self.torta.pk, 1)])
+        self._order(self.today, [(self.pan.pk, 1)], payment='Transfer')
+        self._order(self.today - timedelta(days=1), [(self.torta.pk, 2)])
+        self._order(self.today - timedelta(days=10), [(self.torta.pk, 5)])
+
+    def test_kpis_values(self):
+        self._sales()
+        rebuild_daily_sales()
+
+        kpis = compute_kpis(self.today)
+
+        self.assertEqual(kpis['revenue_today'], 9000.0)
+        self.assertEqual(kpis['units_today'], 5)
+        self.assertEqual(kpis['top_products'], {'labels': ['Pan', 'Torta'], 'data': [4, 1]})
+        self.assertEqual(kpis['revenue_by_payment'], {'labels': ['Cash', 'Transfer'], 'data': [8000.0, 1000.0]})
+        self.assertEqual(kpis['revenue_by_day']['data'], [10000.0, 9000.0])
+        self.assertEqual(kpis['units_by_day']['data'], [2, 5])
+        self.assertEqual(kpis['trends']['revenue_yesterday'], 10000.0)
+        self.assertEqual(kpis['trends']['revenue_change_pct'], -10.0)
+        self.assertEqual(kpis['trending_products']['labels'], ['Pan', 'Torta'])
+        self.assertEqual(kpis['trending_products']['delta'], [4, -2])
+        self.assertEqual(kpis['sales_by_day'], kpis['revenue_by_day'])
+
+    def test_kpis_use_a_single_query(self):
+        self._sales()
+        rebuild_daily_sales()
+
+        with self.assertNumQueries(1):
+            compute_kpis(self.today)
+
+    def test_kpis_endpoint_query_count_does_not_grow_with_orders(self):
+        staff = User.objects.create_user('staff', password='x', is_staff=True)
+        self.client.force_login(staff)
+        url = reverse('baneton_kpis')
+
+        self._sales()
+        with self.assertNumQueries(3):  # sesión + usuario + KPIs
+            self.client.get(url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(20):
+                self._order(self.today, [(self.pan.pk, 1), (self.torta.pk, 1)])
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+    def test_kpis_endpoint_cache_and_etag(self):
+        staff = User.objects.create_user('staff', password='x', is_staff=True)
+        self.client.force_login(staff)
+        url = reverse('baneton_kpis')
+        self._order(self.today, [(self.pan.pk, 2)])
+
+        first = self.client.get(url)
+        etag = first['ETag']
+        self.assertEqual(first.json()['units_today'], 2)
+
+        # Mientras no cambie nada se sirve desde caché, sin consultar KPIs
+        with self.assertNumQueries(2):
+            not_modified = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified['ETag'], etag)
+
+        # Una orden confirmada invalida el caché y cambia el ETag
+        with self.captureOnCommitCallbacks(execute=True):
+            self._order(self.today, [(self.pan.pk, 1)])
+        changed = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], etag)
+        self.assertEqual(changed.json()['units_today'], 3)
+
+
+class HotQueryPlanTests(FreshCachesMixin, TestCase):
+    """EXPLAIN QUERY PLAN of every query the POS pages run: no full scans."""
+
+    def setUp(self):
+        super().setUp()
+        pan = Product.objects.create(name='Pan', price=1000, picture='default.jpg')
+        torta = Product.objects.create(name='Torta', price=5000, picture='default.jpg')
+        promo = Promotion.objects.create(name='Tortas', value=10)
+        promo.products.add(torta)
+        ana = Customer.objects.create(cedula='1', nombre='Ana')
+        for i in range(12):
+            create_order([(pan.pk, 1), (torta.pk, i % 3)], customer=ana if i % 2 else None,
+                         paymentMethod='Cash' if i % 3 else 'Card')
+        staff = User.objects.create_user('staff', password='x', is_staff=True)
+        self.client.force_login(staff)
+
+    def assertNoFullScans(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        scans = full_scan_queries(ctx.captured_queries)
+        self.assertEqual(scans, [], '\n'.join(f'{tables}: {sql}' for sql, tables in scans))
+        return response
+
+    def test_pos_pages(self):
+        for name in ('pos', 'daily_sales_report', 'baneton_kpis'):
+            with self.subTest(name=name):
+                self.assertNoFullScans(reverse(name))
+
+    def test_orders_keyset_pages(self):
+        first = self.assertNoFullScans(reverse('orders'))
+        cursor = first.context['next_cursor']
+        self.assertTrue(cursor)
+        self.assertNoFullScans(f"{reverse('orders')}?cursor={cursor}")
+
+
+class SaveOrderTests(FreshCachesMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.pan = Product.objects.create(name='Pan', price=1000, picture='default.jpg', quantity=50)
+
+    def _post(self, payload):
+        body = payload if isinstance(payload, str) else json.dumps(payload)
+        return self.client.post(reverse('save_order'), body, content_type='application/json')
+
+    def test_saves_the_order_and_its_sales(self):
+        response = self._post({
+            'orders': [{'id': self.pan.pk, 'quantity': 3}, {'id': 999, 'quantity': 1}],
+            'paymentMethod': 'Card',
+            'customer': {'cedula': '1.020.304', 'nombre': 'Ana'},
+        })
+        self.assertEqual(response.status_code, 200)
+        order = Order.objects.get(pk=response.json()['order_id'])
+        self.assertEqual((order.paymentMethod, order.customer.nombre), ('Card', 'Ana'))
+        # El producto que no existe se ignora
+        self.assertEqual(list(order.orderitem_set.values_list('product_id', 'quantity', 'unit_price')), [(self.pan.pk, 3, 1000)])
+        self.assertEqual(list(DailyProductSales.objects.values_list('units', 'revenue')), [(3, 3000)])
+
+    def test_rejects_invalid_requests(self):
+        self.assertEqual(self._post('{').status_code, 400)
+        self.assertEqual(self._post({'orders': []}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('save_order')).status_code, 405)
+        self.assertFalse(Order.objects.exists())
+
+
+class DailySalesRollupTests(FreshCachesMixin, TestCase):
+    """The incremental rollup must always match a rebuild from OrderItem."""
+
+    def setUp(self):
+        super().setUp()
+        self.pan = Product.objects.create(name='Pan', price=1000, picture='default.jpg')
+        self.torta = Product.objects.create(name='Torta', price=5000, picture='default.jpg')
+
+    def _rollup(self):
+        return sorted(DailyProductSales.objects.values_list(
+            'day', 'product_id', 'payment_method', 'units', 'revenue', 'order_count'))
+
+    def assertRollupConsistent(self):
+        incremental = self._rollup()
+        rebuild_daily_sales()
+        self.assertEqual(incremental, self._rollup())
+        return incremental
+
+    def test_create_with_duplicate_lines(self):
+        create_order([(self.pan.pk, 2), (self.pan.pk, 1), (self.torta.pk, 1)])
+        create_order([(self.pan.pk, 1)])
+        rows = self.assertRollupConsistent()
+        pan = [r for r in rows if r[1] == self.pan.pk][0]
+        self.assertEqual((pan[3], pan[5]), (4, 2))  # 4 unidades en 2 órdenes
+
+    def test_item_created_edited_and_deleted_one_by_one(self):
+        order = create_order([(self.pan.pk, 1)])
+        second = OrderItem.objects.create(order=order, product=self.pan, quantity=2, unit_price=1000)
+        self.assertRollupConsistent()
+
+        second.quantity = 5
+        second.unit_price = 900
+        second.save()
+        self.assertRollupConsistent()
+
+        second.product = self.torta
+        second.save()
+        self.assertRollupConsistent()
+
+        OrderItem.objects.get(order=order, product=self.pan).delete()
+        self.assertRollupConsistent()
+        second.delete()
+        self.assertEqual(self.assertRollupConsistent(), [])
+
+    def test_order_date_and_payment_method_changes_move_the_sales(self):
+        order = create_order([(self.pan.pk, 2), (self.torta.pk, 1)], paymentMethod='Cash')
+        order.paymentMethod = 'Card'
+        order.save()
+        self.assertEqual({r[2] for r in self.assertRollupConsistent()}, {'Card'})
+
+        order = Order.objects.get(pk=order.pk)
+        order.date -= timedelta(days=3)
+        order.save()
+        self.assertEqual({r[0] for r in self.assertRollupConsistent()}, {timezone.localdate(order.date)})
+
+    def test_delete_order_with_duplicate_lines(self):
+        keep = create_order([(self.pan.pk, 1)])
+        order = create_order([(self.pan.pk, 2), (self.pan.pk, 3), (self.torta.pk, 1)])
+        order.delete()
+        rows = self.assertRollupConsistent()
+        self.assertEqual([(r[1], r[3], r[5]) for r in rows], [(self.pan.pk, 1, 1)])
+
+        Order.objects.filter(pk=keep.pk).delete()
+        self.assertEqual(self.assertRollupConsistent(), [])
+
+    def test_failed_order_delete_leaves_item_deletes_working(self):
+        order = create_order([(self.pan.pk, 2), (self.torta.pk, 1)])
+
+        def fail(sender, **kwargs):
+            raise RuntimeError('borrado fallido')
+
+        pre_delete.connect(fail, sender=Order)
+        try:
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                order.delete()
+        finally:
+            pre_delete.disconnect(fail, sender=Order)
+
+        OrderItem.objects.get(order=order, product=self.pan).delete()
+        rows = self.assertRollupConsistent()
+        self.assertEqual([(r[1], r[3], r[5]) for r in rows], [(self.torta.pk, 1, 1)])
+
+    def test_delete_product_with_sales(self):
+        order = create_order([(self.pan.pk, 2), (self.torta.pk, 1)])
+        create_order([(self.pan.pk, 1)])
+        self.pan.delete()
+        rows = self.assertRollupConsistent()
+        self.assertEqual([(r[1], r[3], r[5]) for r in rows], [(self.torta.pk, 1, 1)])
+        self.assertEqual(list(order.orderitem_set.values_list('product_id', flat=True)), [self.torta.pk])
+
+        Product.objects.filter(pk=self.torta.pk).delete()
+        self.assertEqual(self.assertRollupConsistent(), [])
+
+
+class ListingQueryCountTests(FreshCachesMixin, TestCase):
+    """The listing pages run a fixed number of queries, however many rows they show."""
+
+    def setUp(self):
+        super().setUp()
+        self.products = [
+            Product.objects.create(name=f'Pan {i}', price=1000 + i, picture='default.jpg') for i in range(3)
+        ]
+        promo = Promotion.objects.create(name='Promo', value=100)
+        promo.products.add(self.products[0])
+        self.ana = Customer.objects.create(cedula='1', nombre='Ana')
+        user = User.objects.create_user('ana', password='x')
+        CustomerProfile.objects.create(customer=self.ana, user=user)
+        self.client.force_login(user)
+
+    def _add_data(self, orders):
+        for i in range(orders):
+            Product.objects.create(name=f'Torta {Product.objects.count()}', price=2000, picture='default.jpg')
+            create_order([(p.pk, 1 + i % 2) for p in self.products], customer=self.ana)
+
+    def assertQueriesDoNotGrow(self, url, expected):
+        # Misma cantidad de consultas con pocas y con muchas filas en la página
+        for orders in (1, 12):
+            self._add_data(orders)
+            get_promotion_snapshot()  # ya en memoria, como en un worker que ya atendió requests
+            with self.subTest(url=url, orders=orders), self.assertNumQueries(expected):
+                self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_pos(self):
+        self.assertQueriesDoNotGrow(reverse('pos'), 4)
+
+    def test_orders(self):
+        self.assertQueriesDoNotGrow(reverse('orders'), 5)
+
+    def test_daily_sales_report(self):
+        self.assertQueriesDoNotGrow(reverse('daily_sales_report'), 9)
+
+    def test_product_catalog(self):
+        self.assertQueriesDoNotGrow(reverse('products_home'), 4)
 
-# Create your tests here.
+    def test_customer_profile(self):
+        self.assertQueriesDoNotGrow(reverse('customer_profile'), 6)
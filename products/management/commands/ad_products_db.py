@@ -1,29 +1,75 @@
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from inventory.alert_utils import sync_stock_alerts
+from inventory.import_utils import UpsertStats, batched, read_csv_rows, to_decimal
 from inventory.models import Product
-import os
-import json
-import pandas as pd
+from inventory.search_utils import index_products
+
+UPDATE_BATCH_SIZE = 100
+PRICE_FIELD = Product._meta.get_field('price')
+
 
 class Command(BaseCommand):
-    help = 'Load products from movie_descriptions.json into the Product model'
-    
-    def handle(self, *args, **kwargs):
-        df = pd.read_csv('products.csv')
-        products = json.loads(df.to_json(orient="records"))
-        print(products)
-
-        for i in range(len(products)):
-            product = products[i]
-            exist = Product.objects.filter(name = product['name']).first() 
-            if not exist:
-                try:              
-                    Product.objects.create(
-                        name = product['name'],
-                        description = product['description'],
-                        price = product['price'],
-                        quantity = 1,
-                        picture = 'default.jpg',
-                        )
-                except:
-                    print('wrong')
-                    pass        
+    help = 'Load products from products.csv into the Product model (bulk, idempotent)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_path', nargs='?', default='products.csv')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--update', action='store_true',
+                            help='Update description/price of products that already exist (default: leave them as they are)')
+
+    def handle(self, *args, **options):
+        stats = UpsertStats()
+        try:
+            with transaction.atomic():
+                self._load(options['csv_path'], options['batch_size'], options['update'], stats)
+        except FileNotFoundError:
+            raise CommandError(f'File not found: {options["csv_path"]}')
+
+        for line, error in stats.errors:
+            self.stderr.write(f'line {line}: {error}')
+        self.stdout.write(self.style.SUCCESS(f'Products: {stats.summary()}'))
+
+    def _load(self, path, batch_size, update, stats):
+        # name no es único en la tabla: el diccionario nombre -> (pk, campos) es la llave del upsert
+        existing = {
+            name: (pk, {'description': description, 'price': price})
+            for name, pk, description, price in Product.objects.values_list('name', 'pk', 'description', 'price')
+        }
+        line = 1
+        for batch in batched(read_csv_rows(path), batch_size):
+            to_create, to_update = [], []
+            for row in batch:
+                line += 1
+                name = row.get('name')
+                if not name:
+                    stats.errors.append((line, 'missing name'))
+                    continue
+                try:
+                    price = to_decimal(row.get('price'), PRICE_FIELD.max_digits, PRICE_FIELD.decimal_places)
+                except ValueError:
+                    price = row.get('price')
+                    stats.errors.append((line, 'missing price' if price is None else f'invalid price "{price}"'))
+                    continue
+                fields = {'description': row.get('description'), 'price': price}
+                current = existing.get(name)
+                if current is None and name not in existing:
+                    existing[name] = None  # repetido más abajo en el CSV -> se ignora
+                    to_create.append(Product(name=name, quantity=1, picture='default.jpg', **fields))
+                elif update and current is not None and current[1] != fields:
+                    existing[name] = (current[0], fields)
+                    to_update.append(Product(pk=current[0], name=name, **fields))
+                else:
+                    stats.skipped += 1
+
+            created = Product.objects.bulk_create(to_create)
+            for product in created:
+                existing[product.name] = (product.pk, {'description': product.description, 'price': product.price})
+            # Solo filas que cambiaron; lotes cortos porque bulk_update arma un CASE por fila
+            Product.objects.bulk_update(to_update, ['description', 'price'], batch_size=UPDATE_BATCH_SIZE)
+            # bulk_* no envían post_save: el índice de búsqueda y las alertas de
+            # stock (los nuevos entran con quantity=1) se actualizan aquí
+            index_products(created + to_update)
+            sync_stock_alerts(created)
+            stats.created += len(created)
+            stats.updated += len(to_update)
@@ -1,3 +1,141 @@
+import json
+import os
+import tempfile
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
 from django.test import TestCase
+from django.urls import reverse
+
+from core.testing_utils import FreshCachesMixin
+from inventory.models import (
+    Customer, MovimientosInventario, Order, OrderItem, Product, ProductRawMaterial, Promotion, RawMaterial,
+)
+from inventory.promo_utils import annotate_effective_price, price_after_discount
+
+
+class SaveOrderOnlineTests(FreshCachesMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.harina = RawMaterial.objects.create(name='Harina', units=100, exp_date=date(2030, 1, 1))
+        self.pan = Product.objects.create(name='Pan', price=1000, picture='default.jpg')
+        ProductRawMaterial.objects.create(product=self.pan, material=self.harina, material_quantity=2)
+        promo = Promotion.objects.create(name='Promo', discount_type='percent', value=10)
+        promo.products.add(self.pan)
+
+    def _post(self, orders, cedula='1020304'):
+        payload = {'customer': {'cedula': cedula, 'firstName': 'Ana'}, 'orders': orders}
+        return self.client.post(reverse('save_order_online'), json.dumps(payload), content_type='application/json')
+
+    def test_saves_the_order(self):
+        response = self._post([{'id': self.pan.pk, 'quantity': 2}])
+        self.assertEqual(response.status_code, 200)
+        order = Order.objects.get(pk=response.json()['order_id'])
+        self.assertEqual((order.paymentMethod, order.customer.cedula), ('Transfer', '1020304'))
+        self.assertEqual(list(order.orderitem_set.values_list('quantity', 'unit_price')), [(2, 900)])
+        self.harina.refresh_from_db()
+        self.assertEqual(self.harina.units, 96)
+
+    def test_unknown_product_saves_nothing(self):
+        response = self._post([{'id': self.pan.pk, 'quantity': 2}, {'id': 999, 'quantity': 1}])
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(OrderItem.objects.exists())
+        self.assertFalse(Customer.objects.exists())
+        self.harina.refresh_from_db()
+        self.assertEqual(self.harina.units, 100)
+        self.assertFalse(MovimientosInventario.objects.exists())
+
+    def test_requires_a_cedula(self):
+        self.assertEqual(self._post([{'id': self.pan.pk, 'quantity': 1}], cedula='').status_code, 400)
+        self.assertFalse(Order.objects.exists())
+
+
+class EffectivePriceTests(FreshCachesMixin, TestCase):
+    # (precio, tipo, valor, precio esperado); los .5 exactos redondean al par como Decimal.quantize
+    CASES = [
+        (3, 'percent', '12.5', '2.62'),
+        (5, 'percent', '12.5', '4.38'),
+        (7, 'percent', '12.5', '6.12'),
+        (1, 'percent', '12.5', '0.88'),
+        (1000, 'percent', '33.33', '666.70'),
+        (999, 'percent', '0.01', '998.90'),
+        (10, 'percent', '100', '0.00'),
+        (10, 'percent', '150', '0.00'),
+        (1000, 'fixed', '250.50', '749.50'),
+        (500, 'fixed', '600', '0.00'),
+    ]
+
+    def setUp(self):
+        super().setUp()
+        self.products = []
+        for i, (price, kind, value, _) in enumerate(self.CASES):
+            product = Product.objects.create(name=f'Pan {i}', price=price, picture='default.jpg')
+            promo = Promotion.objects.create(name=f'Promo {i}', discount_type=kind, value=Decimal(value))
+            promo.products.add(product)
+            self.products.append(product)
+
+    def test_sql_price_matches_the_python_price(self):
+        annotated = dict(annotate_effective_price(Product.objects.all()).values_list('pk', 'effective_price'))
+        for product, (price, kind, value, expected) in zip(self.products, self.CASES):
+            with self.subTest(price=price, kind=kind, value=value):
+                self.assertEqual(price_after_discount(product), Decimal(expected))
+                self.assertEqual(annotated[product.pk], Decimal(expected))
+
+    def test_price_filters_use_the_rounded_price(self):
+        qs = annotate_effective_price(Product.objects.filter(pk=self.products[0].pk))
+        self.assertTrue(qs.filter(effective_price__lte=Decimal('2.62')).exists())
+        self.assertTrue(qs.filter(effective_price__gte=Decimal('2.62')).exists())
+        self.assertFalse(qs.filter(effective_price__gte=Decimal('2.63')).exists())
+
+    def test_catalog_filters_and_sort_in_sql(self):
+        response = self.client.get(reverse('products_home'), {'min_price': '2.62', 'max_price': '6.12', 'order': 'price_asc'})
+        names = [p.name for p in response.context['products']]
+        self.assertEqual(names, ['Pan 0', 'Pan 1', 'Pan 2'])
+
+    def test_non_finite_price_filters_are_ignored(self):
+        for params in ({'min_price': 'nan'}, {'max_price': 'Infinity'}, {'min_price': '-inf', 'max_price': 'sNaN'}):
+            with self.subTest(params=params):
+                response = self.client.get(reverse('products_home'), params)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.context['products']), len(self.CASES))
+
+
+class ProductImportTests(TestCase):
+    def _load(self, rows, *args):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False, encoding='utf-8') as fh:
+            fh.write('name,description,price\n' + '\n'.join(rows) + '\n')
+        self.addCleanup(os.remove, fh.name)
+        out, err = StringIO(), StringIO()
+        call_command('ad_products_db', fh.name, *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_invalid_prices_reject_the_row(self):
+        out, err = self._load([
+            'Pan,,1000',
+            'Arepa,,3500.0',
+            'Torta,,abc',
+            'Galleta,,',
+            'Buñuelo,,-500',
+            'Almojábana,,12.5',
+            'Croissant,,NaN',
+            'Gigante,,123456789',
+        ])
+        self.assertEqual(dict(Product.objects.values_list('name', 'price')), {'Pan': 1000, 'Arepa': 3500})
+        self.assertIn('2 created, 0 updated, 0 unchanged, 6 rejected', out)
+        self.assertEqual(err.splitlines(), [
+            'line 4: invalid price "abc"',
+            'line 5: missing price',
+            'line 6: invalid price "-500"',
+            'line 7: invalid price "12.5"',
+            'line 8: invalid price "NaN"',
+            'line 9: invalid price "123456789"',
+        ])
 
-# Create your tests here.
+    def test_update_with_an_invalid_price_keeps_the_old_one(self):
+        self._load(['Pan,Blanco,1000'])
+        out, _ = self._load(['Pan,Integral,precio'], '--update')
+        self.assertIn('0 updated', out)
+        self.assertEqual(Product.objects.values_list('description', 'price').get(), ('Blanco', 1000))
@@ -1,124 +1,106 @@
 from django.shortcuts import render, redirect
 from django.http import HttpResponse, JsonResponse
-from inventory.models import Product, Order, OrderItem, Customer, Comment, Rating
+from inventory.models import Product, Customer, Comment, Rating
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.dateparse import parse_datetime
 from django.views.decorators.http import require_POST
 from django.core.exceptions import MultipleObjectsReturned
 from inventory.utils.pagination_helper import PaginationHelper
+from inventory.order_utils import create_order
+from inventory.purchase_utils import has_purchased
+from customers.customer_utils import forget_customer_id, get_customer_id, upsert_customer
 from django.contrib.auth.decorators import login_required
-from django.db.models import Avg, Q
+from django.db import transaction
 import json
-from decimal import Decimal
-from inventory.promo_utils import price_after_discount, get_active_promotion_for
+from decimal import Decimal, InvalidOperation
+from django.db.models.functions import Lower
+from inventory.promo_utils import annotate_effective_price, attach_promotions
+from inventory.search_utils import search_products
 
 
 # ===============================
 # Listado / filtro de productos
 # ===============================
+def _parse_price(value):
+    """Decimal of a price filter, or None if empty/invalid (nan e Infinity también)."""
+    try:
+        price = Decimal(value)
+    except InvalidOperation:
+        return None
+    return price if price.is_finite() else None
+
+
 def _filter_and_order_products(request):
-    qs = Product.objects.all()
-    # buscar por nombre (parcial, case-insensitive)
+    # Precio efectivo (con promo) calculado en SQL: filtros, orden y paginación en la BD
+    qs = annotate_effective_price(Product.objects.all())
+    # buscar en nombre y descripción (índice FTS5, sin tildes, por relevancia)
     q = (request.GET.get('q') or '').strip()
     if q:
-        qs = qs.filter(name__icontains=q)
-
-    products = list(qs)
-
-    # Función precio efectivo (aplicando promo si hay)
-    def eff(p):
-        return price_after_discount(p)
+        qs = search_products(qs, q)
 
     # filtros de precio
     min_price = (request.GET.get('min_price') or '').strip()
     max_price = (request.GET.get('max_price') or '').strip()
-    if min_price:
-        try:
-            m = Decimal(min_price)
-            products = [p for p in products if eff(p) >= m]
-        except Exception:
-            pass
-    if max_price:
+    min_value = _parse_price(min_price)
+    max_value = _parse_price(max_price)
+    if min_value is not None:
+        qs = qs.filter(effective_price__gte=min_value)
+    else:
+        min_price = ''
+    if max_value is not None:
+        qs = qs.filter(effective_price__lte=max_value)
+    else:
+        max_price = ''
+
+    # calificación mínima (promedio desnormalizado en Product, sin agregar por producto)
+    min_rating = (request.GET.get('min_rating') or '').strip()
+    if min_rating:
         try:
-            M = Decimal(max_price)
-            products = [p for p in products if eff(p) <= M]
-        except Exception:
-            pass
+            qs = qs.filter(rating_avg__gte=float(min_rating))
+        except ValueError:
+            min_rating = ''
 
     # solo promoción
     only_promo = (request.GET.get('only_promo') or '') in ['on', '1', 'true', 'True']
     if only_promo:
-        products = [p for p in products if get_active_promotion_for(p)]
+        qs = qs.filter(promo_id__isnull=False)
 
     # orden
-    order = (request.GET.get('order') or 'name_az')
-    if order == 'price_asc':
-        products.sort(key=lambda p: (eff(p), p.name.lower()))
+    order = (request.GET.get('order') or ('relevance' if q else 'name_az'))
+    if order == 'relevance' and q and 'search_rank' in qs.query.extra:
+        qs = qs.order_by('search_rank', Lower('name'), 'pk')
+    elif order == 'price_asc':
+        qs = qs.order_by('effective_price', Lower('name'), 'pk')
     elif order == 'price_desc':
-        products.sort(key=lambda p: (eff(p), p.name.lower()), reverse=True)
+        qs = qs.order_by('-effective_price', Lower('name').desc(), '-pk')
+    elif order == 'rating_desc':
+        qs = qs.order_by('-rating_avg', '-rating_count', Lower('name'), 'pk')
     else:
-        products.sort(key=lambda p: p.name.lower())
+        qs = qs.order_by(Lower('name'), 'pk')
+
+    pagination = PaginationHelper(
+        queryset=qs,
+        request=request,
+        items_per_page=12
+    )
 
     ctx = {
-        'products': products,
+        # Solo la página actual; promos resueltas en bloque para los filtros del template
+        'products': attach_promotions(pagination.get_items()),
         'q': q,
         'min_price': min_price,
         'max_price': max_price,
+        'min_rating': min_rating,
         'order': order,
         'only_promo': '1' if only_promo else '',
+        'results_count': pagination.paginator.count,
+        **pagination.get_context()
     }
     return ctx
 
 
 def product(request):
-    # (Dejamos tu lógica de filtrado/orden en esta vista)
-    qs = Product.objects.all()
-
-    q = request.GET.get('q', '').strip()
-    if q:
-        qs = qs.filter(name__icontains=q)
-
-    products = list(qs)
-
-    def eff(p):
-        return price_after_discount(p)
-
-    min_price = request.GET.get('min_price', '').strip()
-    max_price = request.GET.get('max_price', '').strip()
-    if min_price:
-        try:
-            m = Decimal(min_price)
-            products = [p for p in products if eff(p) >= m]
-        except Exception:
-            pass
-    if max_price:
-        try:
-            M = Decimal(max_price)
-            products = [p for p in products if eff(p) <= M]
-        except Exception:
-            pass
-
-    only_promo = request.GET.get('only_promo') in ['on', '1', 'true', 'True']
-    if only_promo:
-        products = [p for p in products if get_active_promotion_for(p)]
-
-    order = request.GET.get('order', 'name_az')
-    if order == 'price_asc':
-        products.sort(key=lambda p: (eff(p), p.name.lower()))
-    elif order == 'price_desc':
-        products.sort(key=lambda p: (eff(p), p.name.lower()), reverse=True)
-    else:
-        products.sort(key=lambda p: p.name.lower())
-
-    ctx = {
-        'products': products,
-        'q': q,
-        'min_price': min_price,
-        'max_price': max_price,
-        'order': order,
-        'only_promo': '1' if only_promo else '',
-    }
-    return render(request, "products.html", ctx)
+    return render(request, "products.html", _filter_and_order_products(request))
 
 
 def forms(request):
@@ -126,27 +108,10 @@ def forms(request):
 
 
 def show_available_products(request):
-    # usar helper de filtrado/orden y mantener valores elegidos
+    # usar helper de filtrado/orden/paginación y mantener valores elegidos
     ctx = _filter_and_order_products(request)
     return render(request, "products.html", ctx)
 
-    # Nota: tu bloque de paginación quedaba tras el return; lo mantengo sin tocar.
-    # Apply pagination for all products
-    pagination = PaginationHelper(
-        queryset=base,
-        request=request,
-        items_per_page=10,
-        order_by='name'
-    )
-
-    context = {
-        "products": pagination.get_items(),
-        "q": q,
-        "results_count": base.count(),
-        **pagination.get_context()
-    }
-    return render(request, "products.html", context)
-
 # ============================================
 # Guardar órdenes realizadas en línea (API)
 # ============================================
@@ -171,29 +136,17 @@ def save_order_online(request):
     if not cedula:
         return JsonResponse({'status': 'error', 'message': 'Falta cédula del cliente'}, status=400)
 
-    # [[MEJORA]] Reutiliza el mismo Customer si ya existe (evita duplicados)
-    customer, _ = Customer.objects.get_or_create(
-        cedula=cedula,
-        defaults={'nombre': first_name or cedula, 'correo': email}
-    )
-    # Si existe pero queremos actualizar correo/nombre si vienen:
-    changed = False
-    if first_name and (customer.nombre or '') != first_name:
-        customer.nombre = first_name
-        changed = True
-    if email and (customer.correo or '') != email:
-        customer.correo = email
-        changed = True
-    if changed:
-        customer.save()
-
-    order = Order.objects.create(customer=customer, paymentMethod='Transfer')
-
-    for item in data.get('orders', []):
-        pid = item.get('id')
-        qty = int(item.get('quantity', 1) or 1)
-        product = Product.objects.get(id=pid)
-        OrderItem.objects.create(order=order, product=product, quantity=qty)
+    lines = [(item.get('id'), int(item.get('quantity', 1) or 1)) for item in data.get('orders', [])]
+
+    try:
+        with transaction.atomic():
+            # [[MEJORA]] Reutiliza el mismo Customer (cédula normalizada y única) y actualiza nombre/correo
+            customer = upsert_customer(cedula, first_name, email)
+
+            # Orden + ítems en bloque; si algún producto no existe no se guarda nada
+            order = create_order(lines, skip_missing=False, customer=customer, paymentMethod='Transfer')
+    except Product.DoesNotExist:
+        return JsonResponse({'status': 'error', 'message': 'Producto no encontrado'}, status=404)
 
     return JsonResponse({'status': 'success', 'order_id': order.id})
 
@@ -208,18 +161,18 @@ def product_detail(request, product_id):
     product = Product.objects.get(id=product_id)
     comments = product.comments.all()
 
-    avg_rating = product.ratings.aggregate(avg=Avg('stars'))['avg'] or 0
+    avg_rating = product.rating_avg
     my_rating = 0
     can_rate = False
 
     if request.user.is_authenticated:
-        customer = _get_customer_for_user(request.user)
-        if customer:
-            existing = Rating.objects.filter(product=product, customer=customer).first()
-            my_rating = existing.stars if existing else 0
+        # [[MEJORA]] customer_id cacheado en la sesión: sin consultas para resolverlo
+        customer_id = get_customer_id(request)
+        if customer_id:
+            my_rating = Rating.objects.filter(product=product, customer_id=customer_id).values_list('stars', flat=True).first() or 0
 
             # Verificación PB-27: el producto debe pertenecer a alguna orden del customer
-            has_bought = OrderItem.objects.filter(order__customer=customer, product=product).exists()
+            has_bought = has_purchased(customer_id, product)
             can_rate = has_bought or request.user.is_superuser  # [[CAMBIO PARA ADMIN]]
 
     ctx = {
@@ -252,52 +205,9 @@ def add_comment(request, product_id):
 
 
 # ============================================
-# Helpers / Endpoints para calificaciones
+# Endpoints para calificaciones
 # ============================================
 
-def _get_customer_for_user(user):
-    """
-    [[ARREGLADO PB-27]] Mapea request.user -> inventory.Customer de forma robusta.
-    1) Si existe CustomerProfile -> úsalo.
-    2) Si no, busca Customer por correo del usuario.
-    3) Si no, busca por nombre completo / username / cédula == username.
-    4) Si no existe, crea un Customer y lo devuelve (esto habilita también a admin).
-    """
-    # 1) CustomerProfile (asumimos related_name='customer_profile')
-    try:
-        profile = getattr(user, "customer_profile", None)
-        if profile and getattr(profile, "customer_id", None):
-            return profile.customer
-    except Exception:
-        pass
-
-    # 2) Por correo
-    if getattr(user, "email", None):
-        cust = Customer.objects.filter(correo__iexact=user.email).first()
-        if cust:
-            return cust
-
-    # 3) Por nombre/username
-    full_name = (user.get_full_name() or "").strip()
-    if full_name:
-        cust = Customer.objects.filter(nombre__iexact=full_name).first()
-        if cust:
-            return cust
-
-    cust = Customer.objects.filter(
-        Q(nombre__iexact=user.username) | Q(cedula__iexact=str(user.username))
-    ).first()
-    if cust:
-        return cust
-
-    # 4) Crear si no existe ninguno
-    return Customer.objects.create(
-        cedula=str(user.id),
-        nombre=full_name or user.username,
-        correo=user.email or None
-    )
-
-
 @csrf_exempt
 @require_POST
 @login_required
@@ -319,18 +229,24 @@ def rate_product(request, product_id):
         stars = 0
     stars = max(1, min(5, stars))  # clamp 1..5
 
-    customer = _get_customer_for_user(request.user)
-    if not customer:
+    customer_id = get_customer_id(request)
+    if not customer_id:
         return JsonResponse({'ok': False, 'error': 'Perfil de cliente no asociado'}, status=400)
 
-    has_bought = OrderItem.objects.filter(order__customer=customer, product=product).exists()
+    has_bought = has_purchased(customer_id, product)
 
     # Si quieres hacer cumplir PB-27 estrictamente, quita el "and not request.user.is_superuser"
     if not has_bought and not request.user.is_superuser:
         return JsonResponse({'ok': False, 'error': 'Solo puedes calificar productos de tus pedidos'}, status=403)
 
+    if not Customer.objects.filter(pk=customer_id).exists():
+        # El cliente cacheado en la sesión ya no existe: resolver de nuevo en el próximo intento
+        forget_customer_id(request)
+        return JsonResponse({'ok': False, 'error': 'Perfil de cliente no asociado'}, status=400)
+
     rating, _ = Rating.objects.update_or_create(
-        product=product, customer=customer, defaults={'stars': stars}
+        product=product, customer_id=customer_id, defaults={'stars': stars}
     )
-    avg = product.ratings.aggregate(avg=Avg('stars'))['avg'] or 0
+    # Las señales de Rating ya actualizaron los totales del producto
+    avg = Product.objects.filter(pk=product.pk).values_list('rating_avg', flat=True).first() or 0
     return JsonResponse({'ok': True, 'my_rating': rating.stars, 'avg_rating': round(float(avg), 2)})